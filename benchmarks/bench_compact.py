@@ -0,0 +1,44 @@
+"""
+Reports the memory of get_data frames before and after compact=True against a local StandInServer.
+
+Run from the repository root:
+    python -m benchmarks.bench_compact --sizes 1000 10000 --fields 10
+"""
+
+import argparse
+import warnings
+from time import perf_counter
+from sustainalytics.api import API
+from benchmarks.standin import StandInServer, build_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--clusters', type=int, default=5)
+    parser.add_argument('--fields', type=int, default=10, help='fields per cluster')
+    parser.add_argument('--float-dtype', default='float32')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    field_mappings, field_definitions = build_catalog(n_clusters=args.clusters, n_fields=args.fields)
+    with StandInServer(field_mappings, field_definitions) as server:
+        api = API('benchmark', 'benchmark', base_url=server.base_url, pool_size=args.workers)
+        api.warm()
+        print('%d fields' % len(field_definitions))
+        print('%10s %12s %12s %8s %13s' % ('ids', 'before MB', 'after MB', 'ratio', 'pull seconds'))
+        for size in args.sizes:
+            identifiers = [str(i) for i in range(1, size + 1)]
+            start = perf_counter()
+            data = api.get_data(identifiers, dtype='dataframe', chunk=100, workers=args.workers, compact=True,
+                                float_dtype=args.float_dtype)
+            elapsed = perf_counter() - start
+            report = data.attrs['compact']
+            print('%10d %12.1f %12.1f %8.1f %13.2f' % (size, report['memory_before'] / 1e6, report['memory_after'] / 1e6,
+                                                       report['memory_before'] / float(report['memory_after']), elapsed))
+        api.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmarks the decoding of DataService responses into get_data frames, orjson with a single
+DataFrame.from_records of the fields, against the former json + DataFrame.from_records + join path, on
+recorded payloads. Both paths build the field columns row by row, no columnar decoder is involved.
+
+Run from the repository root:
+    python -m benchmarks.bench_decoding --chunks 20 --fields 10
+    python -m benchmarks.bench_decoding --record payloads/      # keep the recorded payloads
+    python -m benchmarks.bench_decoding --payloads payloads/    # replay payloads recorded earlier
+"""
+
+import os
+import json
+import glob
+import argparse
+import warnings
+import requests
+import numpy as np
+import pandas as pd
+from time import perf_counter
+from sustainalytics.api import API
+from benchmarks.standin import StandInServer, build_catalog
+from benchmarks.synthetic import CatalogTransport
+
+
+def record_payloads(field_mappings, field_definitions, chunks, chunk):
+    """
+    Record DataService response bodies of a StandInServer
+    :return: list of bytes
+    """
+    with StandInServer(field_mappings, field_definitions) as server:
+        token = requests.post(server.base_url + '/auth/token').json()['access_token']
+        headers = {'Authorization': 'Bearer ' + token}
+        payloads = []
+        for i in range(chunks):
+            identifiers = ','.join(str(j) for j in range(i * chunk + 1, (i + 1) * chunk + 1))
+            payloads.append(requests.get(server.base_url + '/v1/DataService', params={'identifiers': identifiers},
+                                         headers=headers).content)
+    return payloads
+
+
+def records_frame(content, field_ids):
+    """
+    The previous implementation, decoding to dictionaries and expanding the fields with from_records and a join
+    :param content: DataService response body
+    :param field_ids: fieldIds of the client
+    :return: dataframe indexed by identifier
+    """
+    default = dict.fromkeys([str(i) for i in field_ids], np.nan)
+    temp_data = pd.DataFrame(json.loads(content.decode('utf-8')))
+    temp_data['fields'] = temp_data['fields'].apply(lambda field: default if not bool(field) or field is np.nan
+                                                    else field)
+    temp_fields = pd.DataFrame.from_records(temp_data['fields'])
+    temp_fields['identifier'] = temp_data['identifier']
+    temp_fields = temp_fields.set_index('identifier')
+    temp_data = temp_data.set_index('identifier')
+    return temp_data.join(temp_fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2)
+    parser.add_argument('--packages', type=int, default=4)
+    parser.add_argument('--clusters', type=int, default=10)
+    parser.add_argument('--fields', type=int, default=10, help='fields per cluster')
+    parser.add_argument('--chunks', type=int, default=20, help='payloads recorded')
+    parser.add_argument('--chunk', type=int, default=100, help='identifiers per payload')
+    parser.add_argument('--payloads', help='directory of recorded *.json payloads to replay')
+    parser.add_argument('--record', help='directory the recorded payloads are written to')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    field_mappings, field_definitions = build_catalog(args.products, args.packages, args.clusters, args.fields)
+    if args.payloads is not None:
+        payloads = []
+        for path in sorted(glob.glob(os.path.join(args.payloads, '*.json'))):
+            with open(path, 'rb') as fh:
+                payloads.append(fh.read())
+    else:
+        payloads = record_payloads(field_mappings, field_definitions, args.chunks, args.chunk)
+    if args.record is not None:
+        os.makedirs(args.record, exist_ok=True)
+        for i, payload in enumerate(payloads):
+            with open(os.path.join(args.record, 'payload-%05d.json' % i), 'wb') as fh:
+                fh.write(payload)
+
+    api = API('benchmark', 'benchmark', transport=CatalogTransport(field_mappings, field_definitions, payloads))
+    field_ids = api.get_fieldIDs()  # fill the metadata cache so only the decoding is timed
+    records = sum(len(json.loads(payload)) for payload in payloads)
+    identifiers = [str(i) for i in range(records)]
+    print('%d payloads, %d records, %.1f MB, %d fields' % (len(payloads), records,
+                                                           sum(len(p) for p in payloads) / 1e6, len(field_ids)))
+
+    start = perf_counter()
+    current = api.get_data(identifiers, dtype='dataframe', chunk=args.chunk)
+    current_time = perf_counter() - start
+    print('orjson + from_records (get_data)  : %.3fs' % current_time)
+
+    start = perf_counter()
+    previous = pd.concat([records_frame(payload, field_ids) for payload in payloads], sort=False)
+    previous_time = perf_counter() - start
+    print('json + from_records + join (prior): %.3fs' % previous_time)
+
+    print('identical                         : %s' % (
+        current.drop(columns=['fields']).equals(previous.drop(columns=['fields'])) and
+        list(current.dtypes) == list(previous.dtypes)))
+    print('speedup                           : %.1fx' % (previous_time / current_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmarks API.get_fullFieldDefinitions against the former row by row prefix scan.
+
+Run from the repository root:
+    python -m benchmarks.bench_full_definitions --fields 25
+"""
+
+import argparse
+import warnings
+from time import perf_counter
+from sustainalytics.api import API
+from benchmarks.standin import build_catalog
+from benchmarks.synthetic import CatalogTransport, count_definitions
+
+
+def rowwise_full_definitions(api):
+    """
+    The previous implementation, one boolean scan of the definitions per field and level
+    :param api: API
+    :return: dataframe
+    """
+    def process_definitions(value, src_df, match_length, src_id_name):
+        temp_df = src_df[src_df[src_id_name] == int(str(value)[:match_length])].copy()
+        if len(temp_df) >= 1:
+            return temp_df.iat[0, 0], temp_df.iat[0, 1]
+        else:
+            return None, None
+
+    field_info = api.get_fieldsInfo(dtype='dataframe')
+    field_cluster = api.get_fieldClusterInfo(dtype='dataframe')
+    packages = api.get_packageInfo(dtype='dataframe')
+    products = api.get_productsInfo(dtype='dataframe')
+    field_info['productId'], field_info['productName'] = zip(*field_info.apply(lambda x: process_definitions(x['fieldId'], products, 2, 'productId'), axis=1))
+    field_info['packageId'], field_info['packageName'] = zip(*field_info.apply(lambda x: process_definitions(x['fieldId'], packages, 4, 'packageId'), axis=1))
+    field_info['fieldClusterId'], field_info['fieldClusterName'] = zip(*field_info.apply(lambda x: process_definitions(x['fieldId'], field_cluster, 6, 'fieldClusterId'), axis=1))
+    return field_info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--packages', type=int, default=10)
+    parser.add_argument('--clusters', type=int, default=10)
+    parser.add_argument('--fields', type=int, default=25, help='fields per cluster')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    field_mappings, field_definitions = build_catalog(args.products, args.packages, args.clusters, args.fields)
+    api = API('benchmark', 'benchmark', transport=CatalogTransport(field_mappings, field_definitions))
+    api.get_fieldMappings()  # fill the metadata cache so only the join is timed
+    api.get_fieldDefinitions()
+    print('%d fields, %d definitions' % (len(field_definitions), count_definitions(field_mappings)))
+
+    start = perf_counter()
+    joined = api.get_fullFieldDefinitions(dtype='dataframe')
+    joined_time = perf_counter() - start
+    print('prefix join  : %.3fs' % joined_time)
+
+    start = perf_counter()
+    rowwise = rowwise_full_definitions(api)
+    rowwise_time = perf_counter() - start
+    print('row-wise scan: %.3fs' % rowwise_time)
+
+    print('identical    : %s' % joined.equals(rowwise))
+    print('speedup      : %.1fx' % (rowwise_time / joined_time))
+
+
+if __name__ == '__main__':
+    main()
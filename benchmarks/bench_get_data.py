@@ -0,0 +1,64 @@
+"""
+Benchmarks the scaling of API.get_data with the number of identifiers against a local StandInServer.
+
+Run from the repository root:
+    python -m benchmarks.bench_get_data --sizes 1000 10000 100000
+    python -m benchmarks.bench_get_data --dtypes dataframe --coverage 0.9 0.1
+"""
+
+import argparse
+import warnings
+import tracemalloc
+from time import perf_counter
+from sustainalytics.api import API
+from benchmarks.standin import StandInServer
+
+
+def time_pull(api, identifiers, dtype, chunk, workers, memory):
+    """
+    Time a get_data pull
+    :return: seconds, peak traced memory in MB or None
+    """
+    if memory:
+        tracemalloc.start()
+    start = perf_counter()
+    result = api.get_data(identifiers, dtype=dtype, chunk=chunk, workers=workers)
+    elapsed = perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    assert len(result) == len(identifiers)
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--chunk', type=lambda value: value if value == 'auto' else int(value), default=100,
+                        help="identifiers per request, 'auto' sizes the requests from their latency and payload")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--dtypes', nargs='+', default=['json', 'dataframe'])
+    parser.add_argument('--coverage', type=float, nargs='+', default=[0.9],
+                        help='share of the identifiers the stand-in returns with fields')
+    parser.add_argument('--memory', action='store_true', help='trace the peak python memory, slows the pulls down')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    with StandInServer() as server:
+        api = API('benchmark', 'benchmark', base_url=server.base_url, pool_size=args.workers)
+        api.warm()
+        print('%-10s %8s %10s %10s %14s %10s' % ('dtype', 'coverage', 'ids', 'seconds', 'ms per 1k ids', 'peak MB'))
+        for coverage in args.coverage:
+            server.coverage = coverage
+            for dtype in args.dtypes:
+                for size in args.sizes:
+                    identifiers = [str(i) for i in range(1, size + 1)]
+                    elapsed, peak = time_pull(api, identifiers, dtype, args.chunk, args.workers, args.memory)
+                    print('%-10s %8.2f %10d %10.2f %14.1f %10s' % (dtype, coverage, size, elapsed, elapsed * 1e6 / size,
+                                                                   '-' if peak is None else '%.1f' % peak))
+        api.close()
+
+
+if __name__ == '__main__':
+    main()
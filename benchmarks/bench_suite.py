@@ -0,0 +1,151 @@
+"""
+Benchmark suite of the API client, run offline against a StandInServer serving the synthetic catalog or a
+cassette recorded by benchmarks.record_cassette. Measures the startup time (import, first token and metadata)
+and the get_data throughput and peak memory for every universe size and chunk setting.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite --sizes 1000 10000 --chunks 50 100 auto
+    python -m benchmarks.bench_suite --cassette cassettes/sample.json.gz --latency 0.05 --error-rate 0.01
+    python -m benchmarks.bench_suite --json results.json --baseline baseline.json --max-regression 0.2
+
+With --baseline the suite exits with status 1 when a pull is slower than the baseline by more than
+--max-regression, so it can gate CI.
+"""
+
+import sys
+import json
+import argparse
+import warnings
+import platform
+import subprocess
+import tracemalloc
+from time import perf_counter
+from statistics import median
+from sustainalytics.api import API
+from benchmarks.standin import StandInServer
+
+
+def import_seconds(repeat):
+    """
+    Median seconds of importing sustainalytics.api in a fresh interpreter
+    :return: float
+    """
+    code = 'from time import perf_counter; t = perf_counter(); import sustainalytics.api; print(perf_counter() - t)'
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return median(timings)
+
+
+def warm_seconds(base_url, repeat):
+    """
+    Median seconds of creating an API and fetching its token, productIds and full definition
+    :return: float
+    """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        api = API('benchmark', 'benchmark', base_url=base_url)
+        api.warm()
+        timings.append(perf_counter() - start)
+        api.close()
+    return median(timings)
+
+
+def run_pull(api, identifiers, dtype, chunk, workers, memory):
+    """
+    Run a get_data pull
+    :return: seconds, peak traced memory in MB or None, statistics of the pull
+    """
+    if memory:
+        tracemalloc.start()
+    start = perf_counter()
+    result = api.get_data(identifiers, dtype=dtype, chunk=chunk, workers=workers)
+    elapsed = perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    assert len(result) == len(identifiers)
+    return elapsed, peak, api.last_pull_stats.as_dict()
+
+
+def compare(results, baseline, max_regression):
+    """
+    Returns the pulls slower than the baseline by more than max_regression
+    :return: list of messages
+    """
+    previous = {(run['dtype'], run['size'], str(run['chunk'])): run for run in baseline.get('pulls', [])}
+    regressions = []
+    for run in results['pulls']:
+        before = previous.get((run['dtype'], run['size'], str(run['chunk'])))
+        if before is not None and run['seconds'] > before['seconds'] * (1 + max_regression):
+            regressions.append('%s %d ids chunk %s: %.3fs against %.3fs' % (run['dtype'], run['size'], run['chunk'],
+                                                                          run['seconds'], before['seconds']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--chunks', type=lambda value: value if value == 'auto' else int(value), nargs='+',
+                        default=[50, 100], help="identifiers per request, 'auto' sizes them adaptively")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--dtype', default='dataframe')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the median is reported')
+    parser.add_argument('--cassette', help='cassette served instead of the synthetic catalog')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--replay-latency', action='store_true', help='wait the recorded duration of the responses')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of the requests failing with a 503')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run measuring the peak memory')
+    parser.add_argument('--json', help='file the results are written to')
+    parser.add_argument('--baseline', help='results of a previous run to compare with')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    results = {'python': platform.python_version(), 'cassette': args.cassette, 'latency': args.latency,
+               'error_rate': args.error_rate, 'workers': args.workers, 'pulls': []}
+    with StandInServer(cassette=args.cassette, latency=args.latency, replay_latency=args.replay_latency,
+                       error_rate=args.error_rate) as server:
+        results['import_seconds'] = round(import_seconds(args.repeat), 4)
+        results['warm_seconds'] = round(warm_seconds(server.base_url, args.repeat), 4)
+        print('import %.3fs, first token and metadata %.3fs' % (results['import_seconds'], results['warm_seconds']))
+
+        api = API('benchmark', 'benchmark', base_url=server.base_url, pool_size=args.workers)
+        api.warm()
+        print('%-10s %10s %6s %10s %12s %10s %8s %8s' % ('dtype', 'ids', 'chunk', 'seconds', 'ids per s', 'peak MB',
+                                                       'requests', 'retries'))
+        for size in args.sizes:
+            identifiers = [str(i) for i in range(1, size + 1)]
+            for chunk in args.chunks:
+                runs = [run_pull(api, identifiers, args.dtype, chunk, args.workers, False)
+                        for _ in range(args.repeat)]
+                seconds = median(run[0] for run in runs)
+                peak = None if args.no_memory else run_pull(api, identifiers, args.dtype, chunk, args.workers, True)[1]
+                stats = runs[-1][2]
+                run = {'dtype': args.dtype, 'size': size, 'chunk': chunk, 'seconds': round(seconds, 4),
+                       'ids_per_second': round(size / seconds, 1), 'peak_mb': None if peak is None else round(peak, 2),
+                       'requests': stats['requests'], 'retries': stats['retries']}
+                results['pulls'].append(run)
+                print('%-10s %10d %6s %10.3f %12.1f %10s %8d %8d' % (args.dtype, size, chunk, seconds, size / seconds,
+                                                                   '-' if peak is None else '%.1f' % peak,
+                                                                   stats['requests'], stats['retries']))
+        results['requests'] = api.stats()['totals']
+        api.close()
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as fh:
+            regressions = compare(results, json.load(fh), args.max_regression)
+        for regression in regressions:
+            print('regression: ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""
+Records the responses of the API into cassette files and replays them offline.
+"""
+
+import os
+import json
+import gzip
+import zlib
+import base64
+import threading
+from time import sleep, perf_counter
+from urllib.parse import urlparse, parse_qsl
+from sustainalytics.transport import Transport, SessionTransport, make_response
+
+
+CASSETTE_VERSION = 1
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+REPLAY_TOKEN = 'cassette-token'  # recorded access tokens are replaced by this one
+
+
+def request_query(url, params=None):
+    """
+    Returns the path and the sorted query of a request, the query string of the url and the params merged
+    :param url: absolute url of the request
+    :param params: query parameters, dictionary or list of pairs
+    :return: path, list of (name, value)
+    """
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    if params:
+        items = params.items() if isinstance(params, dict) else params
+        for name, value in items:
+            values = value if isinstance(value, (list, tuple)) else [value]
+            query.extend((str(name), str(item)) for item in values)
+    return parsed.path or '/', sorted(query)
+
+
+class CassetteMiss(LookupError):
+    """
+    Raised when a replayed request was not recorded in the cassette
+    """
+    pass
+
+
+class Cassette(object):
+    """
+    Cassette holds the recorded interactions of the API: the method, path and sorted query of every request
+    with the status, headers, body and duration of its response.
+
+    Requests recorded several times are replayed in turn. A DataService request whose exact query was not
+    recorded is answered record by record from the recorded DataService responses, so a cassette replays any
+    chunk setting; data_records(fill=True) also derives the records of identifiers never recorded from the
+    recorded ones, to scale a small recording to a large universe. Access tokens are replaced by REPLAY_TOKEN
+    and request bodies (the credentials) are never recorded. Cassettes ending in .gz are gzipped.
+
+    Public Attributes
+    -----------------
+    path : str
+        file the cassette is loaded from and saved to
+    interactions : list
+        recorded request and response of every interaction
+
+    Public Methods
+    -----------------
+    add(method, path, query, status, headers, content, seconds)
+        :returns the recorded interaction
+    find(method, path, query)
+        :returns the next recorded interaction of a request or None
+    body(interaction)
+        :returns the body bytes of an interaction
+    data_records(identifiers, query, fill=False)
+        :returns the DataService records of identifiers from every recorded DataService response
+    save(path=None)
+        writes the cassette
+    load(path)
+        :returns the cassette read from a file
+    """
+
+    def __init__(self, path=None):
+        """
+        Create a cassette, loading the file when it exists
+        :param path: cassette file
+        """
+        self.path = path
+        self.interactions = []
+        self.__lock = threading.Lock()
+        self.__index = None
+        self.__turns = {}
+        self.__records = None
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.interactions)
+
+    @staticmethod
+    def key(method, path, query):
+        return '%s %s?%s' % (method.upper(), path, '&'.join('%s=%s' % tuple(item) for item in sorted(query)))
+
+    def add(self, method, path, query, status, headers, content, seconds):
+        """
+        Record an interaction
+        :param method: GET or POST
+        :param path: request path
+        :param query: list of (name, value) of the request
+        :param status: HTTP status of the response
+        :param headers: response headers, only RECORDED_HEADERS are kept
+        :param content: body bytes
+        :param seconds: duration of the request
+        :return: interaction
+        """
+        if path.endswith('/auth/token') and status == 200:
+            content = self.__redact_token(content)
+        try:
+            body, encoding = content.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode('ascii'), 'base64'
+        interaction = {
+            'request': {'method': method.upper(), 'path': path, 'query': [list(item) for item in sorted(query)]},
+            'response': {'status': status, 'body': body, 'encoding': encoding,
+                         'headers': {name: headers[name] for name in RECORDED_HEADERS if name in headers}},
+            'seconds': round(seconds, 6),
+        }
+        with self.__lock:
+            self.interactions.append(interaction)
+            self.__index = None
+            self.__records = None
+        return interaction
+
+    @staticmethod
+    def __redact_token(content):
+        try:
+            token = json.loads(content)
+        except ValueError:
+            return content
+        if isinstance(token, dict) and 'access_token' in token:
+            token['access_token'] = REPLAY_TOKEN
+        return json.dumps(token).encode('utf-8')
+
+    def find(self, method, path, query):
+        """
+        Returns the next recorded interaction of a request, the interactions of a request recorded several times
+        are returned in turn
+        :param method: GET or POST
+        :param path: request path
+        :param query: list of (name, value) of the request
+        :return: interaction or None
+        """
+        key = self.key(method, path, query)
+        with self.__lock:
+            if self.__index is None:
+                self.__index = {}
+                for interaction in self.interactions:
+                    request = interaction['request']
+                    self.__index.setdefault(self.key(request['method'], request['path'], request['query']),
+                                            []).append(interaction)
+            recorded = self.__index.get(key)
+            if not recorded:
+                return None
+            turn = self.__turns.get(key, 0)
+            self.__turns[key] = turn + 1
+            return recorded[turn % len(recorded)]
+
+    @staticmethod
+    def body(interaction):
+        """
+        Returns the body bytes of an interaction
+        :param interaction: recorded interaction
+        :return: bytes
+        """
+        response = interaction['response']
+        if response['encoding'] == 'base64':
+            return base64.b64decode(response['body'])
+        return response['body'].encode('utf-8')
+
+    def data_records(self, identifiers, query, fill=False):
+        """
+        Returns the DataService records of identifiers from every recorded DataService response of the same
+        products, packages and clusters
+        :param identifiers: list of identifiers
+        :param query: list of (name, value) of the request, the identifiers are ignored
+        :param fill: derive the record of an identifier never recorded from a recorded one, else return None
+        :return: list of records or None
+        """
+        fields_key = self.__fields_key(query)
+        with self.__lock:
+            if self.__records is None:
+                self.__records = {}
+                for interaction in self.interactions:
+                    request = interaction['request']
+                    if not request['path'].endswith('/DataService') or interaction['response']['status'] != 200:
+                        continue
+                    records = self.__records.setdefault(self.__fields_key(request['query']), {})
+                    for record in json.loads(self.body(interaction)):
+                        records[str(record['identifier'])] = record
+            records = self.__records.get(fields_key, {})
+        templates = None
+        data = []
+        for identifier in identifiers:
+            record = records.get(identifier)
+            if record is None:
+                if not fill or not records:
+                    return None
+                if templates is None:
+                    templates = [records[name] for name in sorted(records)]
+                record = dict(templates[zlib.crc32(identifier.encode('utf-8')) % len(templates)])
+                record['identifier'] = identifier
+            data.append(record)
+        return data
+
+    @staticmethod
+    def __fields_key(query):
+        return tuple((name, value) for name, value in sorted(tuple(item) for item in query) if name != 'identifiers')
+
+    def save(self, path=None):
+        """
+        Write the cassette, replacing the previous file atomically
+        :param path: cassette file, defaults to the path of the cassette
+        :return: None
+        """
+        path = path if path is not None else self.path
+        with self.__lock:
+            data = json.dumps({'version': CASSETTE_VERSION, 'interactions': self.interactions}).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with (gzip.open if path.endswith('.gz') else open)(tmp_path, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    def load(self, path):
+        """
+        Read the interactions of a cassette file
+        :param path: cassette file
+        :return: self
+        """
+        with (gzip.open if path.endswith('.gz') else open)(path, 'rb') as fh:
+            data = json.loads(fh.read())
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError('Unsupported cassette version %s in %s' % (data.get('version'), path))
+        with self.__lock:
+            self.interactions = data['interactions']
+            self.__index = None
+            self.__turns = {}
+            self.__records = None
+        self.path = path
+        return self
+
+
+class RecordingTransport(Transport):
+    """
+    Transport sending the requests through another transport and recording every response in a cassette.
+
+    Public Attributes
+    -----------------
+    transport : Transport
+        transport sending the requests, a SessionTransport by default
+    cassette : Cassette
+        cassette the interactions are recorded in
+    """
+
+    def __init__(self, cassette=None, transport=None):
+        """
+        Create the recording transport
+        :param cassette: Cassette or cassette file, an in-memory cassette by default
+        :param transport: transport sending the requests
+        """
+        self.cassette = cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+        self.transport = transport if transport is not None else SessionTransport()
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request and record its response, streamed bodies are read and replayed by iter_content()
+        :param method: GET or POST
+        :param url: absolute url of the endpoint
+        :return: response
+        """
+        start = perf_counter()
+        response = self.transport.request(method, url, **kwargs)
+        content = response.content
+        path, query = request_query(url, kwargs.get('params'))
+        self.cassette.add(method, path, query, response.status_code, response.headers, content,
+                          perf_counter() - start)
+        return response
+
+    def save(self, path=None):
+        """
+        Write the cassette
+        :param path: cassette file, defaults to the path of the cassette
+        :return: None
+        """
+        self.cassette.save(path)
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """
+    Transport answering the requests from a cassette, without network.
+
+    Public Attributes
+    -----------------
+    cassette : Cassette
+        cassette the responses are replayed from
+    latency : float
+        seconds added to every response
+    recorded_latency : bool
+        wait the recorded duration of every response
+    """
+
+    def __init__(self, cassette, latency=0.0, recorded_latency=False):
+        """
+        Create the replay transport
+        :param cassette: Cassette or cassette file
+        :param latency: seconds added to every response
+        :param recorded_latency: wait the recorded duration of every response
+        """
+        self.cassette = cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+        if len(self.cassette) == 0:
+            raise ValueError('The cassette %s holds no interaction.' % self.cassette.path)
+        self.latency = latency
+        self.recorded_latency = recorded_latency
+
+    def request(self, method, url, **kwargs):
+        """
+        Returns the recorded response of a request, a DataService request is rebuilt from the recorded records
+        :param method: GET or POST
+        :param url: absolute url of the endpoint
+        :return: requests.Response
+        """
+        path, query = request_query(url, kwargs.get('params'))
+        interaction = self.cassette.find(method, path, query)
+        if interaction is not None:
+            response = interaction['response']
+            status, headers, content = response['status'], response['headers'], self.cassette.body(interaction)
+            seconds = interaction['seconds'] if self.recorded_latency else 0.0
+        else:
+            identifiers = ','.join(value for name, value in query if name == 'identifiers').split(',')
+            records = None
+            if path.endswith('/DataService'):
+                records = self.cassette.data_records([i for i in identifiers if i != ''], query)
+            if records is None:
+                raise CassetteMiss('%s was not recorded in the cassette' % Cassette.key(method, path, query))
+            status, headers = 200, {'Content-Type': 'application/json; charset=utf-8'}
+            content = json.dumps(records).encode('utf-8')
+            seconds = 0.0
+        if self.latency + seconds > 0:
+            sleep(self.latency + seconds)
+        return make_response(status, headers, content, url)
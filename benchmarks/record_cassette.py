@@ -0,0 +1,70 @@
+"""
+Records the responses of the API into a cassette, replayed offline by ReplayTransport or StandInServer(cassette=...).
+
+The credentials are read from SUSTAINALYTICS_CLIENT_ID and SUSTAINALYTICS_CLIENT_SECRET. Without them, or with
+--standin, a local StandInServer is recorded instead.
+
+Run from the repository root:
+    python -m benchmarks.record_cassette --out cassettes/sample.json.gz --identifiers 500
+    python -m benchmarks.record_cassette --out cassettes/sample.json.gz --identifiers-file isins.txt --chunk 50
+"""
+
+import os
+import argparse
+import warnings
+from sustainalytics.api import API
+from benchmarks.cassette import RecordingTransport
+from benchmarks.standin import StandInServer
+
+
+def record(api, identifiers, chunk, workers):
+    """
+    Fetch the metadata and pull the identifiers through a recording API
+    :return: number of records pulled
+    """
+    api.warm()
+    api.get_fieldMappingDefinitions()
+    api.get_universe_access()
+    return len(api.get_data(identifiers, dtype='json', chunk=chunk, workers=workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True, help='cassette file, gzipped when it ends in .gz')
+    parser.add_argument('--base-url', default='https://api.sustainalytics.com')
+    parser.add_argument('--identifiers', type=int, default=500,
+                        help='pull the first EntityIds of the universe of access')
+    parser.add_argument('--identifiers-file', help='file of identifiers to pull, one per line')
+    parser.add_argument('--chunk', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--standin', action='store_true', help='record a local StandInServer')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    client_id = os.environ.get('SUSTAINALYTICS_CLIENT_ID')
+    client_secret = os.environ.get('SUSTAINALYTICS_CLIENT_SECRET')
+    server = None
+    base_url = args.base_url
+    if args.standin or not (client_id and client_secret):
+        server = StandInServer().start()
+        base_url, client_id, client_secret = server.base_url, 'standin', 'standin'
+
+    transport = RecordingTransport()
+    api = API(client_id, client_secret, base_url=base_url, transport=transport)
+    try:
+        if args.identifiers_file:
+            with open(args.identifiers_file, 'r') as fh:
+                identifiers = [line.strip() for line in fh if line.strip()]
+        else:
+            identifiers = [str(i) for i in api.get_universe_entityIDs()[:args.identifiers]]
+        records = record(api, identifiers, args.chunk, args.workers)
+    finally:
+        api.close()
+        if server is not None:
+            server.stop()
+    transport.save(args.out)
+    print('%d interactions, %d records recorded in %s' % (len(transport.cassette), records, args.out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,529 @@
+"""
+Local stand-in of the Sustainalytics API serving a synthetic catalog or a recorded cassette, used to test and
+benchmark the client offline.
+"""
+
+import json
+import zlib
+import random
+import asyncio
+import threading
+from time import sleep, time, gmtime, strftime
+from urllib.parse import urlparse, parse_qs
+from http.client import responses as status_reasons
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from requests.structures import CaseInsensitiveDict
+from benchmarks.cassette import Cassette
+
+
+def build_catalog(n_products=2, n_packages=2, n_clusters=5, n_fields=5):
+    """
+    Build a FieldMappings/FieldDefinitions pair following the 2/4/6 digit prefix convention of the fieldIds
+    :param n_products: products in the catalog
+    :param n_packages: packages per product
+    :param n_clusters: clusters per package
+    :param n_fields: fields per cluster
+    :return: field_mappings, field_definitions
+    """
+    field_mappings = []
+    field_definitions = []
+    for product in range(n_products):
+        product_id = 10 + product
+        packages = []
+        for package in range(n_packages):
+            package_id = product_id * 100 + package
+            clusters = []
+            for cluster in range(n_clusters):
+                cluster_id = package_id * 100 + cluster
+                clusters.append({'fieldClusterId': cluster_id, 'fieldClusterName': 'Cluster %d' % cluster_id})
+                for field in range(n_fields):
+                    field_id = cluster_id * 1000 + field
+                    field_definitions.append({'fieldId': field_id, 'fieldName': 'Field %d' % field_id})
+            packages.append({'packageId': package_id, 'packageName': 'Package %d' % package_id, 'clusters': clusters})
+        field_mappings.append({'productId': product_id, 'productName': 'Product %d' % product_id, 'packages': packages})
+    return field_mappings, field_definitions
+
+
+class StandInHTTPServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer accepting bursts of connections: with the default backlog of 5, the connections opened
+    at once by a concurrent client beyond it wait for their SYN to be retransmitted a second later
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StandInServer(object):
+    """
+    StandInServer answers the endpoints of the API from a synthetic catalog on a local port.
+
+    Every identifier is deterministically covered or not (coverage) and the field values are derived from
+    the identifier and fieldId, so two pulls of the same identifiers return the same data.
+    Given a cassette, the /v1 endpoints are answered from the recorded responses instead, the DataService
+    records of identifiers never recorded being derived from the recorded ones. A share of the requests
+    (error_rate) can fail with error_status to exercise the retries.
+
+    Public Attributes
+    -----------------
+    base_url : str
+        url to give to API(base_url=...)
+    field_mappings : list
+        FieldMappings json served
+    field_definitions : list
+        FieldDefinitions json served
+    universe_of_access : list
+        UniverseOfAccess json served
+    coverage : float
+        share of the identifiers returned with fields
+    latency : float
+        seconds added to every response
+    reports : list
+        reportId and reportType of the PDF reports served
+    link_ttl : int
+        seconds a PDF report link is valid
+    report_size : int
+        bytes of a PDF report
+    report_versions : dict
+        version of the (entityId, reportId) reports updated by update_report(), 1 otherwise
+    cassette : Cassette
+        recorded responses served instead of the synthetic catalog, None serves the catalog
+    replay_latency : bool
+        wait the recorded duration of every cassette response on top of latency
+    error_rate : float
+        share of the authorized requests answered with error_status
+    error_status : int
+        status of the injected errors
+    retry_after : float
+        seconds announced in the Retry-After header of the injected errors, None sends no header
+    request_counts : dict
+        number of requests received per path
+
+    Public Methods
+    -----------------
+    start()
+        :returns the started server
+    stop()
+        shuts the server down
+    revoke_tokens()
+        invalidates the issued tokens so the next requests get a 401
+    entity_record(identifier, field_ids)
+        :returns the DataService record of an identifier
+    replay(method, path, query)
+        :returns the status, body and recorded duration of a request from the cassette
+    respond(method, target, headers)
+        :returns the status, body, headers and delay of the response to a request
+    """
+
+    def __init__(self, field_mappings=None, field_definitions=None, universe_of_access=None, coverage=0.9,
+                 latency=0.0, host='127.0.0.1', port=0, reports=None, link_ttl=3600, report_size=200000,
+                 cassette=None, replay_latency=False, error_rate=0.0, error_status=503, seed=0, retry_after=None):
+        """
+        Create the server, start() binds it
+        :param field_mappings: FieldMappings json, defaults to build_catalog()
+        :param field_definitions: FieldDefinitions json, defaults to build_catalog()
+        :param universe_of_access: UniverseOfAccess json
+        :param coverage: share of the identifiers returned with fields
+        :param latency: seconds added to every response
+        :param host: interface to bind
+        :param port: port to bind, 0 picks a free one
+        :param reports: reportId and reportType of the PDF reports served
+        :param link_ttl: seconds a PDF report link is valid
+        :param report_size: bytes of a PDF report
+        :param cassette: Cassette or cassette file served instead of the synthetic catalog
+        :param replay_latency: wait the recorded duration of every cassette response on top of latency
+        :param error_rate: share of the authorized requests answered with error_status
+        :param error_status: status of the injected errors
+        :param seed: seed of the error injection
+        :param retry_after: seconds announced in the Retry-After header of the injected errors
+        """
+        if field_mappings is None or field_definitions is None:
+            field_mappings, field_definitions = build_catalog()
+        self.field_mappings = field_mappings
+        self.field_definitions = field_definitions
+        if universe_of_access is None:
+            universe_of_access = [{'universeId': 1, 'universeName': 'Stand-in universe',
+                                   'entityIds': list(range(1, 1001))}]
+        self.universe_of_access = universe_of_access
+        self.coverage = coverage
+        self.latency = latency
+        if reports is None:
+            reports = [{'reportId': 1, 'reportType': 'Company Report'},
+                       {'reportId': 2, 'reportType': 'Risk Rating Summary Report'}]
+        self.reports = reports
+        self.link_ttl = link_ttl
+        self.report_size = report_size
+        self.report_versions = {}
+        self.cassette = cassette if cassette is None or isinstance(cassette, Cassette) else Cassette(cassette)
+        self.replay_latency = replay_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.__random = random.Random(seed)
+        self.host = host
+        self.port = port
+        self.request_counts = {}
+        self.__tokens = set()
+        self.__issued = 0
+        self.__lock = threading.Lock()
+        self.__server = None
+        self.__thread = None
+
+    @property
+    def base_url(self):
+        return 'http://%s:%d' % self.__server.server_address[:2]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Bind the server and serve it from a daemon thread
+        :return: self
+        """
+        self.__server = StandInHTTPServer((self.host, self.port), self.__handler())
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        """
+        Shut the server down
+        :return: None
+        """
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def revoke_tokens(self):
+        """
+        Invalidate the issued tokens, the next requests get a 401 until the client re-authenticates
+        :return: None
+        """
+        with self.__lock:
+            self.__tokens.clear()
+
+    def issue_token(self):
+        """
+        Issue a new access token
+        :return: token json
+        """
+        with self.__lock:
+            self.__issued += 1
+            token = 'standin-%d' % self.__issued
+            self.__tokens.add(token)
+        return {'access_token': token, 'token_type': 'Bearer', 'expires_in': 3600}
+
+    def is_authorized(self, authorization):
+        """
+        Returns True when the Authorization header carries an issued token
+        :param authorization: Authorization header
+        :return: boolean
+        """
+        with self.__lock:
+            return authorization is not None and authorization.replace('Bearer ', '', 1) in self.__tokens
+
+    def count(self, path):
+        """
+        Count a request of a path
+        :param path: request path
+        :return: None
+        """
+        with self.__lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def inject_error(self):
+        """
+        Returns True when a request should fail with error_status
+        :return: boolean
+        """
+        if self.error_rate <= 0:
+            return False
+        with self.__lock:
+            return self.__random.random() < self.error_rate
+
+    def replay(self, method, path, query):
+        """
+        Returns the status, body and recorded duration of a request recorded in the cassette
+        :param method: GET or POST
+        :param path: request path
+        :param query: parsed query string
+        :return: status, bytes or json, seconds
+        """
+        pairs = sorted((name, value) for name, values in query.items() for value in values)
+        interaction = self.cassette.find(method, path, pairs)
+        if interaction is not None:
+            return interaction['response']['status'], self.cassette.body(interaction), interaction['seconds']
+        if path == '/v1/DataService':
+            identifiers = [identifier for identifier in ','.join(query.get('identifiers', [])).split(',')
+                           if identifier != '']
+            records = self.cassette.data_records(identifiers, pairs, fill=True)
+            if records is not None:
+                return 200, records, 0.0
+        return 404, {'message': 'Not recorded in the cassette'}, 0.0
+
+    def entity_record(self, identifier, field_ids):
+        """
+        Returns the DataService record of an identifier
+        :param identifier: ISIN, CUSIP, SEDOL or EntityId
+        :param field_ids: fieldIds requested
+        :return: dict
+        """
+        checksum = zlib.crc32(identifier.encode('utf-8'))
+        if checksum % 1000 >= self.coverage * 1000:
+            return {'identifier': identifier, 'entityId': None, 'entityName': None, 'fields': {}}
+        entity_id = int(identifier) if identifier.isdigit() else 1000000 + checksum % 9000000
+        fields = {}
+        for field_id in field_ids:
+            value = zlib.crc32(('%s:%s' % (identifier, field_id)).encode('utf-8'))
+            fields[str(field_id)] = 'No data' if value % 10 == 0 else round(value % 10000 / 100.0, 2)
+        return {'identifier': identifier, 'entityId': entity_id, 'entityName': 'Entity %d' % entity_id,
+                'fields': fields}
+
+    def data_service(self, query):
+        """
+        Returns the DataService json of a query
+        :param query: parsed query string
+        :return: list of records
+        """
+        identifiers = ','.join(query.get('identifiers', [])).split(',')
+        field_ids = [definition['fieldId'] for definition in self.field_definitions]
+        for name, length in [('productIds', 2), ('packageIds', 4), ('fieldClusterIds', 6)]:
+            if name in query:
+                prefixes = set(','.join(query[name]).split(','))
+                field_ids = [field_id for field_id in field_ids if str(field_id)[:length] in prefixes]
+                break
+        return [self.entity_record(identifier, field_ids) for identifier in identifiers if identifier != '']
+
+    def report_link(self, identifier, report_id):
+        """
+        Returns the ReportService url json of a report, None when the report does not exist
+        :param identifier: ISIN, CUSIP, SEDOL or EntityId
+        :param report_id: reportId
+        :return: list or None
+        """
+        record = self.entity_record(identifier, [])
+        if record['entityId'] is None or report_id not in [str(report['reportId']) for report in self.reports]:
+            return None
+        expiry = strftime('%Y-%m-%dT%H:%M:%SZ', gmtime(time() + self.link_ttl))
+        url = '%s/reports/%d/%s.pdf?se=%s&sig=standin' % (self.base_url, record['entityId'], report_id, expiry)
+        return [{'identifier': identifier, 'entityId': record['entityId'], 'reportId': int(report_id), 'url': url}]
+
+    def update_report(self, entity_id, report_id):
+        """
+        Publish a new version of a report
+        :param entity_id: EntityId
+        :param report_id: reportId
+        :return: new version
+        """
+        with self.__lock:
+            key = (int(entity_id), str(report_id))
+            self.report_versions[key] = self.report_versions.get(key, 1) + 1
+            return self.report_versions[key]
+
+    def report_file(self, path, query, if_none_match=None):
+        """
+        Returns the status, body and headers of a report link, 403 once the link expired
+        :param path: /reports/<entityId>/<reportId>.pdf
+        :param query: parsed query string of the link
+        :param if_none_match: If-None-Match header
+        :return: status, bytes, headers
+        """
+        try:
+            entity_id, report_id = path.split('/')[2], path.split('/')[3][:-len('.pdf')]
+            expiry = strftime('%Y-%m-%dT%H:%M:%SZ', gmtime(time()))
+            if query.get('se', [''])[0] < expiry:
+                return 403, b'Link expired', {}
+            version = self.report_versions.get((int(entity_id), report_id), 1)
+        except (IndexError, ValueError):
+            return 404, b'Not found', {}
+        etag = '"%s-%s-v%d"' % (entity_id, report_id, version)
+        if if_none_match == etag:
+            return 304, b'', {'ETag': etag}
+        seed = ('%s:%s:%d' % (entity_id, report_id, version)).encode('utf-8')
+        block = b''.join(zlib.crc32(seed + bytes([i])).to_bytes(4, 'little') for i in range(256))
+        body = b'%PDF-1.4\n' + (block * (self.report_size // len(block) + 1))[:self.report_size]
+        return 200, body, {'ETag': etag, 'Content-Type': 'application/pdf'}
+
+    def route(self, method, path, query):
+        """
+        Returns the status and json of a request
+        :param method: GET or POST
+        :param path: request path
+        :param query: parsed query string
+        :return: status, json
+        """
+        if method == 'POST' and path == '/auth/token':
+            return 200, self.issue_token()
+        routes = {
+            '/v1/FieldDefinitions': lambda: self.field_definitions,
+            '/v1/FieldMappings': lambda: self.field_mappings,
+            '/v1/FieldMappingDefinitions': lambda: [],
+            '/v1/UniverseOfAccess': lambda: self.universe_of_access,
+            '/v1/ReportService': lambda: [{'reports': self.reports}],
+            '/v1/DataService': lambda: self.data_service(query),
+        }
+        if method == 'GET' and path in routes:
+            return 200, routes[path]()
+        if method == 'GET' and path.startswith('/v1/ReportService/url/') and path.count('/') == 5:
+            identifier, report_id = path.split('/')[4:]
+            link = self.report_link(identifier, report_id)
+            if link is not None:
+                return 200, link
+        return 404, {'message': 'Not found'}
+
+    def respond(self, method, target, headers):
+        """
+        Returns the response of a request, shared by the threaded and the asyncio servers
+        :param method: GET or POST
+        :param target: request path and query string
+        :param headers: request headers
+        :return: status, body bytes, response headers, seconds to wait before answering
+        """
+        url = urlparse(target)
+        self.count(url.path)
+        delay = self.latency
+        if url.path.startswith('/reports/'):
+            # presigned report links, no access token
+            status, body, response_headers = self.report_file(url.path, parse_qs(url.query),
+                                                              headers.get('If-None-Match'))
+            return status, body, response_headers, delay
+        query = parse_qs(url.query, keep_blank_values=True)
+        response_headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if url.path != '/auth/token' and not self.is_authorized(headers.get('Authorization')):
+            status, data = 401, {'message': 'Authorization has been denied for this request.'}
+        elif url.path != '/auth/token' and self.inject_error():
+            status, data = self.error_status, {'message': 'Injected error'}
+            if self.retry_after is not None:
+                response_headers['Retry-After'] = str(self.retry_after)
+        elif url.path != '/auth/token' and self.cassette is not None:
+            status, data, seconds = self.replay(method, url.path, query)
+            if self.replay_latency:
+                delay += seconds
+        else:
+            status, data = self.route(method, url.path, query)
+        body = data if isinstance(data, bytes) else json.dumps(data).encode('utf-8')
+        return status, body, response_headers, delay
+
+    def __handler(self):
+        """
+        Returns the request handler class bound to this server
+        :return: BaseHTTPRequestHandler subclass
+        """
+        server = self
+
+        class StandInHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+            disable_nagle_algorithm = True  # headers and body are written apart, do not wait for the delayed ack
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle_request(self, method):
+                if method == 'POST':
+                    self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, body, headers, delay = server.respond(method, self.path, self.headers)
+                if delay > 0:
+                    sleep(delay)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.handle_request('GET')
+
+            def do_POST(self):
+                self.handle_request('POST')
+
+        return StandInHandler
+
+
+class AsyncStandInServer(StandInServer):
+    """
+    AsyncStandInServer answers the same endpoints as StandInServer from the running asyncio loop, without threads,
+    to test AsyncAPI. Keep-alive HTTP/1.1 only, use it with async with.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncStandInServer, self).__init__(*args, **kwargs)
+        self.__server = None
+        self.__connections = {}
+
+    @property
+    def base_url(self):
+        return 'http://%s:%d' % self.__server.sockets[0].getsockname()[:2]
+
+    def __enter__(self):
+        raise TypeError('AsyncStandInServer is used with async with')
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def start(self):
+        """
+        Bind the server in the running loop
+        :return: self
+        """
+        self.__server = await asyncio.start_server(self.__handle, self.host, self.port, backlog=128)
+        return self
+
+    async def stop(self):
+        """
+        Shut the server down
+        :return: None
+        """
+        if self.__server is not None:
+            self.__server.close()
+            # the keep-alive connections are closed so their handlers return before the loop ends
+            for writer in list(self.__connections.values()):
+                writer.close()
+            await asyncio.gather(*self.__connections, return_exceptions=True)
+            await self.__server.wait_closed()
+            self.__server = None
+
+    async def __handle(self, reader, writer):
+        """
+        Answer the requests of a connection until the client closes it
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        :return: None
+        """
+        self.__connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = CaseInsensitiveDict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip()] = value.strip()
+                if int(headers.get('Content-Length', 0)) > 0:
+                    await reader.readexactly(int(headers['Content-Length']))
+                status, body, response_headers, delay = self.respond(method, target, headers)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                head = ['HTTP/1.1 %d %s' % (status, status_reasons.get(status, '')), 'Content-Length: %d' % len(body)]
+                head.extend('%s: %s' % item for item in response_headers.items())
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if headers.get('Connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.__connections.pop(asyncio.current_task(), None)
+            writer.close()
@@ -0,0 +1,56 @@
+"""
+In-memory transport serving synthetic catalogs to the API benchmarks.
+"""
+
+import json
+import itertools
+from sustainalytics.transport import Transport
+
+
+class StaticResponse(object):
+    """
+    Minimal requests.Response stand-in for a json body
+    """
+
+    def __init__(self, data=None, status_code=200, content=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = content if content is not None else json.dumps(data).encode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+class CatalogTransport(Transport):
+    """
+    Transport answering the auth and metadata endpoints from a synthetic catalog without any network,
+    and the DataService with recorded response bodies served in turn
+    """
+
+    def __init__(self, field_mappings, field_definitions, data_payloads=None):
+        self.routes = {
+            '/auth/token': {'access_token': 'benchmark', 'expires_in': 3600},
+            '/v1/FieldMappings': field_mappings,
+            '/v1/FieldDefinitions': field_definitions,
+        }
+        self.data_payloads = itertools.cycle(data_payloads or [b'[]'])
+
+    def request(self, method, url, **kwargs):
+        path = '/' + url.split('://', 1)[-1].split('/', 1)[-1]
+        if path == '/v1/DataService':
+            return StaticResponse(content=next(self.data_payloads))
+        return StaticResponse(self.routes[path])
+
+
+def count_definitions(field_mappings):
+    """
+    Returns the number of products, packages and clusters of a catalog
+    :param field_mappings: FieldMappings json
+    :return: int
+    """
+    packages = list(itertools.chain.from_iterable(product['packages'] for product in field_mappings))
+    clusters = list(itertools.chain.from_iterable(package['clusters'] for package in packages))
+    return len(field_mappings) + len(packages) + len(clusters)
@@ -22,5 +22,6 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    install_requires=['pandas','requests','tqdm']
+    install_requires=['pandas','requests','tqdm'],
+    extras_require={'export': ['pyarrow'], 'fast': ['orjson'], 'async': ['aiohttp']}
 )
\ No newline at end of file
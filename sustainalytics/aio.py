@@ -0,0 +1,518 @@
+"""
+Asyncio client of the API, every request sent over a single aiohttp connection pool.
+"""
+
+import copy
+import asyncio
+import itertools
+from time import perf_counter
+from collections import deque
+import requests
+import pandas as pd
+from pandas.io.json import json_normalize
+from sustainalytics.api import API
+from sustainalytics.stats import PullStats, request_bytes
+from sustainalytics.decoding import loads
+from sustainalytics.retry import parse_retry_after, REAUTHENTICATE, GIVE_UP
+from sustainalytics.transport import make_response
+from sustainalytics.universe import UniverseIndex
+
+
+class AsyncAPI(object):
+    """
+    AsyncAPI offers awaitable equivalents of the API methods for asyncio applications. Requires aiohttp.
+
+    The requests go through one aiohttp session whose connector keeps up to pool_size connections, so many
+    DataService chunks are in flight at once without threads. The parsing and the assembly of the results are
+    the ones of a sync API held in api, which also holds the token manager, metadata cache, retry policy, rate
+    limiter and instrumentation: the endpoints are fetched asynchronously into its caches, then shaped by it.
+    A token is requested through api.token_manager in the default executor, once per hour at most.
+
+    Public Attributes
+    -----------------
+    api : API
+        sync client sharing its caches, token, retry policy and instrumentation, shapes the results
+    base_url : str
+        root url of the API
+    pool_size : int
+        connections kept open by the aiohttp session
+    last_pull_stats : PullStats
+        requests, retries and re-authentications of the last pull started, concurrent pulls read their own
+        statistics from the attrs of their Dataframe or their pull_stats
+
+    Public Methods
+    -----------------
+    warm()
+        preloads the access token and full_definition.
+    close()
+        closes the aiohttp session.
+    stats()
+        :returns a snapshot of the per endpoint request statistics, see API.stats()
+
+    get_fieldDefinitions(dtype=json)
+        :returns a collection of field definitions
+    get_fieldIDs()
+        :returns a list of fieldIds
+    get_fieldMappings(dtype=json)
+        :returns a collections of fieldId mappings to their descriptive information
+    get_fieldMappingDefinitions(dtype=json)
+        :returns a collection of the field mappings definitions.
+    get_productIDs()
+        :returns a list of product IDs
+    get_fullFieldDefinitions(dtype=json)
+        :returns a collection of fieldDefinitions
+    get_universe_access(dtype=json)
+        :returns a collection of entity ids and universe access of an account
+    get_universe_entityIDs(keep_duplicates=False)
+        :returns a list of entityIds the client can access
+    get_pdfReportService(dtype=json)
+        :returns manages the pdf report generation.
+    get_pdfReportUrl(identifier=None, reportId=None, dtype=json)
+        :returns URL pdf link for an entityId and a reportId
+
+    iter_data(identifiers, dtype=json, chunk=50, concurrency=8, pull_stats=None)
+        :returns an async generator yielding the data of every chunk in request order, concurrency chunks in flight
+    get_data(identifiers, dtype=json, chunk=50, concurrency=8, compact=False)
+        :returns a collections of sustainalytics data to the client
+    """
+
+    def __init__(self, client_id, client_secretkey, base_url='https://api.sustainalytics.com', pool_size=10,
+                 timeout=60, data_timeout=180, metadata_cache=None, token_cache=None, refresh_margin=60,
+                 retry_policy=None, rate_limiter=None, instrumentation=None):
+        """
+        Create the client, the aiohttp session is opened by the first request in the running loop
+        :param client_id:
+        :param client_secretkey:
+        :param base_url: root url of the API, can point to a local stand-in server
+        :param pool_size: connections kept open, should be >= the concurrency of the pulls
+        :param timeout: seconds before a metadata request is abandoned
+        :param data_timeout: seconds before a DataService request is abandoned
+        :param metadata_cache: MetadataCache of the reference endpoints, defaults to a one day in-memory cache
+        :param token_cache: json file sharing the access token with the other processes of the host
+        :param refresh_margin: seconds before its expiry when the access token is refreshed
+        :param retry_policy: RetryPolicy of the requests, defaults to 3 retries with exponential backoff and jitter
+        :param rate_limiter: RateLimiter every request waits on, without blocking the loop: the token of a limiter
+                             with a state_file is taken in the default executor, behind its file lock
+        :param instrumentation: Instrumentation recording the requests
+        """
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('aiohttp is required by AsyncAPI, install it with pip install aiohttp')
+        self.__aiohttp = aiohttp
+        self.api = API(client_id, client_secretkey, base_url=base_url, pool_size=1, timeout=timeout,
+                       data_timeout=data_timeout, metadata_cache=metadata_cache, token_cache=token_cache,
+                       refresh_margin=refresh_margin, retry_policy=retry_policy, rate_limiter=rate_limiter,
+                       instrumentation=instrumentation)
+        self.base_url = self.api.base_url
+        self.pool_size = pool_size
+        self.__session = None
+
+    @property
+    def last_pull_stats(self):
+        return self.api.last_pull_stats
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Close the aiohttp session and the connections of the token manager
+        :return: None
+        """
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+        self.api.close()
+
+    def stats(self):
+        """
+        Returns a snapshot of the request statistics per endpoint and of the last pulls
+        :return: dict
+        """
+        return self.api.stats()
+
+    async def warm(self):
+        """
+        Preload the access token and the full definition, the metadata endpoints are fetched concurrently
+        :return: self
+        """
+        await asyncio.gather(self.__token(), self.__get_metadata('/v1/FieldDefinitions'),
+                             self.__get_metadata('/v1/FieldMappings'))
+        self.api.full_definition = self.api.get_fullFieldDefinitions(dtype='dataframe')
+        return self
+
+    def __client_session(self):
+        """
+        Returns the aiohttp session, opened on first use in the running loop
+        :return: aiohttp.ClientSession
+        """
+        if self.__session is None or self.__session.closed:
+            connector = self.__aiohttp.TCPConnector(limit=self.pool_size)
+            self.__session = self.__aiohttp.ClientSession(connector=connector)
+        return self.__session
+
+    async def __token(self):
+        """
+        Returns a valid access token, a new one is requested by the token manager in the default executor
+        :return: str
+        """
+        token = self.api.token_manager.cached_token()
+        if token is None:
+            token = await asyncio.get_running_loop().run_in_executor(None, self.api.token_manager.get_token)
+        return token
+
+    @staticmethod
+    def __query(params):
+        """
+        Returns the query parameters as a list of string pairs, list values repeated as requests does
+        :param params: dictionary or pairs of query parameters
+        :return: list
+        """
+        if not params:
+            return None
+        items = params.items() if isinstance(params, dict) else params
+        return [(str(name), str(item)) for name, value in items
+                for item in (value if isinstance(value, (list, tuple)) else [value])]
+
+    async def __send(self, path, access_token, params=None, timeout=None, headers=None, pull=None):
+        """
+        GET an endpoint of the API through the aiohttp session with an access token, once the rate limiter allows it
+        :return: requests.Response holding the body
+        """
+        rate_limiter = self.api.rate_limiter
+        if rate_limiter is not None:
+            if rate_limiter.state_file is None:
+                waited = rate_limiter.reserve()
+            else:
+                # the bucket shared by the processes of the host is read and written under a blocking file lock
+                waited = await asyncio.get_running_loop().run_in_executor(None, rate_limiter.reserve)
+            if waited > 0:
+                await asyncio.sleep(waited)
+                self.api.instrumentation.record_throttle(path, waited)
+            if pull is not None:
+                pull.add_wait(waited)
+        request_headers = self.api.token_manager.headers(access_token)
+        request_headers.update(headers or {})
+        url = self.base_url + path
+        start = perf_counter()
+        try:
+            async with self.__client_session().get(url, params=self.__query(params), headers=request_headers,
+                                                   timeout=self.__aiohttp.ClientTimeout(total=timeout)) as answer:
+                content = await answer.read()
+        except (self.__aiohttp.ClientError, asyncio.TimeoutError) as error:
+            self.api.instrumentation.record_request(path, perf_counter() - start, type(error).__name__,
+                                                    bytes_sent=len(url))
+            raise
+        response = make_response(answer.status, dict(answer.headers), content, str(answer.url))
+        self.api.instrumentation.record_request(path, perf_counter() - start, response.status_code,
+                                                bytes_sent=request_bytes(response, url, params),
+                                                bytes_received=len(content))
+        return response
+
+    async def __get_response(self, path, params=None, timeout=None, headers=None, pull=None):
+        """
+        GET an endpoint of the API, retrying according to the retry policy as API does.
+        A 401 invalidates the token and the request is sent once more with a new one.
+        :param path: endpoint path i.e. /v1/FieldDefinitions
+        :param params: query parameters
+        :param timeout: seconds before the request is abandoned, defaults to the API timeout
+        :param headers: headers sent on top of the access headers
+        :param pull: PullStats counting the requests, retries and re-authentications of a pull and holding its budget
+        :return: requests.Response, failures raise the requests exceptions
+        """
+        if timeout is None:
+            timeout = self.api.timeout
+        retry_policy = self.api.retry_policy
+        access_token = await self.__token()
+        budget = pull.budget if pull is not None else None
+        attempt = 0
+        reauthenticated = False
+        while True:
+            if pull is not None:
+                pull.add_request()
+            try:
+                response = await self.__send(path, access_token, params=params, timeout=timeout, headers=headers,
+                                             pull=pull)
+            except (self.__aiohttp.ClientError, asyncio.TimeoutError) as error:
+                mapped = self.__requests_error(path, error)
+                decision, delay = GIVE_UP, 0.0
+                if isinstance(mapped, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    decision, delay = retry_policy.decide(attempt, budget=budget)
+                if decision == GIVE_UP:
+                    raise mapped from error
+                reason = type(error).__name__
+            else:
+                if response.status_code < 400:
+                    return response
+                decision, delay = retry_policy.decide(
+                    attempt, response.status_code, parse_retry_after(response.headers.get('Retry-After')),
+                    reauthenticated=reauthenticated, budget=budget)
+                if decision == REAUTHENTICATE:
+                    # the token manager locks while refreshing, never wait on it in the loop
+                    await asyncio.get_running_loop().run_in_executor(None, self.api.token_manager.invalidate,
+                                                                     access_token)
+                    access_token = await self.__token()
+                    reauthenticated = True
+                    if pull is not None:
+                        pull.add_reauth()
+                    self.api.instrumentation.record_reauth(path)
+                    continue
+                if decision == GIVE_UP:
+                    response.raise_for_status()
+                    return response
+                reason = response.status_code
+            if pull is not None:
+                pull.add_retry(reason)
+            self.api.instrumentation.record_retry(path, reason)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def __requests_error(self, path, error):
+        """
+        Returns the requests exception standing for an aiohttp or asyncio error, so AsyncAPI raises the exceptions
+        API does: timeouts and connection errors are retried, payload, url and other client errors are not
+        :param path: endpoint path
+        :param error: aiohttp.ClientError or asyncio.TimeoutError
+        :return: requests.exceptions.RequestException
+        """
+        aiohttp = self.__aiohttp
+        if isinstance(error, asyncio.TimeoutError):  # aiohttp.ServerTimeoutError included
+            return requests.exceptions.Timeout('%s timed out' % path)
+        if isinstance(error, aiohttp.ClientConnectionError):
+            return requests.exceptions.ConnectionError(str(error))
+        if isinstance(error, aiohttp.ClientPayloadError):
+            return requests.exceptions.ChunkedEncodingError(str(error))
+        if isinstance(error, aiohttp.InvalidURL):
+            return requests.exceptions.InvalidURL(str(error))
+        return requests.exceptions.RequestException(str(error))
+
+    async def __get_json(self, path, params=None, timeout=None):
+        """
+        GET an endpoint of the API and decode its json
+        :return: decoded json
+        """
+        response = await self.__get_response(path, params=params, timeout=timeout)
+        return response.json()
+
+    async def __get_metadata(self, path):
+        """
+        GET a reference endpoint through the metadata cache of api, revalidating a stale entry with its
+        ETag/Last-Modified. The sync methods of api then read the entry without a request
+        :param path: endpoint path i.e. /v1/FieldMappings
+        :return: decoded json
+        """
+        cache = self.api.metadata_cache
+        key = self.api._metadata_key(path)
+        entry = cache.get(key)
+        if cache.is_fresh(entry):
+            return copy.deepcopy(entry['data'])
+
+        conditional_headers = {}
+        if entry is not None and entry.get('etag'):
+            conditional_headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = await self.__get_response(path, headers=conditional_headers)
+        if response.status_code == 304 and entry is not None:
+            entry = cache.touch(key, entry)
+        else:
+            entry = cache.set(key, response.json(), etag=response.headers.get('ETag'),
+                              last_modified=response.headers.get('Last-Modified'))
+        return copy.deepcopy(entry['data'])
+
+    async def get_fieldDefinitions(self, dtype='json'):
+        """
+        Returns the field definitions either as a dataframe or json
+        :param dtype: dataframe or json
+        :return: requested Data formats
+        """
+        temp_data = await self.__get_metadata('/v1/FieldDefinitions')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
+        return temp_data
+
+    async def get_fieldIDs(self):
+        """
+        Returns a list of field ids activated for the the client
+        :return: a list
+        """
+        await self.__get_metadata('/v1/FieldDefinitions')
+        return self.api.get_fieldIDs()
+
+    async def get_fieldMappings(self, dtype='json'):
+        """
+        Returns the field mappings either as a dataframe or json
+        :param dtype: dataframe or json
+        :return: requested Data formats
+        """
+        temp_data = await self.__get_metadata('/v1/FieldMappings')
+        if dtype != 'json':
+            temp_data = json_normalize(temp_data)
+        return temp_data
+
+    async def get_fieldMappingDefinitions(self, dtype='json'):
+        """
+        Returns the field mapping definitions either as a dataframe or json
+        :param dtype: dataframe or json
+        :return: requested Data formats
+        """
+        temp_data = await self.__get_metadata('/v1/FieldMappingDefinitions')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
+        return temp_data
+
+    async def get_productIDs(self):
+        """
+        Returns a list of product ids activated for the the client
+        :return: a list
+        """
+        await self.__get_metadata('/v1/FieldMappings')
+        return self.api.get_productIDs()
+
+    async def get_fullFieldDefinitions(self, dtype='json'):
+        """
+        Return all definitions, the two metadata endpoints are fetched concurrently
+        :return: full dataframe of the definition mapping
+        """
+        await asyncio.gather(self.__get_metadata('/v1/FieldDefinitions'), self.__get_metadata('/v1/FieldMappings'))
+        return self.api.get_fullFieldDefinitions(dtype=dtype)
+
+    async def get_universe_access(self, dtype='json'):
+        """
+        Get all the companyids in the universes
+        :param dtype: return type dataframe or json
+        :return: json or dataframe
+        """
+        temp_data = await self.__get_json('/v1/UniverseOfAccess')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
+        return temp_data
+
+    async def get_universe_entityIDs(self, keep_duplicates=False):
+        """
+        Returns a list of entityids in the Universe of Access for the client
+        :param keep_duplicates: repeat the entityids present in several universes
+        :return: list of entity ids
+        """
+        universe_index = UniverseIndex.from_access(await self.get_universe_access())
+        if keep_duplicates is True:
+            return list(itertools.chain.from_iterable(ids.tolist() for ids in universe_index.universes.values()))
+        return universe_index.entity_ids().tolist()
+
+    async def get_pdfReportService(self, dtype='json'):
+        """
+        Get the PDF reports
+        :return: info
+        """
+        temp_data = await self.__get_json('/v1/ReportService')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
+        return temp_data
+
+    async def get_pdfReportUrl(self, identifier=None, reportId=None, dtype='json'):
+        """
+        Returns the URL of the PDF report
+        :param identifier: Sustainalytics Entity identifier
+        :param reportId: report ID
+        :return: json
+        """
+        temp_data = pd.DataFrame()
+        if identifier is not None and reportId is not None:
+            request_path = '/v1/ReportService/url/' + str(identifier).strip(' \t\n') + "/" + \
+                           str(reportId).strip(' \t\n')
+            temp_data = await self.__get_json(request_path)
+            if dtype != 'json':
+                temp_data = pd.DataFrame(temp_data)
+        return temp_data
+
+    async def __fetch_chunk(self, params, pull=None):
+        """
+        Request a single chunk of identifiers from the DataService, measuring its size, duration and payload
+        :param params: request parameters of the chunk
+        :param pull: PullStats of the pull the chunk belongs to
+        :return: json
+        """
+        start = perf_counter()
+        response = await self.__get_response('/v1/DataService', params=params, timeout=self.api.data_timeout,
+                                             pull=pull)
+        seconds = perf_counter() - start
+        size = params[0][1].count(',') + 1
+        self.api.instrumentation.record_chunk('/v1/DataService', size, seconds, len(response.content))
+        if pull is not None:
+            pull.add_chunk(size, len(response.content))
+        return loads(response.content)
+
+    async def iter_data(self, identifiers, productIds=None, packageIds=None, fieldClusterIds=None, dtype='json',
+                        chunk=50, concurrency=8, identifier_index=None, pull_stats=None):
+        """
+        Stream bulk data via sustainalytics API, yielding every chunk in request order while up to concurrency
+        chunks are in flight
+        :param chunk: identifiers per request
+        :param concurrency: number of chunks requested at once
+        :param identifier_index: IdentifierIndex requesting every entity once and dropping the identifiers outside
+                                 the universe, the records are fanned back out to the identifiers given
+        :param pull_stats: PullStats recording this pull, a new one by default; last_pull_stats refers to it too
+        :return: async generator of json records lists or Dataframes indexed by identifier
+        """
+        assert concurrency >= 1, "Concurrency should be greater than or equal to 1."
+        plan = None
+        if identifier_index is not None:
+            plan = identifier_index.plan(identifiers)
+            identifiers = plan.identifiers
+        if dtype != 'json':
+            # the NaN record of the entities without data is built from the field definitions
+            await self.__get_metadata('/v1/FieldDefinitions')
+        params_list = self.api._chunk_params(identifiers, productIds=productIds, packageIds=packageIds,
+                                             fieldClusterIds=fieldClusterIds, chunk=chunk)
+        pull = pull_stats if pull_stats is not None else PullStats()
+        if pull.budget is None:
+            pull.budget = self.api.retry_policy.new_budget()
+        pull.chunks = len(params_list)
+        pull.plan = plan
+        self.api.last_pull_stats = pull
+
+        params_iter = iter(params_list)
+        pending = deque(asyncio.ensure_future(self.__fetch_chunk(params, pull))
+                        for params in itertools.islice(params_iter, concurrency))
+        try:
+            while len(pending) > 0:
+                temp_data = await pending.popleft()
+                for params in itertools.islice(params_iter, 1):
+                    pending.append(asyncio.ensure_future(self.__fetch_chunk(params, pull)))
+                yield self.api._process_chunk(temp_data, dtype, plan=plan)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def get_data(self, identifiers, productIds=None, packageIds=None, fieldClusterIds=None, dtype='json',
+                       chunk=50, concurrency=8, compact=False, float_dtype='float32', identifier_index=None):
+        """
+        Get bulk data via sustainalytics API, see API.get_data()
+        :param chunk: identifiers per request
+        :param concurrency: number of chunks requested at once
+        :param compact: Dataframe with numeric fields as float_dtype plus '<fieldId>_sentinel' categoricals and text
+                        fields as categoricals
+        :param float_dtype: float32 or float64, the dtype of the numeric fields of a compact Dataframe
+        :param identifier_index: IdentifierIndex requesting every entity once and dropping the identifiers outside
+                                 the universe
+        :return: json or Dataframe, the statistics of the pull are in the Dataframe attrs and last_pull_stats
+        """
+        start = perf_counter()
+        pull = PullStats()
+        data_pull_chunks = [temp_data async for temp_data in
+                            self.iter_data(identifiers, productIds=productIds, packageIds=packageIds,
+                                           fieldClusterIds=fieldClusterIds, dtype=dtype, chunk=chunk,
+                                           concurrency=concurrency, identifier_index=identifier_index,
+                                           pull_stats=pull)]
+        self.api.instrumentation.record_pull('async get_data', perf_counter() - start, pull.as_dict())
+        if compact and dtype != 'json':
+            # the field types of the compact Dataframe come from the full definition
+            await asyncio.gather(self.__get_metadata('/v1/FieldDefinitions'), self.__get_metadata('/v1/FieldMappings'))
+        return self.api._assemble_data(data_pull_chunks, dtype=dtype, compact=compact, float_dtype=float_dtype,
+                                       pull_stats=pull)
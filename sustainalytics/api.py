@@ -1,10 +1,35 @@
 import requests
 import pandas as pd
 from pandas.io.json import json_normalize
-from time import time
+from time import time, perf_counter
+from datetime import datetime
 from tqdm import tqdm
 import numpy as np
+import os
+import json
 import itertools
+import copy
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from sustainalytics.transport import SessionTransport
+from sustainalytics.auth import TokenManager
+from sustainalytics.cache import MetadataCache
+from sustainalytics.export import get_sink, MANIFEST_NAME
+from sustainalytics.checkpoint import CheckpointJournal, chunk_key
+from sustainalytics.retry import RetryPolicy, parse_retry_after, REAUTHENTICATE, GIVE_UP
+from sustainalytics.stats import PullStats, Instrumentation, request_bytes
+from sustainalytics.snapshot import SnapshotStore
+from sustainalytics.chunking import AdaptiveChunker
+from sustainalytics.decoding import loads, field_frame
+from sustainalytics.compact import compact_frame, field_types_from_definition, FIELD_TYPE_COLUMNS
+from sustainalytics.identifiers import IdentifierIndex
+from sustainalytics.universe import UniverseIndex
+from sustainalytics.reports import report_url, report_url_expiry, report_version, ReportStore
+from sustainalytics.sharding import SHARD_NAME, shard_identifiers, merge_pull_stats, export_shard
 
 
 # pd.set_option('display.max_columns', None)
@@ -19,16 +44,37 @@ class API(object):
     client_secretkey : str
         a special key provided by sustainalytics to client for authentication and authorization
     access_headers : dict
-        a dictionary managing the api tokens
+        a dictionary managing the api tokens, requested on first access
+    token_manager : TokenManager
+        requests the access token, refreshes it before it expires and shares it across threads and processes
+    retry_policy : RetryPolicy
+        decides which failed requests are retried and the backoff between the attempts
+    rate_limiter : RateLimiter
+        token bucket every request waits on, None does not limit the rate
+    last_pull_stats : PullStats
+        requests, retries and re-authentications of the last pull started, a convenience for one pull at a time:
+        concurrent pulls read their own statistics from the attrs of their Dataframe or their pull_stats
+    instrumentation : Instrumentation
+        latency histograms, bytes, retries and chunk sizes of every request per endpoint, and its hooks
+    base_url : str
+        root url of the API
+    transport : Transport
+        sends the requests, by default a pooled session shared by every endpoint
+    metadata_cache : MetadataCache
+        caches FieldDefinitions, FieldMappings and FieldMappingDefinitions for its ttl
+    report_url_cache : MetadataCache
+        caches the PDF report links until they expire
     fieldIds : list
         a list of identifiers i.e. ISINs, CUSIPs, SEDOLs, Entity Ids(Sustainalytics).
     universe_of_access : dataframe/json
         a collection of EntityIds and universe the client can access.
+    universe_index : UniverseIndex
+        sorted EntityIds of every universe of access for membership and set queries, built on first access
     productIDs : list
-        a list of productIds the client can access
+        a list of productIds the client can access, fetched on first access
 
     full_definition : dataframe/json
-        a collection of the field definitions and more so product, package and cluster information
+        a collection of the field definitions and more so product, package and cluster information, built on first access
 
     Private Attributes
     ------------------
@@ -38,7 +84,15 @@ class API(object):
     Public Methods
     -----------------
     get_access_headers()
-        returns the access and authorization token to the api.
+        returns the access and authorization token to the api, refreshed when about to expire.
+    warm()
+        preloads the access token, productIDs and full_definition.
+    close()
+        releases the connections held by the transport.
+    invalidate_metadata()
+        drops the cached reference endpoints so they are fetched again.
+    stats()
+        :returns a snapshot of the per endpoint request statistics and of the last pulls, see instrumentation.
 
     get_fieldIDs()
         :returns a list of fieldIds
@@ -69,6 +123,8 @@ class API(object):
         :returns a collection of entity ids and universe access of an account
     get_universe_entityIDs(dtype=json)
         :returns a list of entityIds the client can access
+    get_identifierIndex(path=None)
+        :returns an index resolving ISINs, CUSIPs, SEDOLs and EntityIds to the entities of the universe
     get_fullFieldDefinitions(dtype=json)
         :returns a collection of fieldDefinitions
     get_pdfReportService(dtype=json):
@@ -77,62 +133,213 @@ class API(object):
         :returns a collection of pdf information
     get_pdfReportUrl(identifier=None,reportId=None,dtype=json)
         :returns URL pdf link for an entityId and a reportId
-
-    get_data(dtype=json)
-        :returns a collections of sustainalytics data to the client.
+    get_pdfReportUrls(pairs, workers=8)
+        :returns the URL pdf links of many (identifier, reportId) pairs resolved concurrently, with their errors
+    download_pdfReports(pairs, path, workers=8)
+        :returns the manifest of the PDF reports streamed to a content-addressed store, unchanged ones are skipped
+
+    iter_data(dtype=json, chunk=50, workers=1, checkpoint=None, pull_stats=None)
+        :returns a generator yielding the data of every chunk as soon as it arrives, resuming from a checkpoint,
+        chunk='auto' sizes the chunks from the measured latency and payload.
+    get_data(dtype=json, workers=1, checkpoint=None, compact=False)
+        :returns a collections of sustainalytics data to the client, fetching chunks concurrently when workers > 1,
+        compact=True shrinks the Dataframe to float and categorical dtypes.
+    export_data(identifiers, path, format=parquet, resume=False, processes=1)
+        :returns the manifest of the partitioned dataset the chunks were streamed to,
+        processes > 1 splits the identifiers in shards exported by a pool of processes.
+    sync_data(identifiers, store)
+        :returns the entities added, removed or changed since the previous pull kept in the snapshot store.
     
     Private Methods
     --------------
     __process_fieldsdata(field):
         :returns a processed list of fieldIds
+    __fields_default():
+        :returns the NaN record of the entities without data, built once per client
+    __get_json(path, params=None, timeout=None):
+        :returns the decoded response of an endpoint
+    __get_metadata(path):
+        :returns the decoded response of a reference endpoint through the metadata cache
+    __export_sharded(identifiers, path, processes, shards, options, progress=True, transport_factory=None):
+        :returns the manifest combining the shards exported by a pool of processes
+
+    Protected Methods, shared with AsyncAPI
+    --------------
+    _metadata_key(path):
+        :returns the metadata cache key of an endpoint
+    _chunk_params(identifiers, chunk=50):
+        :returns the DataService parameters of every chunk
+    _process_chunk(temp_data, dtype=json, plan=None):
+        :returns the part of the get_data result of a fetched chunk
+    _assemble_data(data_pull_chunks, dtype=json, compact=False, pull_stats=None):
+        :returns the get_data result of the processed chunks
     --
     """
 
-    def __init__(self, client_id, client_secretkey):
+    def __init__(self, client_id, client_secretkey, base_url='https://api.sustainalytics.com', transport=None,
+                 pool_size=10, timeout=60, data_timeout=180, metadata_cache=None, token_cache=None,
+                 refresh_margin=60, retry_policy=None, rate_limiter=None, report_url_cache=None, instrumentation=None):
         """
         Initialize connection with the API with client id and client_secretkey
         :param client_id:
         :param client_secretkey:
+        :param base_url: root url of the API, can point to a local stand-in server
+        :param transport: Transport sending the requests, defaults to a pooled SessionTransport
+        :param pool_size: connections kept alive by the default transport
+        :param timeout: seconds before a metadata request is abandoned
+        :param data_timeout: seconds before a DataService request is abandoned
+        :param metadata_cache: MetadataCache of the reference endpoints, defaults to a one day in-memory cache
+        :param token_cache: json file sharing the access token with the other processes of the host
+        :param refresh_margin: seconds before its expiry when the access token is refreshed
+        :param retry_policy: RetryPolicy of the requests, defaults to 3 retries with exponential backoff and jitter
+        :param rate_limiter: RateLimiter every request waits on, share one across instances or give it a state_file
+                             to share it across processes, None does not limit the rate
+        :param report_url_cache: MetadataCache of the PDF report links until they expire, its ttl is the lifetime
+                                 of the links that do not tell their expiry, defaults to one hour in memory
+        :param instrumentation: Instrumentation recording the requests, share one across instances to aggregate them
         """
         self.client_id = client_id
         self.client_secretkey = client_secretkey
-        self.access_headers = self.get_access_headers()
+        self.base_url = base_url.rstrip('/')
+        self.transport = transport if transport is not None else SessionTransport(pool_size=pool_size)
+        self.timeout = timeout
+        self.data_timeout = data_timeout
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.report_url_cache = report_url_cache if report_url_cache is not None else MetadataCache(ttl=3600)
+        self.last_pull_stats = None
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self.token_manager = TokenManager(client_id, client_secretkey, self.transport, self.base_url, timeout=timeout,
+                                          refresh_margin=refresh_margin, cache_file=token_cache,
+                                          retry_policy=self.retry_policy)
+        self.__metadata_lock = threading.RLock()
+        # token, product ids and full definition are fetched on first access, see warm()
         self.fieldIds = None
+        self.fieldIds_default = None
         self.universe_of_access = None
-        self.productIDs = self.get_productIDs()
+        self.__productIDs = None
         # print(self.universe_of_access)
         #print(self.universe_of_access)
         self.__universe_entity_ids = None
+        self.__universe_index = None
         # full definition
-        self.full_definition = self.get_fullFieldDefinitions(dtype='dataframe')
+        self.__full_definition = None
+
+    @property
+    def access_headers(self):
+        """
+        Access headers of the client, the token is requested on first access and refreshed before it expires
+        :return: dict
+        """
+        return self.token_manager.headers()
+
+    @access_headers.setter
+    def access_headers(self, value):
+        """
+        Install the token of access headers obtained elsewhere, used until the API rejects it, None forgets the token
+        :param value: dict with an 'Authorization: Bearer <token>' header or None
+        """
+        if value is None:
+            self.token_manager.set_token(None)
+            return
+        authorization = value.get('Authorization', '')
+        if not authorization.startswith('Bearer '):
+            raise ValueError("access_headers should hold an 'Authorization: Bearer <token>' header.")
+        self.token_manager.set_token(authorization[len('Bearer '):])
+
+    @property
+    def productIDs(self):
+        """
+        Product ids of the client, fetched on first access
+        :return: list
+        """
+        if self.__productIDs is None:
+            with self.__metadata_lock:
+                if self.__productIDs is None:
+                    self.__productIDs = self.get_productIDs()
+        return self.__productIDs
+
+    @productIDs.setter
+    def productIDs(self, value):
+        self.__productIDs = value
+
+    @property
+    def full_definition(self):
+        """
+        Full field definitions of the client, built on first access
+        :return: dataframe
+        """
+        if self.__full_definition is None:
+            with self.__metadata_lock:
+                if self.__full_definition is None:
+                    self.__full_definition = self.get_fullFieldDefinitions(dtype='dataframe')
+        return self.__full_definition
+
+    @full_definition.setter
+    def full_definition(self, value):
+        self.__full_definition = value
+
+    @property
+    def universe_index(self):
+        """
+        Index of the universes of access, built on first access, invalidate_metadata() rebuilds it
+        :return: UniverseIndex
+        """
+        if self.__universe_index is None:
+            with self.__metadata_lock:
+                if self.__universe_index is None:
+                    universe_of_access = self.get_universe_access()
+                    self.universe_of_access = pd.DataFrame(universe_of_access)
+                    self.__universe_index = UniverseIndex.from_access(universe_of_access)
+        return self.__universe_index
+
+    def warm(self):
+        """
+        Preload the access token, product ids and full definition instead of waiting for their first access
+        :return: self
+        """
+        self.access_headers
+        self.productIDs
+        self.full_definition
+        return self
 
     def get_access_headers(self):
         """
-        Get token from the system
+        Get token from the system, a new token is only requested when the current one is missing or about to expire
         :return: access token
         """
-        try:
-            access_token_headers = {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Accept': 'application/json',
-            }
-
-            access_token_data = {
-                'grant_type': 'client_credentials',
-                'client_id': self.client_id,
-                'client_secret': self.client_secretkey
-            }
+        return self.token_manager.headers()
 
-            access_token = requests.post('https://api.sustainalytics.com/auth/token', headers=access_token_headers,
-                                         data=access_token_data,
-                                         ).json()['access_token']
+    def close(self):
+        """
+        Release the connections held by the transport
+        :return: None
+        """
+        self.transport.close()
 
-            access_headers = {
-                'Accept': 'text/json',
-                'Authorization': str('Bearer ' + access_token)}
-            return access_headers
-        except:
-            raise ConnectionError('API Access Error: Please ensure the client_id and secret_key are valid else reach-out to your account manager for support')
+    def invalidate_metadata(self):
+        """
+        Drop the cached reference endpoints of this client and what was derived from them, so they are fetched
+        and built again
+        :return: None
+        """
+        with self.__metadata_lock:
+            for path in ['/v1/FieldDefinitions', '/v1/FieldMappings', '/v1/FieldMappingDefinitions']:
+                self.metadata_cache.invalidate(self._metadata_key(path))
+            self.fieldIds = None
+            self.fieldIds_default = None
+            self.__productIDs = None
+            self.__full_definition = None
+            self.__universe_index = None
+
+    def stats(self):
+        """
+        Returns a snapshot of the request statistics per endpoint and of the last pulls,
+        instrumentation.to_json() exports it as json
+        :return: dict
+        """
+        return self.instrumentation.stats()
 
     def get_fieldIDs(self):
         """
@@ -169,24 +376,9 @@ class API(object):
         :return: requested Data formats
         """
 
-        try:
-
-            if dtype == 'json':
-                temp_data = requests.get('https://api.sustainalytics.com/v1/FieldDefinitions',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/FieldDefinitions',
-                                                      headers=self.access_headers, timeout=60).json())
-
-        except:
-            self.access_headers = self.get_access_headers()
-            if dtype == 'json':
-
-                temp_data = requests.get('https://api.sustainalytics.com/v1/FieldDefinitions',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/FieldDefinitions',
-                                                      headers=self.access_headers, timeout=60).json())
+        temp_data = self.__get_metadata('/v1/FieldDefinitions')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
         return temp_data
 
     def get_productIDs(self):
@@ -295,32 +487,12 @@ class API(object):
         :return: requested Data formats
         """
 
-        try:
-
-            if dtype == 'json':
-                temp_data = requests.get('https://api.sustainalytics.com/v1/FieldMappings',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = json_normalize(requests.get('https://api.sustainalytics.com/v1/FieldMappings',
-                                                        headers=self.access_headers, timeout=60).json())
-                # primary_meta_cols = temp_data.columns.tolist().remove('packages')
-                # temp_data = json_normalize(temp_data, record_path='packages', meta=primary_meta_cols)
-
-        except:
-            self.access_headers = self.get_access_headers()
-            if dtype == 'json':
-
-                temp_data = requests.get('https://api.sustainalytics.com/v1/FieldMappings',
-                                         headers=self.access_headers, timeout=60).json()
-
-            else:
-                temp_data = json_normalize(
-                    requests.get('https://api.sustainalytics.com/v1/FieldMappings', headers=self.access_headers,
-                                 timeout=60).json())
-
-                # JSON DENORMALIZATION
-                # primary_meta_cols = temp_data.columns.tolist().remove('packages')
-                # temp_data2 = json_normalize(temp_data,record_path='packages',meta=primary_meta_cols)
+        temp_data = self.__get_metadata('/v1/FieldMappings')
+        if dtype != 'json':
+            temp_data = json_normalize(temp_data)
+            # JSON DENORMALIZATION
+            # primary_meta_cols = temp_data.columns.tolist().remove('packages')
+            # temp_data = json_normalize(temp_data, record_path='packages', meta=primary_meta_cols)
         return temp_data
 
     def get_fieldMappingDefinitions(self, dtype='json'):
@@ -330,24 +502,9 @@ class API(object):
         :return: requested Data formats
         """
 
-        try:
-
-            if dtype == 'json':
-                temp_data = requests.get('https://api.sustainalytics.com/v1/FieldMappingDefinitions',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/FieldMappingDefinitions',
-                                                      headers=self.access_headers, timeout=60).json())
-
-        except:
-            self.access_headers = self.get_access_headers()
-            if dtype == 'json':
-
-                temp_data = requests.get('https://api.sustainalytics.com/v1/FieldMappingDefinitions',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/FieldMappingDefinitions',
-                                                      headers=self.access_headers, timeout=60).json())
+        temp_data = self.__get_metadata('/v1/FieldMappingDefinitions')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
         return temp_data
 
     def get_universe_access(self, dtype='json'):
@@ -356,38 +513,40 @@ class API(object):
         :param dtype: return type dataframe or json
         :return: json or dataframe
         """
-        try:
-
-            if dtype == 'json':
-                temp_data = requests.get('https://api.sustainalytics.com/v1/UniverseOfAccess',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/UniverseOfAccess',
-                                                      headers=self.access_headers, timeout=60).json())
-
-        except:
-            self.access_headers = self.get_access_headers()
-            if dtype == 'json':
-
-                temp_data = requests.get('https://api.sustainalytics.com/v1/UniverseOfAccess',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/UniverseOfAccess',
-                                                      headers=self.access_headers, timeout=60).json())
 
+        temp_data = self.__get_json('/v1/UniverseOfAccess')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
         return temp_data
 
     def get_universe_entityIDs(self, keep_duplicates=False):
         """
-        Returns a list of entityids in the Universe of Access for the client
+        Returns a list of entityids in the Universe of Access for the client, read from the universe of access
+        cached with universe_index
+        :param keep_duplicates: the entityids as UniverseOfAccess lists them, in their order and repeated within
+                                and across universes, else sorted and unique
         :return: list of entity ids
         """
-        self.universe_of_access = self.get_universe_access(dtype='dataframe')
-        self.__universe_entity_ids = list(itertools.chain.from_iterable(self.universe_of_access['entityIds'].tolist()))
+        universe_index = self.universe_index  # fetches universe_of_access on first access
         if keep_duplicates is True:
+            entity_ids = self.universe_of_access.get('entityIds', pd.Series(dtype=object))
+            self.__universe_entity_ids = list(itertools.chain.from_iterable(ids or [] for ids in entity_ids.tolist()))
             return self.__universe_entity_ids
         else:
-            return list(set(self.__universe_entity_ids))
+            return universe_index.entity_ids().tolist()
+
+    def get_identifierIndex(self, path=None):
+        """
+        Returns an IdentifierIndex of the universe of access, loaded from path when it was saved there before
+        :param path: json file of a saved index
+        :return: IdentifierIndex, index.save(path) persists what the pulls taught it
+        """
+        if path is not None and os.path.exists(path):
+            index = IdentifierIndex.load(path)
+        else:
+            index = IdentifierIndex()
+        index.set_universe(self.universe_index.entity_ids())
+        return index
 
     def __process_fieldsdata(self, field):
         """
@@ -395,29 +554,48 @@ class API(object):
         :return: new_dataframe
         """
         if not bool(field) or field is np.nan:
-            self.fieldIds = self.get_fieldIDs()
-            fieldstr = [str(i) for i in self.fieldIds]
-            self.fieldIds_default = dict.fromkeys(fieldstr, np.nan)
-            return self.fieldIds_default
+            return self.__fields_default()
         else:
             return field
 
-    def __process_definitions(self,value,src_df,match_length,src_id_name):
+    def __fields_default(self):
+        """
+        Returns the record of the entities without data, every fieldId set to NaN, built once per client
+        :return: dict
+        """
+        if self.fieldIds_default is None:
+            with self.__metadata_lock:
+                if self.fieldIds_default is None:
+                    self.fieldIds = self.get_fieldIDs()
+                    fieldstr = [str(i) for i in self.fieldIds]
+                    self.fieldIds_default = dict.fromkeys(fieldstr, np.nan)
+        return self.fieldIds_default
+
+    def __field_columns(self, fields):
+        """
+        Returns the fieldId columns of a chunk in the order they first appear in its records, the order of the
+        columns DataFrame.from_records gives
+        :param fields: processed fields of the chunk
+        :return: list of fieldIds as strings
+        """
+        return list(dict.fromkeys(key for field in fields for key in field))
+
+    def __process_definitions(self, field_ids, src_df, match_length, src_id_name):
         """
-        Process the definition file
-        :param value: definition id
-        :param src_df: dataframe file to lookup
+        Look up the definition of every fieldId by its prefix in a single join
+        :param field_ids: series of fieldIds
+        :param src_df: dataframe file to lookup, id column first and name column second
         :param match_length: 2, 4 ,6
         :param src_id_name: name of definition id
-        :return: id, idname
+        :return: ids, idnames
         """
-        value_str = str(value)[:match_length]
-        #print(src_df.columns)
-        temp_df = src_df[src_df[src_id_name]==int(value_str)].copy()
-        if len(temp_df)>=1:
-            return temp_df.iat[0,0],temp_df.iat[0,1]
-        else:
-            return None,None
+        prefix_keys = field_ids.astype(str).str[:match_length].astype(int)
+        # the first definition of a duplicated id wins
+        lookup = src_df.drop_duplicates(subset=src_id_name, keep='first').set_index(src_id_name).iloc[:, 0]
+        matched = prefix_keys.isin(lookup.index)
+        ids = prefix_keys.where(matched)
+        id_names = prefix_keys.map(lookup).where(matched, None)
+        return ids, id_names
 
     def get_fullFieldDefinitions(self,dtype='json'):
         """
@@ -429,9 +607,14 @@ class API(object):
         packages = self.get_packageInfo(dtype='dataframe')
         products = self.get_productsInfo(dtype='dataframe')
         #Go up the ladder
-        field_info['productId'],field_info['productName']= zip(*field_info.apply(lambda x:self.__process_definitions(x['fieldId'],products,2,'productId'),axis=1))
-        field_info['packageId'], field_info['packageName'] = zip(*field_info.apply(lambda x: self.__process_definitions(x['fieldId'], packages, 4, 'packageId'), axis=1))
-        field_info['fieldClusterId'], field_info['fieldClusterName'] = zip(*field_info.apply(lambda x: self.__process_definitions(x['fieldId'], field_cluster, 6, 'fieldClusterId'), axis=1))
+        field_info['productId'], field_info['productName'] = self.__process_definitions(field_info['fieldId'], products, 2, 'productId')
+        field_info['packageId'], field_info['packageName'] = self.__process_definitions(field_info['fieldId'], packages, 4, 'packageId')
+        field_info['fieldClusterId'], field_info['fieldClusterName'] = self.__process_definitions(field_info['fieldId'], field_cluster, 6, 'fieldClusterId')
+        # keep the type of the fields when the definitions provide it, see get_data(compact=True)
+        definitions = self.get_fieldDefinitions(dtype='dataframe')
+        for type_column in FIELD_TYPE_COLUMNS:
+            if type_column in definitions.columns and len(definitions) == len(field_info):
+                field_info[type_column] = definitions[type_column].values
         if dtype=='json':
             return field_info.to_json(orient='records')
         else:
@@ -442,24 +625,10 @@ class API(object):
         Get the PDF reports
         :return: info
         """
-        try:
-
-            if dtype == 'json':
-                temp_data = requests.get('https://api.sustainalytics.com/v1/ReportService',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/ReportService',
-                                                      headers=self.access_headers, timeout=60).json())
-
-        except:
-            self.access_headers = self.get_access_headers()
-            if dtype == 'json':
 
-                temp_data = requests.get('https://api.sustainalytics.com/v1/ReportService',
-                                         headers=self.access_headers, timeout=60).json()
-            else:
-                temp_data = pd.DataFrame(requests.get('https://api.sustainalytics.com/v1/ReportService',
-                                                      headers=self.access_headers, timeout=60).json())
+        temp_data = self.__get_json('/v1/ReportService')
+        if dtype != 'json':
+            temp_data = pd.DataFrame(temp_data)
         return temp_data
 
     def get_pdfReportUrl(self, identifier=None, reportId=None, dtype='json'):
@@ -470,32 +639,202 @@ class API(object):
         :return: json
         """
         temp_data = pd.DataFrame()
-        request_url = 'https://api.sustainalytics.com/v1/ReportService/url/'
         if identifier is not None and reportId is not None:
-            request_url = request_url + str(identifier).strip(' \t\n') + "/" + str(reportId).strip(' \t\n')
-            try:
-
-                if dtype == 'json':
-                    temp_data = requests.get(request_url,
-                                             headers=self.access_headers, timeout=60).json()
-                else:
-                    temp_data = pd.DataFrame(requests.get(request_url,
-                                                          headers=self.access_headers, timeout=60).json())
-
-            except:
-                self.access_headers = self.get_access_headers()
-                if dtype == 'json':
-
-                    temp_data = requests.get(request_url,
-                                             headers=self.access_headers, timeout=60).json()
-                else:
-                    temp_data = pd.DataFrame(requests.get(request_url,
-                                                          headers=self.access_headers, timeout=60).json())
+            request_path = '/v1/ReportService/url/' + str(identifier).strip(' \t\n') + "/" + str(reportId).strip(' \t\n')
+            temp_data = self.__get_json(request_path)
+            if dtype != 'json':
+                temp_data = pd.DataFrame(temp_data)
 
             return temp_data
         else:
             return temp_data
 
+    def get_pdfReportUrls(self, pairs, workers=8):
+        """
+        Resolve the URLs of many PDF reports concurrently, the links still valid in report_url_cache are not
+        requested again
+        :param pairs: list of (identifier, reportId) or dataframe with identifier and reportId columns
+        :param workers: number of links requested concurrently
+        :return: dataframe of identifier, reportId, url, expires_at, cached and error, one row per pair
+        """
+        assert workers >= 1, "Workers should be greater than or equal to 1."
+        if isinstance(pairs, pd.DataFrame):
+            pairs = list(zip(pairs['identifier'], pairs['reportId']))
+        pairs = [(str(identifier).strip(' \t\n'), str(reportId).strip(' \t\n')) for identifier, reportId in pairs]
+        unique_pairs = list(dict.fromkeys(pairs))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resolved = dict(zip(unique_pairs, executor.map(lambda pair: self.__resolve_report_url(*pair),
+                                                           unique_pairs)))
+        columns = ['identifier', 'reportId', 'url', 'expires_at', 'cached', 'error']
+        temp_data = pd.DataFrame([resolved[pair] for pair in pairs], columns=columns)
+        temp_data['expires_at'] = pd.to_datetime(temp_data['expires_at'], unit='s', utc=True)
+        return temp_data
+
+    def __resolve_report_url(self, identifier, reportId, refresh=False):
+        """
+        Returns the link of a PDF report, from report_url_cache while it has more than a minute to live
+        :param identifier: Sustainalytics Entity identifier
+        :param reportId: report ID
+        :param refresh: request the link even when it is cached
+        :return: dictionary of identifier, reportId, url, expires_at, cached, error and the response
+        """
+        path = '/v1/ReportService/url/' + identifier + '/' + reportId
+        key = self._metadata_key(path)
+        entry = self.report_url_cache.get(key)
+        if not refresh and entry is not None and entry['data']['expires_at'] - time() > 60:
+            return {'identifier': identifier, 'reportId': reportId, 'url': entry['data']['url'],
+                    'expires_at': entry['data']['expires_at'], 'cached': True, 'error': None,
+                    'response': entry['data']['response']}
+        try:
+            temp_data = self.__get_json(path)
+        except (requests.exceptions.RequestException, ValueError) as error:
+            return {'identifier': identifier, 'reportId': reportId, 'url': None, 'expires_at': None,
+                    'cached': False, 'error': '%s: %s' % (type(error).__name__, error)}
+        url = report_url(temp_data)
+        if url is None:
+            return {'identifier': identifier, 'reportId': reportId, 'url': None, 'expires_at': None,
+                    'cached': False, 'error': 'No report link in the response: %s' % str(temp_data)[:200]}
+        expires_at = report_url_expiry(temp_data, url, self.report_url_cache.ttl)
+        self.report_url_cache.set(key, {'url': url, 'expires_at': expires_at, 'response': temp_data})
+        return {'identifier': identifier, 'reportId': reportId, 'url': url, 'expires_at': expires_at,
+                'cached': False, 'error': None, 'response': temp_data}
+
+    def download_pdfReports(self, pairs, path, workers=8, chunk_size=1 << 16):
+        """
+        Download many PDF reports concurrently into a content-addressed ReportStore, every worker resolving a link
+        and streaming its body to disk chunk_size bytes at a time. A report whose version is stored is not
+        downloaded again, a stored report without known version is revalidated with its ETag/Last-Modified
+        :param pairs: list of (identifier, reportId) or dataframe with identifier and reportId columns
+        :param path: directory of the ReportStore
+        :param workers: number of reports downloaded concurrently
+        :param chunk_size: bytes read from the network at a time
+        :return: manifest of the run, also written next to the reports
+        """
+        assert workers >= 1, "Workers should be greater than or equal to 1."
+        if isinstance(pairs, pd.DataFrame):
+            pairs = list(zip(pairs['identifier'], pairs['reportId']))
+        pairs = list(dict.fromkeys((str(identifier).strip(' \t\n'), str(reportId).strip(' \t\n'))
+                                   for identifier, reportId in pairs))
+        store = ReportStore(path)
+        with tqdm(total=len(pairs)) as pbar:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.__download_report, store, identifier, reportId, chunk_size)
+                           for identifier, reportId in pairs]
+                for future in futures:
+                    future.add_done_callback(lambda f: pbar.update(1))
+                reports = [future.result() for future in futures]
+        store.save()
+
+        statuses = [report['status'] for report in reports]
+        manifest = {
+            'created': datetime.utcnow().isoformat() + 'Z',
+            'reports': reports,
+            'downloaded': statuses.count('downloaded'),
+            'unchanged': statuses.count('cached') + statuses.count('not_modified'),
+            'errors': statuses.count('error'),
+            'bytes_downloaded': sum(report['bytes'] or 0 for report in reports if report['status'] == 'downloaded'),
+        }
+        tmp_path = os.path.join(path, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w') as fh:
+            json.dump(manifest, fh, indent=2)
+        os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+        return manifest
+
+    def __download_report(self, store, identifier, reportId, chunk_size):
+        """
+        Resolve the link of a PDF report and stream it to the store unless the stored version is current
+        :param store: ReportStore
+        :param identifier: Sustainalytics Entity identifier
+        :param reportId: report ID
+        :param chunk_size: bytes read from the network at a time
+        :return: manifest entry of the report
+        """
+        report = {'identifier': identifier, 'reportId': reportId, 'entity': None, 'version': None, 'status': 'error',
+                  'sha256': None, 'bytes': None, 'path': None, 'error': None}
+        link = self.__resolve_report_url(identifier, reportId)
+        if link['error'] is not None:
+            report['error'] = link['error']
+            return report
+        response_items = link['response'] if isinstance(link['response'], list) else [link['response']]
+        entity = next((item['entityId'] for item in response_items
+                       if isinstance(item, dict) and item.get('entityId') is not None), identifier)
+        version = report_version(link['response'])
+        report['entity'] = str(entity)
+        entry = store.has(entity, reportId, version)
+        status = 'cached'
+        if entry is None:
+            previous = store.get(entity, reportId)
+            headers = {}
+            if previous is not None and previous['etag']:
+                headers['If-None-Match'] = previous['etag']
+            if previous is not None and previous['last_modified']:
+                headers['If-Modified-Since'] = previous['last_modified']
+            try:
+                response = self.__download(link['url'], headers)
+                if response.status_code == 403 and link['cached']:
+                    # the cached link expired early, resolve it once more
+                    response.close()
+                    link = self.__resolve_report_url(identifier, reportId, refresh=True)
+                    if link['error'] is not None:
+                        report['error'] = link['error']
+                        return report
+                    response = self.__download(link['url'], headers)
+                try:
+                    if response.status_code == 304 and previous is not None:
+                        entry = store.touch(entity, reportId)
+                        status = 'not_modified'
+                    else:
+                        response.raise_for_status()
+                        entry = store.write(entity, reportId, response.iter_content(chunk_size), version=version,
+                                            etag=response.headers.get('ETag'),
+                                            last_modified=response.headers.get('Last-Modified'))
+                        status = 'downloaded'
+                finally:
+                    response.close()
+            except (requests.exceptions.RequestException, IOError) as error:
+                report['error'] = '%s: %s' % (type(error).__name__, error)
+                return report
+        report.update({'version': entry['version'], 'status': status, 'sha256': entry['sha256'],
+                       'bytes': entry['bytes'], 'path': entry['path']})
+        return report
+
+    def __download(self, url, headers=None):
+        """
+        GET a report link as a stream, retrying connection errors and retryable statuses per the retry policy.
+        The links are presigned, no access token is sent
+        :param url: report link
+        :param headers: conditional request headers
+        :return: streamed response, to be closed by the caller
+        """
+        attempt = 0
+        while True:
+            start = perf_counter()
+            try:
+                response = self.transport.request('GET', url, headers=headers, timeout=self.data_timeout, stream=True)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+                self.instrumentation.record_request('ReportDownload', perf_counter() - start, type(error).__name__)
+                decision, delay = self.retry_policy.decide(attempt)
+                if decision == GIVE_UP:
+                    raise
+                self.instrumentation.record_retry('ReportDownload', type(error).__name__)
+            else:
+                # the body is streamed, the latency is the time to the headers
+                self.instrumentation.record_request('ReportDownload', perf_counter() - start, response.status_code,
+                                                    bytes_sent=request_bytes(response, url),
+                                                    bytes_received=int(response.headers.get('Content-Length') or 0))
+                if response.status_code < 400:
+                    return response
+                # the links are presigned, a 401 is not an expired token
+                decision, delay = self.retry_policy.decide(
+                    attempt, response.status_code, parse_retry_after(response.headers.get('Retry-After')),
+                    reauthenticated=True)
+                if decision == GIVE_UP:
+                    return response
+                response.close()
+                self.instrumentation.record_retry('ReportDownload', response.status_code)
+            self.retry_policy.sleep(delay)
+            attempt += 1
+
     def get_pdfReportInfo(self, dtype='json'):
         """
         Returns a json of report IDs accessible to client
@@ -512,110 +851,617 @@ class API(object):
         else:
             return {'Message':'Client has no pdf report access'}
 
-    def get_data(self, identifiers, productIds=None, packageIds=None, fieldClusterIds=None, dtype='json', fieldIds=None,
-                 chunk=50):
+    def __send(self, path, access_token, params=None, timeout=None, headers=None, pull=None):
         """
-        Get bulk data via sustainalytics API
-        :return: json or Dataframe
+        GET an endpoint of the API through the transport with an access token, once the rate limiter allows it
+        :return: response
         """
-        data_pull_dt = pd.DataFrame()
-        data_pull_json = []
-        cntr = 0
-        chunk_size = chunk
-        assert chunk_size <= 100, "Chunk size should be less than or equal to 100."
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire()
+            if pull is not None:
+                pull.add_wait(waited)
+            if waited > 0:
+                self.instrumentation.record_throttle(path, waited)
+        request_headers = self.token_manager.headers(access_token)
+        request_headers.update(headers or {})
+        url = self.base_url + path
+        start = perf_counter()
+        try:
+            response = self.transport.request('GET', url, headers=request_headers, params=params, timeout=timeout)
+        except requests.exceptions.RequestException as error:
+            self.instrumentation.record_request(path, perf_counter() - start, type(error).__name__,
+                                                bytes_sent=len(url))
+            raise
+        self.instrumentation.record_request(path, perf_counter() - start, response.status_code,
+                                            bytes_sent=request_bytes(response, url, params),
+                                            bytes_received=len(response.content))
+        return response
+
+    def __get_response(self, path, params=None, timeout=None, headers=None, pull=None):
+        """
+        GET an endpoint of the API through the transport, retrying according to the retry policy.
+        A 401 invalidates the token and the request is sent once more with a new one.
+        :param path: endpoint path i.e. /v1/FieldDefinitions
+        :param params: query parameters
+        :param timeout: seconds before the request is abandoned, defaults to the API timeout
+        :param headers: headers sent on top of the access headers
+        :param pull: PullStats counting the requests, retries and re-authentications of a pull and holding its budget
+        :return: response
+        """
+        if timeout is None:
+            timeout = self.timeout
+        access_token = self.token_manager.get_token()
+        budget = pull.budget if pull is not None else None
+        attempt = 0
+        reauthenticated = False
+        while True:
+            if pull is not None:
+                pull.add_request()
+            try:
+                response = self.__send(path, access_token, params=params, timeout=timeout, headers=headers, pull=pull)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+                decision, delay = self.retry_policy.decide(attempt, budget=budget)
+                if decision == GIVE_UP:
+                    raise
+                reason = type(error).__name__
+            else:
+                if response.status_code < 400:
+                    return response
+                decision, delay = self.retry_policy.decide(
+                    attempt, response.status_code, parse_retry_after(response.headers.get('Retry-After')),
+                    reauthenticated=reauthenticated, budget=budget)
+                if decision == REAUTHENTICATE:
+                    # requests failing with the same stale token share a single refresh
+                    self.token_manager.invalidate(access_token)
+                    access_token = self.token_manager.get_token()
+                    reauthenticated = True
+                    if pull is not None:
+                        pull.add_reauth()
+                    self.instrumentation.record_reauth(path)
+                    continue
+                if decision == GIVE_UP:
+                    response.raise_for_status()
+                    return response
+                reason = response.status_code
+            if pull is not None:
+                pull.add_retry(reason)
+            self.instrumentation.record_retry(path, reason)
+            self.retry_policy.sleep(delay)
+            attempt += 1
+
+    def __get_json(self, path, params=None, timeout=None):
+        """
+        GET an endpoint of the API and decode its json
+        :param path: endpoint path i.e. /v1/FieldDefinitions
+        :param params: query parameters
+        :param timeout: seconds before the request is abandoned, defaults to the API timeout
+        :return: decoded json
+        """
+        return self.__get_response(path, params=params, timeout=timeout).json()
 
+    def _metadata_key(self, path):
+        """
+        Returns the cache key of a reference endpoint, metadata differs per url and client
+        :param path: endpoint path
+        :return: key
+        """
+        return self.base_url + path + '#' + str(self.client_id)
 
-        if len(identifiers) > 99:
-            identiers_group_list = [identifiers[i:i + chunk_size] for i in
-                                    range(0, len(identifiers), chunk_size)]
+    def __get_metadata(self, path):
+        """
+        GET a reference endpoint through the metadata cache.
+        A fresh entry is served without a request, a stale one is revalidated with its ETag/Last-Modified
+        :param path: endpoint path i.e. /v1/FieldMappings
+        :return: decoded json
+        """
+        key = self._metadata_key(path)
+        entry = self.metadata_cache.get(key)
+        if self.metadata_cache.is_fresh(entry):
+            return copy.deepcopy(entry['data'])
+
+        conditional_headers = {}
+        if entry is not None and entry.get('etag'):
+            conditional_headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.__get_response(path, headers=conditional_headers)
+        if response.status_code == 304 and entry is not None:
+            entry = self.metadata_cache.touch(key, entry)
         else:
-            identiers_group_list = [identifiers]
-
-        with tqdm(total=len(identiers_group_list)) as pbar:
-
-            for i, ids100 in enumerate(identiers_group_list):
-                start = time()
-                new_identifiers = ','.join([str(elem).strip() for elem in ids100])
-                params = (('identifiers', new_identifiers),)
-                # ADD THE PRODUCT ID
-                if productIds is not None and isinstance(productIds, list) and len(productIds) > 0:
-                    productIds_str = ','.join([str(elem) for elem in productIds])
+            entry = self.metadata_cache.set(key, response.json(), etag=response.headers.get('ETag'),
+                                            last_modified=response.headers.get('Last-Modified'))
+        return copy.deepcopy(entry['data'])
 
-                    params = params + (('productIds', productIds_str),)
-
-
-                # For packages ids
-                elif packageIds is not None and isinstance(packageIds, list) and len(packageIds) > 0:
-                    params = params + (('packageIds', packageIds),)
-
-                elif fieldClusterIds is not None and isinstance(fieldClusterIds, list) and len(fieldClusterIds) > 0:
-                    fieldClusterIds_str = ','.join([str(elem) for elem in fieldClusterIds])
-                    params = params + (('fieldClusterIds', fieldClusterIds_str),)
-                else:
-                    pass
-                    # params = params + (('fieldIds', fieldIDlist_str),)
-
-                # Prepare the cases of long fieldIds
-                # gET IN BATCHES OR in BULK
-                #CASE 1
-                #if fieldClusterIds is None and productIds is None and packageIds is None and fieldIds is None:
-                #CASE 2
-                # if fieldClusterIds is None and productIds is None and packageIds is None and fieldIds is None:
-                try:
-                    # Managing Dataframes
-                    requests_url = requests.get('https://api.sustainalytics.com/v1/DataService',
-                                                headers=self.access_headers, params=params, timeout=180).json()
-                    if dtype == 'json':
-                        temp_data = requests_url
+    def __fetch_chunk(self, params, pull=None):
+        """
+        Request a single chunk of identifiers from the DataService, measuring its size, duration and payload
+        :param params: request parameters of the chunk
+        :param pull: PullStats of the pull the chunk belongs to, its chunker is told the measures
+        :return: json
+        """
+        start = perf_counter()
+        response = self.__get_response('/v1/DataService', params=params, timeout=self.data_timeout, pull=pull)
+        seconds = perf_counter() - start
+        size = params[0][1].count(',') + 1
+        self.instrumentation.record_chunk('/v1/DataService', size, seconds, len(response.content))
+        if pull is not None:
+            pull.add_chunk(size, len(response.content))
+            if pull.chunker is not None:
+                pull.chunker.observe(size, seconds, len(response.content))
+        # Managing Dataframes
+        return loads(response.content)
+
+    def _process_chunk(self, temp_data, dtype='json', plan=None):
+        """
+        Turn a fetched chunk into its part of the get_data result
+        :param temp_data: json returned by __fetch_chunk
+        :param dtype: dataframe or json
+        :param plan: ResolutionPlan fanning the records out to the identifiers asked for
+        :return: list of records or dataframe indexed by identifier
+        """
+        if plan is not None:
+            temp_data = plan.fan_out(temp_data)
+        if dtype == 'json':
+            return temp_data
 
-                    else:
-                        temp_data = pd.DataFrame(requests_url)
-                        # all_field_keys = set().union(*requests_url['fields'])
-                except:
-                    self.access_headers = self.get_access_headers()
-                    requests_url = requests.get('https://api.sustainalytics.com/v1/DataService',
-                                                headers=self.access_headers, params=params, timeout=180).json()
-
-                    if dtype == 'json':
-                        temp_data = requests_url
-                        # data_pull_json = data_pull_json+temp_data
-                    else:
-                        # all_field_keys = set().union(*requests_url['fields'])
-                        temp_data = pd.DataFrame(requests_url)
+        temp_data = pd.DataFrame(temp_data)
+        fields = [self.__process_fieldsdata(field) for field in temp_data['fields']]
+        temp_data['fields'] = fields
 
-                # print(requests_url)
+        # the columns are known up front, so every one is built straight from the records and aligned by position
+        columns = self.__field_columns(fields)
+        temp_fields = field_frame(fields, columns, index=temp_data.index)
+        temp_data = pd.concat([temp_data, temp_fields], axis=1)
+        return temp_data.set_index('identifier')
 
+    def __iter_chunks(self, indexed_params, workers=1, pbar=None, pull=None):
+        """
+        Fetch chunks, yielding them in request order
+        :param indexed_params: list of (index, request parameters) of the chunks to fetch
+        :param workers: number of chunks requested concurrently
+        :param pbar: progress bar advanced as the chunks arrive
+        :param pull: PullStats of the pull
+        :return: generator of (index, json)
+        """
+        if workers > 1:
+            # Chunks are fetched in parallel but yielded in request order,
+            # at most 2 * workers chunks are in flight so memory does not grow with the universe
+            executor = ThreadPoolExecutor(max_workers=workers)
+            pending = deque()
+            params_iter = iter(indexed_params)
+
+            def submit(index, params):
+                future = executor.submit(self.__fetch_chunk, params, pull)
+                if pbar is not None:
+                    future.add_done_callback(lambda f: pbar.update(1))
+                pending.append((index, future))
 
+            try:
+                for index, params in itertools.islice(params_iter, 2 * workers):
+                    submit(index, params)
+                while len(pending) > 0:
+                    index, future = pending.popleft()
+                    temp_data = future.result()
+                    for next_index, params in itertools.islice(params_iter, 1):
+                        submit(next_index, params)
+                    yield index, temp_data
+            finally:
+                for _, future in pending:
+                    future.cancel()
+                executor.shutdown(wait=True)
+        else:
+            for index, params in indexed_params:
+                temp_data = self.__fetch_chunk(params, pull)
+                if pbar is not None:
+                    pbar.update(1)
+                yield index, temp_data
 
-                if dtype == 'json':
-                    data_pull_json = data_pull_json + temp_data
-                    # print(data_pull_json)
+    def _chunk_params(self, identifiers, productIds=None, packageIds=None, fieldClusterIds=None, chunk=50):
+        """
+        Split the identifiers in chunks and prepare the DataService parameters of every chunk
+        :param identifiers: ISINs, CUSIPs, SEDOLs or EntityIds
+        :param chunk: identifiers per request
+        :return: list of request parameters
+        """
+        chunk_size = chunk
+        assert chunk_size <= 100, "Chunk size should be less than or equal to 100."
 
-                else:
+        if len(identifiers) > 99:
+            identiers_group_list = [identifiers[i:i + chunk_size] for i in
+                                    range(0, len(identifiers), chunk_size)]
+        else:
+            identiers_group_list = [identifiers]
 
-                    # temp_data['fields'] = temp_data['fields'].fillna('{}')
-                    temp_data['fields'] = temp_data['fields'].apply(self.__process_fieldsdata)
+        params_list = []
+        for i, ids100 in enumerate(identiers_group_list):
+            new_identifiers = ','.join([str(elem).strip() for elem in ids100])
+            params = (('identifiers', new_identifiers),)
+            # ADD THE PRODUCT ID
+            if productIds is not None and isinstance(productIds, list) and len(productIds) > 0:
+                productIds_str = ','.join([str(elem) for elem in productIds])
 
-                    temp_fields = pd.DataFrame.from_records(temp_data['fields'])
-                    temp_fields['identifier'] = temp_data['identifier']
-                    temp_fields = temp_fields.set_index('identifier')
-                    temp_data = temp_data.set_index('identifier')
-                    temp_fields = temp_data.join(temp_fields)
-                    data_pull_dt = data_pull_dt.append(temp_fields, sort=False)
+                params = params + (('productIds', productIds_str),)
 
-                    # data_pull_dt = data_pull_dt.append(temp_data, sort=False)
 
-                pbar.update(1)
+            # For packages ids
+            elif packageIds is not None and isinstance(packageIds, list) and len(packageIds) > 0:
+                params = params + (('packageIds', packageIds),)
 
-            end = time()
-            # print(end-start)
+            elif fieldClusterIds is not None and isinstance(fieldClusterIds, list) and len(fieldClusterIds) > 0:
+                fieldClusterIds_str = ','.join([str(elem) for elem in fieldClusterIds])
+                params = params + (('fieldClusterIds', fieldClusterIds_str),)
+            else:
+                pass
+                # params = params + (('fieldIds', fieldIDlist_str),)
+
+            # Prepare the cases of long fieldIds
+            # gET IN BATCHES OR in BULK
+            #CASE 1
+            #if fieldClusterIds is None and productIds is None and packageIds is None and fieldIds is None:
+            #CASE 2
+            # if fieldClusterIds is None and productIds is None and packageIds is None and fieldIds is None:
+            params_list.append(params)
+        return params_list
+
+    def __adaptive_params(self, identifiers, chunker, pull, productIds=None, packageIds=None, fieldClusterIds=None):
+        """
+        Prepare the DataService parameters of the chunks one at a time, every chunk sized by the chunker
+        when it is requested
+        :param chunker: AdaptiveChunker deciding the size of the chunks
+        :param pull: PullStats counting the chunks
+        :return: generator of (index, request parameters)
+        """
+        position = 0
+        index = 0
+        while position < len(identifiers):
+            size = chunker.next_size()
+            params, = self._chunk_params(identifiers[position:position + size], productIds=productIds,
+                                          packageIds=packageIds, fieldClusterIds=fieldClusterIds, chunk=size)
+            pull.chunks += 1
+            yield index, params
+            position += size
+            index += 1
+
+    def iter_data(self, identifiers, productIds=None, packageIds=None, fieldClusterIds=None, dtype='json',
+                  fieldIds=None, chunk=50, workers=1, checkpoint=None, identifier_index=None, pull_stats=None):
+        """
+        Stream bulk data via sustainalytics API, yielding every chunk as soon as it arrives and in request order
+        :param chunk: identifiers per request, or 'auto' / an AdaptiveChunker to size every request from the
+                      latency and payload of the previous ones
+        :param workers: number of chunks requested concurrently, 1 requests the chunks one after another
+        :param checkpoint: directory or CheckpointJournal persisting every chunk; chunks completed by an interrupted
+                           run of the same request are read back from it instead of being requested again. The
+                           journal is reset once every chunk was yielded, so the next run requests fresh data
+        :param identifier_index: IdentifierIndex requesting every entity once and dropping the identifiers outside
+                                 the universe, the records are fanned back out to the identifiers given
+        :param pull_stats: PullStats recording this pull, so its statistics are read while other pulls run
+                           concurrently, a new one by default; last_pull_stats refers to it too
+        :return: generator of json records lists or Dataframes indexed by identifier
+        """
+        assert workers >= 1, "Workers should be greater than or equal to 1."
+        plan = None
+        if identifier_index is not None:
+            plan = identifier_index.plan(identifiers)
+            identifiers = plan.identifiers
+        pull = pull_stats if pull_stats is not None else PullStats()
+        if pull.budget is None:
+            pull.budget = self.retry_policy.new_budget()
+        pull.plan = plan
+        self.last_pull_stats = pull
+        if chunk == 'auto' or isinstance(chunk, AdaptiveChunker):
+            if checkpoint is not None:
+                raise ValueError('Adaptive chunks change between runs and cannot be checkpointed, give a chunk size.')
+            for temp_data in self.__iter_adaptive(identifiers, productIds=productIds, packageIds=packageIds,
+                                                  fieldClusterIds=fieldClusterIds, dtype=dtype, workers=workers,
+                                                  chunker=chunk if chunk != 'auto' else AdaptiveChunker(), pull=pull):
+                yield temp_data
+            return
+        params_list = self._chunk_params(identifiers, productIds=productIds, packageIds=packageIds,
+                                          fieldClusterIds=fieldClusterIds, chunk=chunk)
+        journal = checkpoint
+        if checkpoint is not None and not isinstance(checkpoint, CheckpointJournal):
+            journal = CheckpointJournal(checkpoint)
+        keys = [chunk_key(params) for params in params_list]
+        completed = {}
+        if journal is not None:
+            for index, key in enumerate(keys):
+                entry = journal.completed(key)
+                if entry is not None:
+                    completed[index] = entry
+        missing = [(index, params) for index, params in enumerate(params_list) if index not in completed]
+        pull.chunks = len(params_list)
+
+        with tqdm(total=len(params_list)) as pbar:
+            pbar.update(len(completed))
+            fetched = self.__iter_chunks(missing, workers=workers, pbar=pbar, pull=pull)
+            try:
+                for index in range(len(params_list)):
+                    if index in completed:
+                        temp_data = journal.load(completed[index])
+                    else:
+                        _, temp_data = next(fetched)
+                        if journal is not None:
+                            journal.store(keys[index], index, temp_data)
+                    yield self._process_chunk(temp_data, dtype, plan=plan)
+                if journal is not None:
+                    # the pull completed, only an interrupted pull resumes from its journal
+                    journal.reset(remove_files=True)
+            finally:
+                fetched.close()
+
+    def __iter_adaptive(self, identifiers, productIds=None, packageIds=None, fieldClusterIds=None, dtype='json',
+                        workers=1, chunker=None, pull=None):
+        """
+        Stream bulk data in chunks sized by an AdaptiveChunker, the decisions are in the statistics of the pull
+        :param pull: PullStats of the pull, its plan drops and fans out the identifiers
+        :return: generator of json records lists or Dataframes indexed by identifier
+        """
+        plan = pull.plan
+        pull.chunker = chunker
+        indexed_params = self.__adaptive_params(identifiers, chunker, pull, productIds=productIds,
+                                                packageIds=packageIds, fieldClusterIds=fieldClusterIds)
+        with tqdm(total=len(identifiers), unit='ids') as pbar:
+            fetched = self.__iter_chunks(indexed_params, workers=workers, pull=pull)
+            try:
+                for _, temp_data in fetched:
+                    pbar.update(len(temp_data))
+                    yield self._process_chunk(temp_data, dtype, plan=plan)
+            finally:
+                fetched.close()
 
+    def get_data(self, identifiers, productIds=None, packageIds=None, fieldClusterIds=None, dtype='json', fieldIds=None,
+                 chunk=50, workers=1, checkpoint=None, compact=False, float_dtype='float32', identifier_index=None):
+        """
+        Get bulk data via sustainalytics API
+        :param chunk: identifiers per request, or 'auto' to size every request from the previous ones
+        :param workers: number of chunks requested concurrently, 1 requests the chunks one after another
+        :param checkpoint: directory persisting every chunk so a failed pull re-run fetches only the missing chunks,
+                           cleared once the pull completed
+        :param compact: Dataframe with numeric fields as float_dtype plus '<fieldId>_sentinel' categoricals and text
+                        fields as categoricals, attrs['compact'] reports the memory before and after
+        :param float_dtype: float32 or float64, the dtype of the numeric fields of a compact Dataframe
+        :param identifier_index: IdentifierIndex requesting every entity once and dropping the identifiers outside
+                                 the universe, see get_identifierIndex()
+        :return: json or Dataframe, the statistics of the pull are in the Dataframe attrs and last_pull_stats
+        """
+        start = perf_counter()
+        pull = PullStats()
+        # every chunk is processed once and combined at the end, never re-copying what was accumulated
+        data_pull_chunks = list(self.iter_data(identifiers, productIds=productIds, packageIds=packageIds,
+                                               fieldClusterIds=fieldClusterIds, dtype=dtype, fieldIds=fieldIds,
+                                               chunk=chunk, workers=workers, checkpoint=checkpoint,
+                                               identifier_index=identifier_index, pull_stats=pull))
+        end = perf_counter()
+        self.instrumentation.record_pull('get_data', end - start, pull.as_dict())
+        return self._assemble_data(data_pull_chunks, dtype=dtype, compact=compact, float_dtype=float_dtype,
+                                   pull_stats=pull)
+
+    def _assemble_data(self, data_pull_chunks, dtype='json', compact=False, float_dtype='float32', pull_stats=None):
+        """
+        Combine the processed chunks of a pull into the get_data result
+        :param data_pull_chunks: list of the parts returned by _process_chunk, in request order
+        :param dtype: dataframe or json
+        :param compact: shrink the Dataframe, see get_data()
+        :param float_dtype: float32 or float64
+        :param pull_stats: PullStats of the pull, set as attrs['pull_stats'] of the Dataframe
+        :return: json or Dataframe
+        """
         # print(type(data_pull_json))
         if dtype == 'json':
 
-            return data_pull_json
-        else:
+            return list(itertools.chain.from_iterable(data_pull_chunks))
+        elif len(data_pull_chunks) > 0:
             # data_pull_dt.drop_duplicates(inplace=True)
-            return data_pull_dt
+            data_pull_dt = pd.concat(data_pull_chunks, sort=False)
+        else:
+            data_pull_dt = pd.DataFrame()
+        if compact and len(data_pull_dt) > 0:
+            data_pull_dt = compact_frame(data_pull_dt, set(self.__fields_default()),
+                                         field_types=field_types_from_definition(self.full_definition),
+                                         float_dtype=float_dtype)
+        if pull_stats is not None:
+            data_pull_dt.attrs['pull_stats'] = pull_stats.as_dict()
+        return data_pull_dt
+
+    def __requested_field_columns(self, productIds=None, packageIds=None, fieldClusterIds=None):
+        """
+        Returns the fieldIds a DataService request returns, following the precedence of the request parameters
+        :return: list of fieldIds as strings
+        """
+        field_ids = [str(field_id) for field_id in self.get_fieldIDs()]
+        for ids, match_length in [(productIds, 2), (packageIds, 4), (fieldClusterIds, 6)]:
+            if ids is not None and isinstance(ids, list) and len(ids) > 0:
+                prefixes = set(str(elem) for elem in ids)
+                return [field_id for field_id in field_ids if field_id[:match_length] in prefixes]
+        return field_ids
+
+    def export_data(self, identifiers, path, format='parquet', productIds=None, packageIds=None, fieldClusterIds=None,
+                    fieldIds=None, chunk=50, workers=1, resume=False, processes=1, shards=None, progress=True,
+                    transport_factory=None, field_layout='typed'):
+        """
+        Stream bulk data via sustainalytics API straight to a partitioned dataset on disk, one partition per chunk,
+        so the memory used does not depend on the size of the universe
+        :param path: directory of the dataset
+        :param format: parquet or arrow (dataframe chunks, requires pyarrow), ndjson (json records)
+        :param workers: number of chunks requested concurrently, by every process of a sharded pull
+        :param resume: keep the partitions a previous run of the same request completed and fetch only the missing
+                       ones, else the partitions of previous runs are deleted
+        :param processes: processes decoding and writing the chunks, above 1 the identifiers are split in shards
+                          exported to shard-NNNNN directories by a pool of processes sharing the token and metadata
+                          of this client through files; read the combined dataset with export.load_dataset
+        :param shards: number of shards of a sharded pull, defaults to processes, more shards balance the processes
+        :param progress: show a progress bar
+        :param transport_factory: picklable callable returning the Transport of every process of a sharded pull,
+                                  i.e. functools.partial(ReplayTransport, path) of benchmarks.cassette, required
+                                  when this client has a transport other than the default SessionTransport
+        :param field_layout: typed writes every field as a float64 column and a '<fieldId>_sentinel' dictionary
+                             column of its sentinels and other text, except the fields the definitions declare text,
+                             written as text like every field with the text layout; parquet and arrow only
+        :return: manifest of the dataset
+        """
+        if not isinstance(chunk, int):
+            raise ValueError('Exported partitions are resumed by chunk, give a chunk size.')
+        if processes > 1:
+            options = {'format': format, 'productIds': productIds, 'packageIds': packageIds,
+                       'fieldClusterIds': fieldClusterIds, 'chunk': chunk, 'workers': workers, 'resume': resume,
+                       'field_layout': field_layout}
+            return self.__export_sharded(identifiers, path, processes, shards or processes, options, progress,
+                                         transport_factory)
+        dtype = 'json' if format == 'ndjson' else 'dataframe'
+        field_columns = None
+        field_types = None
+        if dtype == 'dataframe':
+            field_columns = self.__requested_field_columns(productIds=productIds, packageIds=packageIds,
+                                                           fieldClusterIds=fieldClusterIds)
+            if field_layout == 'typed':
+                field_types = field_types_from_definition(self.full_definition)
+        sink = get_sink(path, format=format, field_columns=field_columns, field_types=field_types,
+                        field_layout=field_layout)
+        # the journal lives next to the partitions it records
+        journal = CheckpointJournal(path)
+        if not resume:
+            journal.reset()
+            sink.clear()
+
+        params_list = self._chunk_params(identifiers, productIds=productIds, packageIds=packageIds,
+                                          fieldClusterIds=fieldClusterIds, chunk=chunk)
+        keys = [chunk_key(params) for params in params_list]
+        missing = []
+        for index, params in enumerate(params_list):
+            entry = journal.completed(keys[index])
+            if entry is not None:
+                sink.add_partition(entry['path'], entry['records'])
+            else:
+                missing.append((index, params))
 
+        pull = PullStats(chunks=len(params_list), budget=self.retry_policy.new_budget())
+        self.last_pull_stats = pull
 
+        start = perf_counter()
+        with tqdm(total=len(params_list), disable=not progress) as pbar:
+            pbar.update(len(params_list) - len(missing))
+            for index, temp_data in self.__iter_chunks(missing, workers=workers, pbar=pbar, pull=pull):
+                partition = sink.write(self._process_chunk(temp_data, dtype), number=index)
+                journal.record(keys[index], index, partition['path'], partition['records'])
+        self.instrumentation.record_pull('export_data', perf_counter() - start, pull.as_dict())
+
+        return sink.close(identifiers=len(identifiers), productIds=productIds, packageIds=packageIds,
+                          fieldClusterIds=fieldClusterIds, stats=pull.as_dict())
+
+    def __export_sharded(self, identifiers, path, processes, shards, options, progress=True, transport_factory=None):
+        """
+        Export a pull split in shards of whole chunks, every shard fetched, decoded and written to its own dataset
+        by a process of the pool. The processes start with the token and metadata of this client, shared through
+        temporary files, send their requests through their own pooled session or the transport of transport_factory
+        and split an in-memory rate limiter between them; only the manifests of the shards come back to be combined
+        :param processes: size of the process pool
+        :param shards: number of shards
+        :param options: keyword arguments of export_data of every shard
+        :param progress: show a progress bar of the identifiers exported
+        :param transport_factory: picklable callable returning the Transport of every process
+        :return: manifest of the dataset, listing the partitions of every shard
+        """
+        if transport_factory is None and type(self.transport) is not SessionTransport:
+            raise ValueError('The processes of a sharded export cannot use the %s of this client, give a '
+                             'transport_factory building one per process.' % type(self.transport).__name__)
+        identifier_shards = shard_identifiers(identifiers, shards, options['chunk'])
+        processes = max(1, min(processes, len(identifier_shards)))
+        start = perf_counter()
+        sink = get_sink(path, format=options['format'], field_columns=[], field_layout=options['field_layout'])
+        if not options['resume']:
+            # the partitions and shards of previous runs would be read as part of the dataset
+            sink.clear()
+            shard_names = set(SHARD_NAME % number for number in range(len(identifier_shards)))
+            for name in os.listdir(path):
+                if name.startswith('shard-') and name not in shard_names:
+                    shutil.rmtree(os.path.join(path, name))
+        self.warm()
+        shared_dir = tempfile.mkdtemp(prefix='sustainalytics-')
+        try:
+            token_cache = self.token_manager.cache_file or os.path.join(shared_dir, 'token.json')
+            self.token_manager.share(token_cache)
+            rate_limiter = self.rate_limiter
+            if rate_limiter is not None:
+                if rate_limiter.state_file is None:
+                    rate_limiter = (rate_limiter.rate / processes, max(1.0, rate_limiter.capacity / processes), None)
+                else:
+                    rate_limiter = (rate_limiter.rate, rate_limiter.capacity, rate_limiter.state_file)
+            settings = {
+                'client_id': self.client_id, 'client_secretkey': self.client_secretkey, 'base_url': self.base_url,
+                'pool_size': options['workers'], 'timeout': self.timeout, 'data_timeout': self.data_timeout,
+                'metadata_cache': self.__share_metadata(os.path.join(shared_dir, 'metadata')),
+                'token_cache': token_cache, 'refresh_margin': self.token_manager.refresh_margin,
+                'retry_policy': self.retry_policy, 'rate_limiter': rate_limiter, 'transport_factory': transport_factory,
+            }
+            results = [None] * len(identifier_shards)
+            # spawned processes do not inherit the threads and connections of this one
+            with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool, \
+                    tqdm(total=len(identifiers), unit='ids', disable=not progress) as pbar:
+                futures = {pool.submit(export_shard, settings, shard, os.path.join(path, SHARD_NAME % number),
+                                       options): number
+                           for number, shard in enumerate(identifier_shards)}
+                try:
+                    for future in as_completed(futures):
+                        number = futures[future]
+                        results[number] = future.result()
+                        pbar.update(len(identifier_shards[number]))
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+        shard_entries = []
+        for number, result in enumerate(results):
+            name = SHARD_NAME % number
+            for partition in result['manifest']['partitions']:
+                sink.add_partition(name + '/' + partition['path'], partition['records'])
+            shard_entries.append({'path': name, 'identifiers': len(identifier_shards[number]),
+                                  'records': result['manifest']['records'], 'token_requests': result['token_requests'],
+                                  'stats': result['manifest']['stats']})
+        stats = merge_pull_stats([entry['stats'] for entry in shard_entries])
+        self.instrumentation.record_pull('export_data', perf_counter() - start, stats)
+        return sink.close(identifiers=len(identifiers), productIds=options['productIds'],
+                          packageIds=options['packageIds'], fieldClusterIds=options['fieldClusterIds'],
+                          processes=processes, shards=shard_entries, stats=stats)
+
+    def __share_metadata(self, cache_dir):
+        """
+        Returns the metadata cache of the processes of a sharded pull: the cache directory of this client, or a
+        directory the reference endpoints cached in memory are copied to
+        :param cache_dir: directory of the copy
+        :return: ttl, cache directory
+        """
+        if self.metadata_cache.cache_dir is not None:
+            return self.metadata_cache.ttl, self.metadata_cache.cache_dir
+        shared = MetadataCache(ttl=self.metadata_cache.ttl, cache_dir=cache_dir)
+        for path in ('/v1/FieldDefinitions', '/v1/FieldMappings', '/v1/FieldMappingDefinitions'):
+            key = self._metadata_key(path)
+            entry = self.metadata_cache.get(key)
+            if entry is not None:
+                shared.set(key, entry['data'], etag=entry['etag'], last_modified=entry['last_modified'])
+        return shared.ttl, cache_dir
+
+    def sync_data(self, identifiers, store, productIds=None, packageIds=None, fieldClusterIds=None, chunk=50,
+                  workers=1, marker_key=None):
+        """
+        Pull bulk data via sustainalytics API and compare it with the previous pull kept in a snapshot store,
+        persisting only the entities added, removed or changed since then. Every identifier is still requested:
+        the snapshot saves the disk writes of the unchanged entities, not the requests
+        :param store: directory or SnapshotStore holding the previous pull of the same request
+        :param workers: number of chunks requested concurrently
+        :param marker_key: record key holding a last-updated marker of the entities, used when store is a
+                           directory; an entity whose marker did not move is taken as unchanged without hashing
+                           its fields, it is requested all the same
+        :return: SnapshotDelta, also written to the store as newline delimited json
+        """
+        if not isinstance(store, SnapshotStore):
+            store = SnapshotStore(store, marker_key=marker_key)
+        params = {'productIds': productIds, 'packageIds': packageIds, 'fieldClusterIds': fieldClusterIds}
+        chunks = self.iter_data(identifiers, productIds=productIds, packageIds=packageIds,
+                                fieldClusterIds=fieldClusterIds, dtype='json', chunk=chunk, workers=workers)
+        delta = store.compare(itertools.chain.from_iterable(chunks), params)
+        store.commit(delta)
+        return delta
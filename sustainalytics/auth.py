@@ -0,0 +1,275 @@
+"""
+Manages the access token of the API: requested once, shared by all threads and refreshed before it expires.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import requests
+from time import time
+from sustainalytics.filelock import FileLock
+from sustainalytics.retry import RetryPolicy, parse_retry_after, GIVE_UP
+
+
+class TokenManager(object):
+    """
+    TokenManager owns the access token of a client.
+
+    The token is refreshed refresh_margin seconds before the expires_in announced by /auth/token, and concurrent
+    refreshes are deduplicated behind a lock. With a cache_file the token is also shared by the processes of the
+    host: the first process to refresh writes it and the others read it instead of requesting their own.
+
+    Public Attributes
+    -----------------
+    refresh_margin : int
+        seconds before the expiry when the token is refreshed
+    cache_file : str
+        json file sharing the token across processes, None keeps it in memory only
+    refresh_count : int
+        number of tokens requested by this manager
+    retry_policy : RetryPolicy
+        retries the token requests failing with a connection error, a timeout or a retryable status
+
+    Public Methods
+    -----------------
+    get_token()
+        :returns a valid access token, refreshing it when needed
+    cached_token()
+        :returns the current token while it is valid without requesting one, else None
+    headers(access_token=None)
+        :returns the access headers of the API
+    refresh()
+        :returns a newly requested token
+    invalidate(stale_token)
+        forgets a token the API rejected, unless another thread already replaced it
+    set_token(access_token, expires_at=None)
+        installs a token obtained elsewhere, None forgets the current one
+    share(cache_file)
+        :returns the current token, written to a cache file so the processes reading it do not request their own
+    """
+
+    def __init__(self, client_id, client_secretkey, transport, base_url, timeout=60, refresh_margin=60,
+                 cache_file=None, retry_policy=None):
+        """
+        :param client_id: client id of the account
+        :param client_secretkey: secret key of the account
+        :param transport: Transport sending the token request
+        :param base_url: root url of the API
+        :param timeout: seconds before the token request is abandoned
+        :param refresh_margin: seconds before the expiry when the token is refreshed
+        :param cache_file: json file sharing the token across processes
+        :param retry_policy: RetryPolicy of the token requests, defaults to RetryPolicy()
+        """
+        self.client_id = client_id
+        self.client_secretkey = client_secretkey
+        self.transport = transport
+        self.base_url = base_url
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.cache_file = cache_file
+        self.refresh_count = 0
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.__token = None
+        self.__lock = threading.RLock()
+        # a cache file may be shared by several clients, entries are told apart by their key
+        self.__cache_key = hashlib.sha1((base_url + '#' + str(client_id)).encode('utf-8')).hexdigest()
+
+    def __is_valid(self, token):
+        """
+        Returns True when the token exists and is not about to expire
+        :param token: dict with access_token and expires_at
+        :return: boolean
+        """
+        if token is None:
+            return False
+        return token['expires_at'] is None or time() < token['expires_at'] - self.refresh_margin
+
+    def get_token(self):
+        """
+        Returns a valid access token, refreshing it when it is missing or about to expire
+        :return: str
+        """
+        token = self.__token
+        if self.__is_valid(token):
+            return token['access_token']
+        with self.__lock:
+            if not self.__is_valid(self.__token):
+                self.__token = self.__shared_refresh()
+            return self.__token['access_token']
+
+    def cached_token(self):
+        """
+        Returns the current access token while it is valid, without any request or lock
+        :return: str or None
+        """
+        token = self.__token
+        return token['access_token'] if self.__is_valid(token) else None
+
+    def headers(self, access_token=None):
+        """
+        Returns the access headers of the API
+        :param access_token: token to send, defaults to the current valid token
+        :return: dict
+        """
+        if access_token is None:
+            access_token = self.get_token()
+        return {
+            'Accept': 'text/json',
+            'Authorization': str('Bearer ' + access_token)}
+
+    def refresh(self):
+        """
+        Request a new token, replacing the current one
+        :return: str
+        """
+        with self.__lock:
+            if self.cache_file is None:
+                self.__token = self.__request_token()
+            else:
+                with FileLock(self.cache_file + '.lock'):
+                    self.__token = self.__request_token()
+                    self.__write_cache(self.__token)
+            return self.__token['access_token']
+
+    def invalidate(self, stale_token):
+        """
+        Forget a token the API rejected. Threads failing with the same stale token only cause one refresh,
+        the ones arriving after the refresh keep the new token
+        :param stale_token: access token sent by the rejected request
+        :return: None
+        """
+        with self.__lock:
+            if self.__token is not None and self.__token['access_token'] == stale_token:
+                self.__token = None
+                if self.cache_file is not None:
+                    with FileLock(self.cache_file + '.lock'):
+                        cached = self.__read_cache()
+                        if cached is not None and cached['access_token'] == stale_token:
+                            os.remove(self.cache_file)
+
+    def set_token(self, access_token, expires_at=None):
+        """
+        Install a token obtained elsewhere, used until it expires or the API rejects it
+        :param access_token: access token, None forgets the current token so the next access requests one
+        :param expires_at: epoch seconds of the expiry, None when unknown
+        :return: None
+        """
+        with self.__lock:
+            self.__token = None if access_token is None else {'access_token': access_token, 'expires_at': expires_at}
+
+    def share(self, cache_file):
+        """
+        Write the current token to a cache file, i.e. before starting processes reading it as their token_cache
+        :param cache_file: json file read by the other processes
+        :return: str
+        """
+        with self.__lock:
+            access_token = self.get_token()
+            if cache_file != self.cache_file:  # a token of the own cache file is already in it
+                with FileLock(cache_file + '.lock'):
+                    self.__write_cache(self.__token, cache_file)
+            return access_token
+
+    def __shared_refresh(self):
+        """
+        Returns the token of the cache file when another process refreshed it, else requests and shares a new one
+        :return: token
+        """
+        if self.cache_file is None:
+            return self.__request_token()
+        with FileLock(self.cache_file + '.lock'):
+            cached = self.__read_cache()
+            if self.__is_valid(cached):
+                return cached
+            token = self.__request_token()
+            self.__write_cache(token)
+            return token
+
+    def __request_token(self):
+        """
+        Request a token from /auth/token, retrying the connection errors, timeouts and retryable statuses
+        according to the retry policy
+        :return: dict with access_token and expires_at
+        """
+        access_token_headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json',
+        }
+
+        access_token_data = {
+            'grant_type': 'client_credentials',
+            'client_id': self.client_id,
+            'client_secret': self.client_secretkey
+        }
+
+        url = self.base_url + '/auth/token'
+        attempt = 0
+        while True:
+            requested_at = time()
+            try:
+                response = self.transport.request('POST', url, headers=access_token_headers,
+                                                  data=access_token_data, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+                decision, delay = self.retry_policy.decide(attempt)
+                if decision == GIVE_UP:
+                    raise ConnectionError('API Access Error: the token request to %s failed: %s' % (url, error)) \
+                        from error
+            except requests.exceptions.RequestException as error:
+                raise ConnectionError('API Access Error: the token request to %s failed: %s' % (url, error)) from error
+            else:
+                if response.status_code in (400, 401):
+                    raise ConnectionError('API Access Error: Please ensure the client_id and secret_key are valid else '
+                                          'reach-out to your account manager for support')
+                if response.status_code < 400:
+                    break
+                decision, delay = self.retry_policy.decide(
+                    attempt, response.status_code, parse_retry_after(response.headers.get('Retry-After')),
+                    reauthenticated=True)
+                if decision == GIVE_UP:
+                    break
+            self.retry_policy.sleep(delay)
+            attempt += 1
+
+        try:
+            response.raise_for_status()
+            token_data = response.json()
+            access_token = token_data['access_token']
+        except requests.exceptions.RequestException as error:
+            raise ConnectionError('API Access Error: the token request to %s failed: %s' % (url, error)) from error
+        except (ValueError, KeyError) as error:
+            raise ConnectionError('API Access Error: the token response of %s holds no access_token' % url) from error
+
+        self.refresh_count += 1
+        expires_in = token_data.get('expires_in')
+        expires_at = requested_at + float(expires_in) if expires_in is not None else None
+        return {'access_token': access_token, 'expires_at': expires_at}
+
+    def __read_cache(self):
+        """
+        Returns the token of the cache file
+        :return: token or None
+        """
+        try:
+            with open(self.cache_file, 'r') as fh:
+                cached = json.load(fh)
+        except (IOError, ValueError):
+            return None
+        if cached.get('key') != self.__cache_key:
+            return None
+        return {'access_token': cached['access_token'], 'expires_at': cached['expires_at']}
+
+    def __write_cache(self, token, cache_file=None):
+        """
+        Share a token through the cache file, readable by the owner only
+        :param token: token
+        :param cache_file: file written, defaults to the cache file of the manager
+        :return: None
+        """
+        cache_file = cache_file if cache_file is not None else self.cache_file
+        if cache_file is None:
+            return
+        tmp_path = cache_file + '.%d.tmp' % os.getpid()
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as fh:
+            json.dump(dict(token, key=self.__cache_key), fh)
+        os.replace(tmp_path, cache_file)
@@ -0,0 +1,177 @@
+"""
+Caches the reference (metadata) endpoints of the API in memory and on disk.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from time import time
+
+
+class MetadataCache(object):
+    """
+    MetadataCache keeps the responses of the reference endpoints for a time to live.
+
+    An entry is a dictionary holding the decoded response (data), the time it was fetched (fetched_at)
+    and the validators returned by the server (etag, last_modified) used to revalidate a stale entry.
+
+    With a cache_dir shared by several processes, an entry kept in memory is served only while its file is
+    the one this process last read or wrote: an entry another process revalidated, replaced or invalidated
+    is read again from disk or dropped.
+
+    Public Attributes
+    -----------------
+    ttl : int
+        seconds an entry is served without contacting the API, one day by default
+    cache_dir : str
+        directory persisting the entries between processes, None keeps them in memory only
+
+    Public Methods
+    -----------------
+    get(key)
+        :returns the entry of the key or None
+    is_fresh(entry)
+        :returns True when the entry is younger than the ttl
+    set(key, data, etag=None, last_modified=None)
+        :returns the stored entry
+    touch(key, entry=None)
+        :returns the entry marked as fetched now, after a successful revalidation
+    invalidate(key=None)
+        drops an entry, or every entry when key is None
+    """
+
+    def __init__(self, ttl=86400, cache_dir=None):
+        """
+        Create the cache
+        :param ttl: seconds an entry is served without contacting the API
+        :param cache_dir: directory persisting the entries, None keeps them in memory only
+        """
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.__entries = {}
+        self.__versions = {}  # modification time and size of the file of every entry in memory
+        self.__lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __path(self, key):
+        """
+        Returns the file persisting a key
+        :param key: cache key
+        :return: file path
+        """
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    @staticmethod
+    def __version(path):
+        """
+        Returns the modification time and size of a file, None when it does not exist
+        :param path: file path
+        :return: tuple or None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, key):
+        """
+        Returns the entry of a key, loading it from disk when it is not in memory or another process changed it
+        :param key: cache key
+        :return: entry or None
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if self.cache_dir is None:
+                return entry
+            path = self.__path(key)
+            version = self.__version(path)
+            if version is None:
+                # never written, or invalidated by another process
+                self.__entries.pop(key, None)
+                self.__versions.pop(key, None)
+                return None
+            if entry is None or self.__versions.get(key) != version:
+                try:
+                    with open(path, 'r') as fh:
+                        entry = json.load(fh)
+                except (IOError, ValueError):
+                    return None
+                self.__entries[key] = entry
+                self.__versions[key] = version
+            return entry
+
+    def is_fresh(self, entry):
+        """
+        Returns True when the entry is younger than the ttl
+        :param entry: cache entry
+        :return: boolean
+        """
+        return entry is not None and time() - entry['fetched_at'] < self.ttl
+
+    def set(self, key, data, etag=None, last_modified=None):
+        """
+        Store the decoded response of a key
+        :param key: cache key
+        :param data: decoded json
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        :return: entry
+        """
+        entry = {'key': key, 'data': data, 'fetched_at': time(), 'etag': etag, 'last_modified': last_modified}
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__persist(key, entry)
+        return entry
+
+    def touch(self, key, entry=None):
+        """
+        Mark an entry as fetched now, the server confirmed it did not change
+        :param key: cache key
+        :param entry: entry the server confirmed, kept when another process invalidated the key meanwhile
+        :return: entry
+        """
+        with self.__lock:
+            entry = self.__entries.setdefault(key, entry)
+            entry['fetched_at'] = time()
+            self.__persist(key, entry)
+        return entry
+
+    def invalidate(self, key=None):
+        """
+        Drop an entry, or every entry when key is None
+        :param key: cache key
+        :return: None
+        """
+        with self.__lock:
+            keys = list(self.__entries.keys()) if key is None else [key]
+            for k in keys:
+                self.__entries.pop(k, None)
+                self.__versions.pop(k, None)
+            if self.cache_dir is not None:
+                if key is None:
+                    paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                             if name.endswith('.json')]
+                else:
+                    paths = [self.__path(key)]
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def __persist(self, key, entry):
+        """
+        Write an entry to disk, replacing the previous file atomically
+        :param key: cache key
+        :param entry: cache entry
+        :return: None
+        """
+        if self.cache_dir is None:
+            return
+        path = self.__path(key)
+        tmp_path = path + '.%d.tmp' % os.getpid()
+        with open(tmp_path, 'w') as fh:
+            json.dump(entry, fh)
+        os.replace(tmp_path, path)
+        self.__versions[key] = self.__version(path)
@@ -0,0 +1,143 @@
+"""
+Journal of the completed chunks of a pull, so an interrupted pull resumes where it stopped.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+
+JOURNAL_NAME = '_journal.ndjson'
+
+
+def chunk_key(params):
+    """
+    Returns the key of a chunk, the same request parameters always give the same key
+    :param params: DataService request parameters of the chunk
+    :return: str
+    """
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CheckpointJournal(object):
+    """
+    CheckpointJournal records which chunks of a pull completed and where their results were persisted.
+
+    The journal is an append-only newline delimited json file, one entry per completed chunk:
+    its key, request index, persisted file (relative to the journal directory) and record count.
+    A torn last line left by a crash is ignored.
+
+    Public Attributes
+    -----------------
+    path : str
+        directory holding the journal and the persisted chunks
+
+    Public Methods
+    -----------------
+    completed(key)
+        :returns the entry of a completed chunk whose result is still on disk, else None
+    record(key, index, path, records)
+        :returns the appended entry
+    store(key, index, data)
+        :returns the entry of a raw chunk response persisted as json
+    load(entry)
+        :returns the raw chunk response of an entry
+    reset(remove_files=False)
+        forgets every completed chunk, and deletes their persisted files on request
+    """
+
+    def __init__(self, path):
+        """
+        Open the journal of a directory, loading the chunks completed by previous runs
+        :param path: directory holding the journal and the persisted chunks
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__entries = {}
+        os.makedirs(path, exist_ok=True)
+        journal_path = os.path.join(path, JOURNAL_NAME)
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r') as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.__entries[entry['key']] = entry
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def completed(self, key):
+        """
+        Returns the entry of a completed chunk whose result is still on disk
+        :param key: chunk key
+        :return: entry or None
+        """
+        entry = self.__entries.get(key)
+        if entry is not None and os.path.exists(os.path.join(self.path, entry['path'])):
+            return entry
+        return None
+
+    def record(self, key, index, path, records):
+        """
+        Append a completed chunk to the journal
+        :param key: chunk key
+        :param index: position of the chunk in the request
+        :param path: file persisting the chunk result, relative to the journal directory
+        :param records: number of records of the chunk
+        :return: entry
+        """
+        entry = {'key': key, 'index': index, 'path': path, 'records': records,
+                 'completed': datetime.utcnow().isoformat() + 'Z'}
+        with self.__lock:
+            with open(os.path.join(self.path, JOURNAL_NAME), 'a') as fh:
+                fh.write(json.dumps(entry) + '\n')
+                fh.flush()
+                os.fsync(fh.fileno())
+            self.__entries[key] = entry
+        return entry
+
+    def store(self, key, index, data):
+        """
+        Persist the raw response of a chunk and record it as completed
+        :param key: chunk key
+        :param index: position of the chunk in the request
+        :param data: decoded DataService json
+        :return: entry
+        """
+        name = 'chunk-%s.json' % key
+        tmp_path = os.path.join(self.path, '.' + name + '.tmp')
+        with open(tmp_path, 'w') as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, os.path.join(self.path, name))
+        return self.record(key, index, name, len(data))
+
+    def load(self, entry):
+        """
+        Returns the raw chunk response persisted by store()
+        :param entry: journal entry
+        :return: decoded DataService json
+        """
+        with open(os.path.join(self.path, entry['path']), 'r') as fh:
+            return json.load(fh)
+
+    def reset(self, remove_files=False):
+        """
+        Forget every completed chunk, i.e. once a pull finished so its next run requests every chunk again
+        :param remove_files: delete the files persisting the chunks, else they are left in place and overwritten
+                             by the next run
+        :return: None
+        """
+        with self.__lock:
+            if remove_files:
+                for entry in self.__entries.values():
+                    file_path = os.path.join(self.path, entry['path'])
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+            self.__entries = {}
+            journal_path = os.path.join(self.path, JOURNAL_NAME)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
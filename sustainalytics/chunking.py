@@ -0,0 +1,91 @@
+"""
+Sizes the DataService chunks of a pull from the latency and payload of the chunks already fetched.
+"""
+
+import threading
+
+
+class AdaptiveChunker(object):
+    """
+    AdaptiveChunker picks the number of identifiers of the next DataService request so a request takes about
+    target_seconds and, when max_bytes is set, returns at most max_bytes.
+
+    Every fetched chunk updates a moving average of the seconds and bytes per identifier, the next size is the
+    target divided by that cost. A size changes by at most a factor 2 between two decisions and always stays
+    within minimum and maximum, the server accepts up to 100 identifiers per request.
+
+    Public Attributes
+    -----------------
+    target_seconds : float
+        duration aimed for a request
+    max_bytes : int
+        largest response aimed for, None does not limit the payload
+    initial : int
+        size of the chunks requested before a measure is available
+    minimum : int
+        smallest chunk size
+    maximum : int
+        largest chunk size
+    decisions : list
+        size, seconds and bytes of every measured chunk, with the size decided after it
+
+    Public Methods
+    -----------------
+    next_size()
+        :returns the size of the next chunk
+    observe(size, seconds, nbytes)
+        updates the cost per identifier with a fetched chunk
+    """
+
+    def __init__(self, target_seconds=2.0, max_bytes=None, initial=25, minimum=1, maximum=100, smoothing=0.5):
+        """
+        :param target_seconds: duration aimed for a request
+        :param max_bytes: largest response aimed for, None does not limit the payload
+        :param initial: size of the chunks requested before a measure is available
+        :param minimum: smallest chunk size
+        :param maximum: largest chunk size, at most 100
+        :param smoothing: weight of the last chunk in the moving averages
+        """
+        assert 1 <= minimum <= initial <= maximum <= 100, "Chunk sizes should verify 1 <= minimum <= initial <= maximum <= 100."
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.smoothing = smoothing
+        self.decisions = []
+        self.__size = initial
+        self.__seconds_per_id = None
+        self.__bytes_per_id = None
+        self.__lock = threading.Lock()
+
+    def next_size(self):
+        """
+        Returns the size of the next chunk
+        :return: int
+        """
+        with self.__lock:
+            return self.__size
+
+    def observe(self, size, seconds, nbytes):
+        """
+        Update the cost per identifier with a fetched chunk and decide the size of the next chunks
+        :param size: identifiers of the chunk
+        :param seconds: duration of the request
+        :param nbytes: bytes of the response
+        :return: size of the next chunk
+        """
+        with self.__lock:
+            self.__seconds_per_id = self.__average(self.__seconds_per_id, seconds / size)
+            self.__bytes_per_id = self.__average(self.__bytes_per_id, float(nbytes) / size)
+            wanted = self.target_seconds / max(self.__seconds_per_id, 1e-6)
+            if self.max_bytes is not None:
+                wanted = min(wanted, self.max_bytes / max(self.__bytes_per_id, 1.0))
+            wanted = min(max(wanted, self.__size / 2.0), self.__size * 2.0)
+            self.__size = int(min(max(wanted, self.minimum), self.maximum))
+            self.decisions.append({'size': size, 'seconds': round(seconds, 4), 'bytes': nbytes,
+                                   'next_size': self.__size})
+            return self.__size
+
+    def __average(self, average, value):
+        return value if average is None else self.smoothing * value + (1 - self.smoothing) * average
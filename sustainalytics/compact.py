@@ -0,0 +1,111 @@
+"""
+Shrinks the wide get_data frames: numeric fields as floats with a sentinel code column, text fields as categoricals.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# the default strings of the research, see core_validations.get_default_column_strings
+SENTINELS = ['No data', 'Research in progress', 'Framework not applicable', 'No Access']
+
+# full_definition columns holding the type of a field, when the FieldDefinitions of the client provide one
+FIELD_TYPE_COLUMNS = ['fieldType', 'dataType']
+
+
+def field_types_from_definition(full_definition):
+    """
+    Returns the type of every field described by the full definition
+    :param full_definition: dataframe of API.full_definition
+    :return: dictionary of fieldId (str) to 'numeric' or 'text', empty when the definitions carry no type
+    """
+    if not isinstance(full_definition, pd.DataFrame):
+        full_definition = pd.DataFrame(full_definition)
+    for type_column in FIELD_TYPE_COLUMNS:
+        if type_column in full_definition.columns:
+            numeric = full_definition[type_column].astype(str).str.lower().str.contains(
+                'num|int|dec|float|double|score|percent')
+            return dict(zip(full_definition['fieldId'].astype(str), np.where(numeric, 'numeric', 'text')))
+    return {}
+
+
+def infer_field_type(values, sentinels=SENTINELS):
+    """
+    Returns numeric when every value of a field is a number, a sentinel or missing, text otherwise
+    :param values: series of the field
+    :param sentinels: default strings standing for a missing score
+    :return: 'numeric' or 'text'
+    """
+    if values.dtype != object:
+        return 'numeric' if pd.api.types.is_numeric_dtype(values) else 'text'
+    numbers = pd.to_numeric(values, errors='coerce')
+    text = values.notna() & numbers.isna() & ~values.isin(sentinels)
+    return 'text' if text.any() else 'numeric'
+
+
+def split_numeric(values):
+    """
+    Split the values of a numeric field in its numbers and the text of its other values, i.e. the sentinels
+    :param values: series of the field
+    :return: float64 series of the numbers, NaN elsewhere, and object series of the text of the values that are
+             not numbers, None elsewhere
+    """
+    numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+    text = values.astype(object).where(numbers.isna() & values.notna(), None)
+    text = text.map(lambda value: value if value is None else str(value))
+    return numbers, text
+
+
+def compact_frame(data, field_columns, field_types=None, sentinels=SENTINELS, float_dtype='float32'):
+    """
+    Convert the fields of a get_data frame to compact dtypes.
+
+    A numeric field becomes a float column, its sentinel strings NaN, and when it holds sentinels a
+    '<fieldId>_sentinel' categorical column keeps which one. A text field becomes a categorical, and so does a
+    field declared numeric holding text that is neither a number nor a sentinel, so no value is lost.
+    The entityName becomes a categorical and the raw fields dictionaries are dropped.
+    :param data: dataframe returned by get_data(dtype='dataframe')
+    :param field_columns: fieldId columns to convert, as strings
+    :param field_types: dictionary of fieldId to 'numeric' or 'text', the missing ones are inferred from the values
+    :param sentinels: default strings standing for a missing score
+    :param float_dtype: float32 or float64
+    :return: compact dataframe, its attrs['compact'] reports the memory before and after and the fields declared
+             numeric kept as text
+    """
+    field_types = field_types or {}
+    memory_before = int(data.memory_usage(deep=True).sum())
+    columns = {}
+    numeric_fields = 0
+    text_fields = 0
+    text_fallbacks = []
+    for column in data.columns:
+        values = data[column].reset_index(drop=True)
+        if column == 'fields':
+            continue
+        if column == 'entityName':
+            columns[column] = values.astype('category')
+        elif str(column) in field_columns:
+            declared = field_types.get(str(column))
+            # a field declared numeric is only converted when every value is a number, a sentinel or missing
+            field_type = declared if declared == 'text' else infer_field_type(values, sentinels)
+            if declared == 'numeric' and field_type == 'text':
+                text_fallbacks.append(str(column))
+            if field_type == 'numeric':
+                numeric_fields += 1
+                numbers, text = split_numeric(values)
+                columns[column] = numbers.astype(float_dtype)
+                codes = pd.Categorical(text, categories=sentinels)
+                if (codes.codes >= 0).any():
+                    columns['%s_sentinel' % column] = codes
+            else:
+                text_fields += 1
+                columns[column] = values.astype('category')
+        else:
+            columns[column] = values
+    compact = pd.DataFrame(columns).set_axis(data.index, axis=0)
+    memory_after = int(compact.memory_usage(deep=True).sum())
+    compact.attrs = dict(data.attrs)
+    compact.attrs['compact'] = {'memory_before': memory_before, 'memory_after': memory_after,
+                                'numeric_fields': numeric_fields, 'text_fields': text_fields,
+                                'text_fallbacks': text_fallbacks}
+    return compact
@@ -0,0 +1,40 @@
+"""
+Decodes the DataService responses and expands their fields into the columns of the get_data frames.
+"""
+
+import json
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(content):
+    """
+    Decode a json response body, with orjson when it is installed
+    :param content: response bytes
+    :return: decoded json
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass  # i.e. NaN literals, which only the json module accepts
+    return json.loads(content)
+
+
+def field_frame(fields, columns, index=None):
+    """
+    Returns the fieldId columns of a chunk, built in one pass over the records with the columns known up front
+    instead of being inferred and aligned by a join
+    :param fields: fields dictionaries of the entities of the chunk
+    :param columns: fieldIds to extract, as strings, the ones missing from a record are NaN
+    :param index: index of the frame, aligned by position with fields
+    :return: dataframe
+    """
+    frame = pd.DataFrame.from_records(fields, columns=list(columns))
+    if index is not None:
+        frame.index = index
+    return frame
@@ -0,0 +1,322 @@
+"""
+Writes DataService pulls straight to disk as partitioned datasets, one partition per chunk.
+"""
+
+import os
+import json
+import math
+import pandas as pd
+from datetime import datetime
+from sustainalytics.compact import split_numeric
+
+
+MANIFEST_NAME = '_manifest.json'  # underscore prefixed so dataset readers skip it
+
+FIELD_LAYOUTS = ['typed', 'text']
+
+
+def load_manifest(path):
+    """
+    Returns the manifest of an exported dataset
+    :param path: dataset directory
+    :return: dict
+    """
+    with open(os.path.join(path, MANIFEST_NAME), 'r') as fh:
+        return json.load(fh)
+
+
+def load_dataset(path, columns=None):
+    """
+    Read an exported dataset, sharded or not, from its partition files: a dataframe for parquet and arrow, a list
+    of json records for ndjson. The fields of a typed dataset are read back as float64 columns with their
+    '<fieldId>_sentinel' categoricals, the fields of a text dataset as the text they were written as. Requires
+    pyarrow for parquet and arrow
+    :param path: dataset directory
+    :param columns: columns read from parquet and arrow partitions, defaults to every column
+    :return: dataframe indexed by identifier or list of records
+    """
+    manifest = load_manifest(path)
+    files = [os.path.join(path, partition['path']) for partition in manifest['partitions']]
+    if manifest['format'] == 'ndjson':
+        records = []
+        for file_path in files:
+            with open(file_path, 'r') as fh:
+                records.extend(json.loads(line) for line in fh if line.strip())
+        return records
+    try:
+        import pyarrow
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('pyarrow is required to read %s, install it with pip install pyarrow' % manifest['format'])
+    tables = []
+    for file_path in files:
+        if manifest['format'] == 'parquet':
+            table = pq.read_table(file_path, columns=columns)
+        else:
+            with pyarrow.memory_map(file_path, 'r') as source:
+                table = pyarrow.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    try:
+        data = pyarrow.concat_tables(tables).to_pandas()
+    except pyarrow.ArrowInvalid:
+        # the processes of a sharded pull each inferred the types of the metadata columns from their first partition
+        data = pd.concat([table.to_pandas() for table in tables], ignore_index=True)
+    if 'identifier' in data.columns:
+        data = data.set_index('identifier')
+    return data
+
+
+def get_sink(path, format='parquet', field_columns=None, field_types=None, field_layout='typed'):
+    """
+    Returns the sink writing a dataset in the requested format
+    :param path: dataset directory
+    :param format: parquet, arrow or ndjson
+    :param field_columns: fieldId columns of the dataset, required by the columnar formats
+    :param field_types: dictionary of fieldId to 'numeric' or 'text' of the columnar formats, see
+                        compact.field_types_from_definition
+    :param field_layout: typed or text, how the columnar formats write the fields, see ParquetSink
+    :return: DatasetSink
+    """
+    if format == 'ndjson':
+        return NDJSONSink(path)
+    elif format == 'parquet':
+        return ParquetSink(path, field_columns, field_types, field_layout)
+    elif format == 'arrow':
+        return ArrowSink(path, field_columns, field_types, field_layout)
+    else:
+        raise ValueError("Export format should be one of 'parquet', 'arrow' or 'ndjson'.")
+
+
+class DatasetSink(object):
+    """
+    DatasetSink writes every chunk of a pull to its own partition file and records them in a manifest.
+
+    Public Attributes
+    -----------------
+    path : str
+        directory of the dataset
+    partitions : list
+        file name and record count of every written partition
+
+    Public Methods
+    -----------------
+    write(part, number=None)
+        :returns the manifest entry of the written partition
+    add_partition(name, records)
+        :returns the manifest entry of a partition written by a previous run
+    clear()
+        deletes the partitions and manifest of a previous run
+    close(**extra)
+        :returns the manifest written next to the partitions
+    """
+    format = None
+    extension = None
+
+    def __init__(self, path):
+        """
+        Create the dataset directory
+        :param path: dataset directory
+        """
+        self.path = path
+        self.partitions = []
+        os.makedirs(path, exist_ok=True)
+
+    def partition_name(self, number):
+        """
+        Returns the file name of a partition
+        :param number: partition number
+        :return: str
+        """
+        return 'part-%05d%s' % (number, self.extension)
+
+    def write(self, part, number=None):
+        """
+        Write a chunk to its own partition
+        :param part: list of records or dataframe indexed by identifier
+        :param number: partition number, defaults to the next one
+        :return: manifest entry of the partition
+        """
+        if number is None:
+            number = len(self.partitions)
+        name = self.partition_name(number)
+        tmp_path = os.path.join(self.path, '.' + name + '.tmp')
+        self.write_file(tmp_path, part)
+        os.replace(tmp_path, os.path.join(self.path, name))  # a partition is either complete or absent
+        partition = {'path': name, 'records': len(part)}
+        self.partitions.append(partition)
+        return partition
+
+    def add_partition(self, name, records):
+        """
+        Record a partition written by a previous run of the pull
+        :param name: file name of the partition
+        :param records: number of records of the partition
+        :return: manifest entry of the partition
+        """
+        partition = {'path': name, 'records': records}
+        self.partitions.append(partition)
+        return partition
+
+    def clear(self):
+        """
+        Delete the partitions and the manifest a previous run wrote, in any format, so the directory read as a
+        dataset holds the rows of this run only
+        :return: None
+        """
+        for name in os.listdir(self.path):
+            if name.startswith(('part-', '.part-')) or name == MANIFEST_NAME:
+                os.remove(os.path.join(self.path, name))
+        self.partitions = []
+
+    def write_file(self, file_path, part):
+        raise NotImplementedError
+
+    def close(self, **extra):
+        """
+        Write the manifest of the dataset
+        :param extra: additional manifest entries, i.e. the request parameters
+        :return: manifest
+        """
+        manifest = {
+            'format': self.format,
+            'created': datetime.utcnow().isoformat() + 'Z',
+            'records': sum(partition['records'] for partition in self.partitions),
+            'partitions': sorted(self.partitions, key=lambda partition: partition['path']),
+        }
+        manifest.update(extra)
+        tmp_path = os.path.join(self.path, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w') as fh:
+            json.dump(manifest, fh, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_NAME))
+        return manifest
+
+
+class NDJSONSink(DatasetSink):
+    """
+    Writes the json records of every chunk as newline delimited json
+    """
+    format = 'ndjson'
+    extension = '.ndjson'
+
+    def write_file(self, file_path, part):
+        with open(file_path, 'w') as fh:
+            for record in part:
+                fh.write(json.dumps(record))
+                fh.write('\n')
+
+
+class ParquetSink(DatasetSink):
+    """
+    Writes the dataframe of every chunk as a Parquet file sharing one schema across partitions.
+
+    Scores share their columns with sentinel strings such as 'No data'. With the typed layout, as
+    compact.compact_frame does in memory, a field is split in a float64 column of its numbers and a
+    '<fieldId>_sentinel' dictionary column of the text of its other values, so text a numeric field should not
+    hold is kept too; the fields declared text in field_types are written as text columns. With the text layout
+    every field is written as text. The schema does not depend on the data of the first partition, whose
+    entities may all lack coverage: entityId is a nullable int64 and the other metadata columns are text.
+    Requires pyarrow.
+    """
+    format = 'parquet'
+    extension = '.parquet'
+
+    def __init__(self, path, field_columns, field_types=None, field_layout='typed'):
+        """
+        Create the dataset directory
+        :param path: dataset directory
+        :param field_columns: fieldId columns written in every partition
+        :param field_types: dictionary of fieldId to 'numeric' or 'text', the fields declared text are written as
+                            text by the typed layout
+        :param field_layout: typed or text
+        """
+        if field_layout not in FIELD_LAYOUTS:
+            raise ValueError("Field layout should be one of 'typed' or 'text'.")
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('pyarrow is required to export to %s, install it with pip install pyarrow' % self.format)
+        super(ParquetSink, self).__init__(path)
+        self.pa = pyarrow
+        self.field_columns = [str(column) for column in field_columns]
+        self.field_layout = field_layout
+        field_types = field_types or {}
+        self.numeric_columns = set()
+        if field_layout == 'typed':
+            self.numeric_columns = set(column for column in self.field_columns if field_types.get(column) != 'text')
+        self.schema = None
+
+    def to_table(self, part):
+        """
+        Convert a chunk dataframe to an arrow table of the dataset schema
+        :param part: dataframe indexed by identifier
+        :return: pyarrow.Table
+        """
+        pa = self.pa
+        part = part.drop(columns=['fields'], errors='ignore').reset_index()
+        part.columns = [str(column) for column in part.columns]
+        field_columns = set(self.field_columns)
+        if self.schema is None:
+            meta_columns = [column for column in part.columns if column not in field_columns]
+            fields = [pa.field(column, pa.int64() if column == 'entityId' else pa.string()) for column in meta_columns]
+            for column in self.field_columns:
+                if column in self.numeric_columns:
+                    fields.append(pa.field(column, pa.float64()))
+                    fields.append(pa.field('%s_sentinel' % column, pa.dictionary(pa.int32(), pa.string())))
+                else:
+                    fields.append(pa.field(column, pa.string()))
+            self.schema = pa.schema(fields)
+        columns = {}
+        for column in self.schema.names:
+            if column in columns:
+                continue  # the sentinel column of a numeric field
+            values = part[column] if column in part.columns else pd.Series([None] * len(part), dtype=object)
+            if column in self.numeric_columns:
+                numbers, text = split_numeric(values)
+                columns[column] = numbers.values
+                columns['%s_sentinel' % column] = pd.Categorical(text.values)
+            elif column == 'entityId':
+                columns[column] = pd.to_numeric(values).astype('Int64').values
+            else:
+                columns[column] = values.map(_field_text).values
+        return pa.Table.from_pandas(pd.DataFrame(columns), schema=self.schema, preserve_index=False)
+
+    def write_file(self, file_path, part):
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_table(part), file_path)
+
+    def close(self, **extra):
+        """
+        Write the manifest of the dataset, recording its field layout
+        :param extra: additional manifest entries, i.e. the request parameters
+        :return: manifest
+        """
+        return super(ParquetSink, self).close(field_layout=self.field_layout, **extra)
+
+
+class ArrowSink(ParquetSink):
+    """
+    Writes the dataframe of every chunk as an Arrow IPC file sharing one schema across partitions. Requires pyarrow.
+    """
+    format = 'arrow'
+    extension = '.arrow'
+
+    def write_file(self, file_path, part):
+        table = self.to_table(part)
+        with self.pa.OSFile(file_path, 'wb') as sink:
+            with self.pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def _field_text(value):
+    """
+    Returns the text of a field value, None for a missing one
+    :param value: score, sentinel string or NaN
+    :return: str or None
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value)
@@ -0,0 +1,55 @@
+"""
+Advisory lock on a file, shared by the processes of a host.
+"""
+
+import os
+from time import sleep
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock(object):
+    """
+    FileLock holds an exclusive lock on a file for the duration of a with block.
+
+    Usage
+    -----
+    with FileLock('/tmp/token.json.lock'):
+        ...
+    """
+
+    def __init__(self, path):
+        """
+        :param path: lock file, created when missing
+        """
+        self.path = path
+        self.__fh = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.__fh = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self.__fh.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self.__fh.seek(0)
+                    msvcrt.locking(self.__fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    sleep(0.05)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.flock(self.__fh.fileno(), fcntl.LOCK_UN)
+        else:
+            self.__fh.seek(0)
+            msvcrt.locking(self.__fh.fileno(), msvcrt.LK_UNLCK, 1)
+        self.__fh.close()
+        self.__fh = None
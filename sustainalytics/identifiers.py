@@ -0,0 +1,246 @@
+"""
+Resolves ISINs, CUSIPs, SEDOLs and EntityIds to the entities they stand for, so a pull requests every entity once.
+"""
+
+import os
+import json
+import numpy as np
+from sustainalytics.universe import sorted_contains
+
+
+def normalize_identifier(identifier):
+    """
+    Returns the key of an identifier: stripped and upper case
+    :param identifier: ISIN, CUSIP, SEDOL or EntityId
+    :return: str
+    """
+    return str(identifier).strip().upper()
+
+
+def identifier_type(identifier):
+    """
+    Returns the kind of a normalized identifier from its shape. Digits only identifiers of 7 or 9 characters
+    may be SEDOLs or CUSIPs as well as EntityIds, they are reported as None
+    :param identifier: normalized identifier
+    :return: 'ISIN', 'CUSIP', 'SEDOL', 'EntityId' or None
+    """
+    if identifier.isdigit():
+        return None if len(identifier) in (7, 9) else 'EntityId'
+    if not identifier.isalnum():
+        return None
+    if len(identifier) == 12 and identifier[:2].isalpha():
+        return 'ISIN'
+    if len(identifier) == 9:
+        return 'CUSIP'
+    if len(identifier) == 7:
+        return 'SEDOL'
+    return None
+
+
+class ResolutionPlan(object):
+    """
+    ResolutionPlan holds the identifiers a pull requests and how their records are fanned back out to the
+    identifiers asked for.
+
+    Public Attributes
+    -----------------
+    identifiers : list
+        identifiers to request, every entity once
+    originals : dict
+        requested identifier to the identifiers asked for, in their order
+    dropped : list
+        identifiers asked for whose entity is outside the universe of access
+    index : IdentifierIndex
+        index the plan comes from, it learns the identifiers of the records fanned out
+
+    Public Methods
+    -----------------
+    fan_out(records)
+        :returns the records of the requested identifiers, one per identifier asked for
+    as_dict()
+        :returns the counts of the plan
+    """
+
+    def __init__(self, asked, index=None):
+        self.asked = asked
+        self.index = index
+        self.identifiers = []
+        self.originals = {}
+        self.dropped = []
+
+    def add(self, request_identifier, original):
+        if request_identifier not in self.originals:
+            self.originals[request_identifier] = []
+            self.identifiers.append(request_identifier)
+        self.originals[request_identifier].append(original)
+
+    def fan_out(self, records):
+        """
+        Copy the record of every requested identifier to each identifier asked for, and teach the index the
+        entity of every identifier returned
+        :param records: DataService json records
+        :return: list of records
+        """
+        fanned = []
+        for record in records:
+            originals = self.originals.get(str(record.get('identifier')))
+            if originals is None:
+                fanned.append(record)
+                continue
+            for original in originals:
+                fanned.append(dict(record, identifier=original))
+        if self.index is not None:
+            self.index.learn(fanned)
+        return fanned
+
+    def as_dict(self):
+        return {'asked': self.asked, 'requested': len(self.identifiers), 'dropped': len(self.dropped)}
+
+
+class IdentifierIndex(object):
+    """
+    IdentifierIndex maps ISINs, CUSIPs, SEDOLs and EntityIds to the EntityId of their entity.
+
+    It is seeded with the EntityIds of the universe of access and learns the identifier of every record a pull
+    returns with an entityId. A pull planned through the index requests each entity once, by EntityId when the
+    entity is known, and drops the identifiers of entities outside the universe.
+
+    Public Attributes
+    -----------------
+    universe : numpy.ndarray
+        sorted EntityIds of the universe of access, None when unknown
+    entities : dict
+        normalized identifier to EntityId
+
+    Public Methods
+    -----------------
+    set_universe(entity_ids)
+        sets the EntityIds of the universe of access
+    learn(records)
+        adds the identifiers of DataService records to the index
+    resolve(identifier)
+        :returns the EntityId of an identifier or None
+    in_universe(entity_ids)
+        :returns a boolean array, True for the EntityIds of the universe
+    plan(identifiers)
+        :returns the ResolutionPlan of a pull
+    save(path)
+        persists the index as json
+    load(path)
+        :returns the index persisted at path
+    """
+
+    def __init__(self, universe=None, entities=None):
+        """
+        :param universe: EntityIds of the universe of access
+        :param entities: dictionary of identifier to EntityId
+        """
+        self.universe = None
+        self.entities = {}
+        if universe is not None:
+            self.set_universe(universe)
+        for identifier, entity_id in (entities or {}).items():
+            self.entities[normalize_identifier(identifier)] = int(entity_id)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def set_universe(self, entity_ids):
+        """
+        Set the EntityIds of the universe of access
+        :param entity_ids: iterable of EntityIds
+        :return: None
+        """
+        if not isinstance(entity_ids, np.ndarray):
+            entity_ids = list(entity_ids)
+        self.universe = np.unique(np.asarray(entity_ids, dtype=np.int64))
+
+    def learn(self, records):
+        """
+        Add the identifiers of DataService records returned with an entityId
+        :param records: DataService json records
+        :return: number of identifiers learned
+        """
+        learned = 0
+        for record in records:
+            entity_id = record.get('entityId')
+            if entity_id is None or entity_id != entity_id:  # missing or NaN
+                continue
+            key = normalize_identifier(record['identifier'])
+            if self.entities.get(key) != int(entity_id):
+                self.entities[key] = int(entity_id)
+                learned += 1
+        return learned
+
+    def resolve(self, identifier):
+        """
+        Returns the EntityId of an identifier, None when it is not known
+        :param identifier: ISIN, CUSIP, SEDOL or EntityId
+        :return: int or None
+        """
+        key = normalize_identifier(identifier)
+        entity_id = self.entities.get(key)
+        if entity_id is None and key.isdigit() and len(key) <= 18:
+            if identifier_type(key) == 'EntityId':
+                entity_id = int(key)
+            elif self.universe is not None and self.in_universe([int(key)])[0]:
+                # 7 or 9 digits may be a SEDOL or a CUSIP, taken as an EntityId only when the universe has it
+                entity_id = int(key)
+        return entity_id
+
+    def in_universe(self, entity_ids):
+        """
+        Returns True for the EntityIds of the universe of access, for all of them when the universe is unknown
+        :param entity_ids: array of EntityIds
+        :return: boolean array
+        """
+        if self.universe is None:
+            return np.ones(len(entity_ids), dtype=bool)
+        return sorted_contains(self.universe, entity_ids)
+
+    def plan(self, identifiers):
+        """
+        Plan a pull: identifiers of a known entity are requested once by EntityId, the unknown ones once as given,
+        the ones of an entity outside the universe are dropped
+        :param identifiers: ISINs, CUSIPs, SEDOLs or EntityIds
+        :return: ResolutionPlan
+        """
+        plan = ResolutionPlan(len(identifiers), index=self)
+        resolved = [self.resolve(identifier) for identifier in identifiers]
+        known = np.array([entity_id is not None for entity_id in resolved], dtype=bool)
+        in_universe = np.ones(len(identifiers), dtype=bool)
+        if known.any():
+            in_universe[known] = self.in_universe([entity_id for entity_id in resolved if entity_id is not None])
+        for identifier, entity_id, keep in zip(identifiers, resolved, in_universe):
+            # the records come back with the identifier stripped, as it was sent before
+            original = str(identifier).strip()
+            if not keep:
+                plan.dropped.append(original)
+            elif entity_id is not None:
+                plan.add(str(entity_id), original)
+            else:
+                plan.add(normalize_identifier(identifier), original)
+        return plan
+
+    def save(self, path):
+        """
+        Persist the index as json, replacing the previous file atomically
+        :param path: json file
+        :return: None
+        """
+        data = {'universe': None if self.universe is None else self.universe.tolist(), 'entities': self.entities}
+        tmp_path = path + '.%d.tmp' % os.getpid()
+        with open(tmp_path, 'w') as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns the index persisted by save()
+        :param path: json file
+        :return: IdentifierIndex
+        """
+        with open(path, 'r') as fh:
+            data = json.load(fh)
+        return cls(universe=data['universe'], entities=data['entities'])
@@ -0,0 +1,108 @@
+"""
+Token bucket limiting the rate of the API requests, shared by threads and optionally by the processes of a host.
+"""
+
+import os
+import json
+import threading
+from time import sleep, time
+from sustainalytics.filelock import FileLock
+
+
+class RateLimiter(object):
+    """
+    RateLimiter is a token bucket: it holds up to capacity tokens, refilled at rate tokens per second, and every
+    request spends one. A request arriving on an empty bucket reserves the next token and sleeps until it is due,
+    so the waiting requests are served in arrival order and the long run rate never exceeds rate.
+
+    With a state_file the bucket is kept in that file under a FileLock, so every process of the host using the
+    same state_file shares one budget, i.e. the quota of the client credentials.
+
+    Public Attributes
+    -----------------
+    rate : float
+        requests per second
+    capacity : float
+        maximum burst of requests
+    state_file : str
+        json file sharing the bucket across processes, None keeps it in memory
+
+    Public Methods
+    -----------------
+    acquire()
+        :returns the seconds waited for a token
+    reserve()
+        :returns the seconds to wait before using the token taken, for callers that cannot sleep i.e. asyncio
+    """
+
+    def __init__(self, rate, capacity=None, state_file=None):
+        """
+        :param rate: requests per second
+        :param capacity: maximum burst of requests, defaults to one second of requests
+        :param state_file: json file sharing the bucket across processes
+        """
+        assert rate > 0, "Rate should be greater than 0."
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self.state_file = state_file
+        self.__tokens = self.capacity
+        self.__timestamp = time()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, sleeping until it is available
+        :return: seconds waited
+        """
+        wait = self.reserve()
+        if wait > 0:
+            sleep(wait)
+        return wait
+
+    def reserve(self):
+        """
+        Take a token without sleeping, the caller waits the returned seconds before sending its request
+        :return: seconds to wait
+        """
+        with self.__lock:
+            if self.state_file is None:
+                self.__tokens, self.__timestamp = self.__take(self.__tokens, self.__timestamp)
+                tokens = self.__tokens
+            else:
+                with FileLock(self.state_file + '.lock'):
+                    tokens, timestamp = self.__take(*self.__read_state())
+                    self.__write_state(tokens, timestamp)
+        return max(0.0, -tokens / self.rate)
+
+    def __take(self, tokens, timestamp):
+        """
+        Refill the bucket for the time elapsed and spend one token, a negative balance is a reservation
+        :param tokens: tokens of the bucket
+        :param timestamp: time of the last update
+        :return: tokens, timestamp
+        """
+        now = time()
+        tokens = min(self.capacity, tokens + max(0.0, now - timestamp) * self.rate)
+        return tokens - 1, now
+
+    def __read_state(self):
+        """
+        Returns the bucket shared in the state file, a full bucket when the file is missing
+        :return: tokens, timestamp
+        """
+        try:
+            with open(self.state_file, 'r') as fh:
+                state = json.load(fh)
+            return float(state['tokens']), float(state['timestamp'])
+        except (IOError, ValueError, KeyError):
+            return self.capacity, time()
+
+    def __write_state(self, tokens, timestamp):
+        """
+        Share the bucket through the state file
+        :return: None
+        """
+        tmp_path = self.state_file + '.%d.tmp' % os.getpid()
+        with open(tmp_path, 'w') as fh:
+            json.dump({'tokens': tokens, 'timestamp': timestamp}, fh)
+        os.replace(tmp_path, self.state_file)
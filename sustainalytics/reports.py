@@ -0,0 +1,238 @@
+"""
+Resolves the PDF report links of the ReportService, tells when they expire and keeps the downloaded reports.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import calendar
+from time import time
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from email.utils import parsedate_to_datetime
+
+
+def report_url(response):
+    """
+    Returns the link of a ReportService url response, the first http(s) value of a key containing 'url'
+    :param response: decoded response, a link, a dictionary or a list holding one
+    :return: str or None
+    """
+    if isinstance(response, str):
+        return response if response.startswith('http') else None
+    if isinstance(response, list):
+        for item in response:
+            url = report_url(item)
+            if url is not None:
+                return url
+        return None
+    if isinstance(response, dict):
+        for key, value in response.items():
+            if 'url' in key.lower() and isinstance(value, str) and value.startswith('http'):
+                return value
+    return None
+
+
+def parse_timestamp(value):
+    """
+    Returns the epoch seconds of an ISO 8601 date, an HTTP date or epoch seconds
+    :param value: str or number
+    :return: float or None
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+    if moment.tzinfo is None:
+        return float(calendar.timegm(moment.timetuple())) + moment.microsecond / 1e6
+    return moment.timestamp()
+
+
+def report_url_expiry(response, url, default_ttl):
+    """
+    Returns when a report link expires: an expiry key of the response, the expiry of a presigned link
+    (Azure se, AWS X-Amz-Date + X-Amz-Expires, Expires) or default_ttl seconds from now
+    :param response: decoded ReportService url response
+    :param url: report link
+    :param default_ttl: seconds a link is trusted when it does not tell its expiry
+    :return: epoch seconds
+    """
+    items = response if isinstance(response, list) else [response]
+    for item in items:
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if 'expir' in key.lower() or 'validuntil' in key.lower():
+                    expires_at = parse_timestamp(value)
+                    if expires_at is not None:
+                        return expires_at
+    if url is not None:
+        query = {key.lower(): values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        if 'se' in query:
+            expires_at = parse_timestamp(query['se'])
+            if expires_at is not None:
+                return expires_at
+        if 'x-amz-date' in query and 'x-amz-expires' in query:
+            try:
+                signed_at = calendar.timegm(datetime.strptime(query['x-amz-date'], '%Y%m%dT%H%M%SZ').timetuple())
+                return signed_at + float(query['x-amz-expires'])
+            except ValueError:
+                pass
+        if 'expires' in query:
+            expires_at = parse_timestamp(query['expires'])
+            if expires_at is not None:
+                return expires_at
+    return time() + default_ttl
+
+
+def report_version(response):
+    """
+    Returns the version of a report told by its ReportService url response, the first value of a key
+    containing 'version', 'updated' or 'published'
+    :param response: decoded ReportService url response
+    :return: str or None
+    """
+    items = response if isinstance(response, list) else [response]
+    for item in items:
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if value is not None and any(word in key.lower() for word in ('version', 'updated', 'published')):
+                    return str(value)
+    return None
+
+
+class ReportStore(object):
+    """
+    ReportStore keeps downloaded PDF reports in a content-addressed directory.
+
+    A report body is stored once under objects/<sha256[:2]>/<sha256>.pdf whatever the number of reports
+    sharing it, and _index.json maps every (entity, reportId) to the version, validators (ETag, Last-Modified)
+    and sha256 of its last download, so a report whose version did not change is never downloaded again.
+
+    Public Attributes
+    -----------------
+    path : str
+        directory of the store
+
+    Public Methods
+    -----------------
+    get(entity, reportId)
+        :returns the index entry of the last download of a report or None
+    has(entity, reportId, version)
+        :returns the entry when this version of the report is stored, else None
+    write(entity, reportId, chunks, version=None, etag=None, last_modified=None)
+        :returns the entry of a report body streamed to the store
+    touch(entity, reportId)
+        :returns the entry of a report the server confirmed unchanged
+    object_path(entry)
+        :returns the absolute path of the PDF of an entry
+    save()
+        persists the index
+    """
+
+    def __init__(self, path):
+        """
+        Open the store of a directory
+        :param path: directory of the store
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+        self.__index = {}
+        index_path = os.path.join(path, '_index.json')
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as fh:
+                self.__index = json.load(fh)
+
+    @staticmethod
+    def key(entity, reportId):
+        return '%s/%s' % (entity, reportId)
+
+    def get(self, entity, reportId):
+        """
+        Returns the index entry of the last download of a report whose PDF is still stored
+        :return: dict or None
+        """
+        with self.__lock:
+            entry = self.__index.get(self.key(entity, reportId))
+        if entry is not None and os.path.exists(self.object_path(entry)):
+            return entry
+        return None
+
+    def has(self, entity, reportId, version):
+        """
+        Returns the entry of a report when this version of it is stored
+        :return: dict or None
+        """
+        entry = self.get(entity, reportId)
+        if entry is not None and version is not None and entry['version'] == version:
+            return entry
+        return None
+
+    def object_path(self, entry):
+        return os.path.join(self.path, entry['path'])
+
+    def write(self, entity, reportId, chunks, version=None, etag=None, last_modified=None):
+        """
+        Stream a report body to the store, the chunks are hashed while written so the body is never held in memory
+        :param entity: EntityId or identifier of the report
+        :param reportId: report ID
+        :param chunks: iterable of bytes
+        :param version: version of the report, defaults to the ETag, Last-Modified or the content hash
+        :param etag: ETag of the response
+        :param last_modified: Last-Modified of the response
+        :return: index entry
+        """
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.path, 'objects', '.%s-%s-%d.tmp' % (entity, reportId, threading.get_ident()))
+        with open(tmp_path, 'wb') as fh:
+            for chunk in chunks:
+                if chunk:
+                    digest.update(chunk)
+                    fh.write(chunk)
+                    size += len(chunk)
+        sha256 = digest.hexdigest()
+        relative_path = os.path.join('objects', sha256[:2], sha256 + '.pdf')
+        os.makedirs(os.path.join(self.path, 'objects', sha256[:2]), exist_ok=True)
+        if os.path.exists(os.path.join(self.path, relative_path)):
+            os.remove(tmp_path)  # the same body is already stored
+        else:
+            os.replace(tmp_path, os.path.join(self.path, relative_path))
+        entry = {'entity': str(entity), 'reportId': str(reportId),
+                 'version': version or etag or last_modified or sha256[:16], 'etag': etag,
+                 'last_modified': last_modified, 'sha256': sha256, 'bytes': size,
+                 'path': relative_path, 'downloaded': datetime.utcnow().isoformat() + 'Z'}
+        with self.__lock:
+            self.__index[self.key(entity, reportId)] = entry
+        return entry
+
+    def touch(self, entity, reportId):
+        """
+        Mark a report as checked now, the server confirmed it did not change
+        :return: index entry
+        """
+        with self.__lock:
+            entry = self.__index[self.key(entity, reportId)]
+            entry['checked'] = datetime.utcnow().isoformat() + 'Z'
+        return entry
+
+    def save(self):
+        """
+        Persist the index, replacing the previous file atomically
+        :return: None
+        """
+        with self.__lock:
+            tmp_path = os.path.join(self.path, '_index.json.tmp')
+            with open(tmp_path, 'w') as fh:
+                json.dump(self.__index, fh, indent=2)
+            os.replace(tmp_path, os.path.join(self.path, '_index.json'))
@@ -0,0 +1,174 @@
+"""
+Retry policy of the API requests: which failures are retried and how long to wait before the next attempt.
+"""
+
+import random
+import threading
+from time import sleep, time
+from email.utils import parsedate_to_datetime
+
+
+# what follows a failed attempt, see RetryPolicy.decide
+RETRY = 'retry'
+REAUTHENTICATE = 'reauthenticate'
+GIVE_UP = 'give_up'
+
+
+def parse_retry_after(value):
+    """
+    Returns the seconds to wait announced by a Retry-After header
+    :param value: delay in seconds or HTTP date
+    :return: float or None
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget(object):
+    """
+    Thread-safe number of retries a whole pull may still spend, None for an unlimited budget
+    """
+
+    def __init__(self, retries=None):
+        self.remaining = retries
+        self.__lock = threading.Lock()
+
+    def consume(self):
+        """
+        Spend one retry
+        :return: True when the budget allowed it
+        """
+        with self.__lock:
+            if self.remaining is None:
+                return True
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    RetryPolicy decides whether a failed request is sent again and after how long.
+
+    Connection errors, timeouts and the retry_statuses (429 and 5xx by default) are retried up to max_retries times
+    with an exponential backoff: backoff_factor * 2 ** attempt seconds, capped at max_backoff and randomised with
+    full jitter so concurrent workers do not retry in lockstep. A Retry-After header sent with the response
+    replaces the computed backoff, unless it announces a wait longer than max_retry_after: the request is then
+    given up rather than blocking its worker. A 401 is not a retry, it re-authenticates once.
+
+    Public Attributes
+    -----------------
+    max_retries : int
+        retries of a single request
+    backoff_factor : float
+        seconds of the first backoff
+    max_backoff : float
+        maximum seconds of a computed backoff
+    jitter : bool
+        randomise the backoff between 0 and its computed value
+    retry_statuses : tuple
+        HTTP statuses worth retrying
+    retry_budget : int
+        retries a whole pull may spend, None for unlimited
+    max_retry_after : float
+        maximum seconds of a Retry-After wait, defaults to max_backoff
+
+    Public Methods
+    -----------------
+    is_retryable_status(status_code)
+        :returns True when the status is worth retrying
+    accepts_retry_after(retry_after)
+        :returns False when the announced wait is too long to retry
+    backoff(attempt, retry_after=None)
+        :returns the seconds to wait before the next attempt
+    decide(attempt, status_code=None, retry_after=None, reauthenticated=False, budget=None)
+        :returns what follows a failed attempt and the seconds to wait before a retry
+    new_budget()
+        :returns the RetryBudget of a new pull
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30.0, jitter=True,
+                 retry_statuses=(429, 500, 502, 503, 504), retry_budget=None, max_retry_after=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = tuple(retry_statuses)
+        self.retry_budget = retry_budget
+        self.max_retry_after = max_retry_after if max_retry_after is not None else max_backoff
+
+    def is_retryable_status(self, status_code):
+        """
+        Returns True when the status is worth retrying
+        :param status_code: HTTP status
+        :return: boolean
+        """
+        return status_code in self.retry_statuses
+
+    def accepts_retry_after(self, retry_after):
+        """
+        Returns False when the Retry-After header announces a wait longer than max_retry_after
+        :param retry_after: seconds announced by the Retry-After header, None when absent
+        :return: boolean
+        """
+        return retry_after is None or retry_after <= self.max_retry_after
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Returns the seconds to wait before the next attempt
+        :param attempt: number of retries already made for the request
+        :param retry_after: seconds announced by the Retry-After header, capped at max_retry_after
+        :return: float
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def decide(self, attempt, status_code=None, retry_after=None, reauthenticated=False, budget=None):
+        """
+        Decide what follows a failed attempt, the single place the sync and asyncio clients take it from: a first
+        401 re-authenticates, a connection error, a timeout or a retryable status is retried while the policy and
+        the budget of the pull allow it and the announced Retry-After is acceptable, anything else is given up
+        :param attempt: number of retries already made for the request
+        :param status_code: HTTP status of the response, None for a connection error or a timeout
+        :param retry_after: seconds announced by the Retry-After header of the response
+        :param reauthenticated: the request was already sent again with a new token
+        :param budget: RetryBudget of the pull, None for an unlimited one
+        :return: RETRY, REAUTHENTICATE or GIVE_UP and the seconds to wait before the retry
+        """
+        if status_code == 401 and not reauthenticated:
+            return REAUTHENTICATE, 0.0
+        if status_code is not None and (not self.is_retryable_status(status_code) or
+                                        not self.accepts_retry_after(retry_after)):
+            return GIVE_UP, 0.0
+        if attempt >= self.max_retries or (budget is not None and not budget.consume()):
+            return GIVE_UP, 0.0
+        return RETRY, self.backoff(attempt, retry_after)
+
+    def new_budget(self):
+        """
+        Returns the RetryBudget of a new pull
+        :return: RetryBudget
+        """
+        return RetryBudget(self.retry_budget)
+
+    def sleep(self, seconds):
+        """
+        Wait before the next attempt
+        :param seconds: delay
+        :return: None
+        """
+        if seconds > 0:
+            sleep(seconds)
@@ -0,0 +1,77 @@
+"""
+Splits the pulls of very large universes in shards of identifiers exported by a pool of processes.
+
+Decoding the DataService payloads into frames is CPU bound and holds the GIL, so threads only overlap the requests.
+Every process of a sharded pull fetches, decodes and writes its own shard as a dataset of the export, reading the
+access token and the metadata from files the parent shared, and returns its manifest only: the frames never travel
+back to the parent, which combines the shards in one manifest read by export.load_dataset.
+"""
+
+from sustainalytics.cache import MetadataCache
+from sustainalytics.ratelimit import RateLimiter
+
+
+SHARD_NAME = 'shard-%05d'
+
+
+def shard_identifiers(identifiers, shards, chunk):
+    """
+    Split identifiers in contiguous shards of whole chunks, so the shards request the chunks of an unsharded pull
+    :param identifiers: list of identifiers
+    :param shards: number of shards
+    :param chunk: identifiers per request
+    :return: list of non-empty lists of identifiers
+    """
+    assert shards >= 1, "Shards should be greater than or equal to 1."
+    if not identifiers:
+        return []
+    chunks = -(-len(identifiers) // chunk)
+    size = -(-chunks // shards) * chunk
+    return [identifiers[start:start + size] for start in range(0, len(identifiers), size)]
+
+
+def merge_pull_stats(stats_list):
+    """
+    Returns the sum of the statistics of several pulls, i.e. the shards of a sharded pull
+    :param stats_list: list of PullStats.as_dict()
+    :return: dict
+    """
+    merged = {}
+    for stats in stats_list:
+        for name, value in stats.items():
+            if isinstance(value, dict):
+                counts = merged.setdefault(name, {})
+                for key, count in value.items():
+                    counts[key] = counts.get(key, 0) + count
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[name] = merged.get(name, 0) + value
+    if 'throttled_seconds' in merged:
+        merged['throttled_seconds'] = round(merged['throttled_seconds'], 3)
+    return merged
+
+
+def export_shard(settings, identifiers, path, options):
+    """
+    Export a shard of a sharded pull, run by a process of the pool
+    :param settings: keyword arguments of the API of the process, metadata_cache given as (ttl, cache_dir),
+                     rate_limiter as (rate, capacity, state_file) or None and the transport as transport_factory,
+                     None for the default transport
+    :param identifiers: identifiers of the shard
+    :param path: dataset directory of the shard
+    :param options: keyword arguments of export_data
+    :return: dict with the manifest of the shard and the number of tokens the process requested
+    """
+    from sustainalytics.api import API  # api imports this module
+    settings = dict(settings)
+    settings['metadata_cache'] = MetadataCache(*settings['metadata_cache'])
+    if settings['rate_limiter'] is not None:
+        settings['rate_limiter'] = RateLimiter(*settings['rate_limiter'])
+    transport_factory = settings.pop('transport_factory', None)
+    if transport_factory is not None:
+        settings['transport'] = transport_factory()
+    api = API(**settings)
+    try:
+        manifest = api.export_data(identifiers, path, progress=False, **options)
+    finally:
+        api.close()
+    return {'manifest': manifest, 'token_requests': api.token_manager.refresh_count}
@@ -0,0 +1,217 @@
+"""
+Keeps the last pull of a universe on disk so the next pull only reports the entities that changed.
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+
+
+SNAPSHOT_NAME = '_snapshot.json'
+
+
+def record_hash(record):
+    """
+    Returns the content hash of a DataService record, the same entity data always gives the same hash
+    :param record: DataService json record
+    :return: str
+    """
+    content = {'entityId': record.get('entityId'), 'entityName': record.get('entityName'),
+               'fields': record.get('fields') or {}}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def is_covered(record):
+    """
+    Returns True when the API returned data for the identifier of a record
+    :param record: DataService json record
+    :return: boolean
+    """
+    return record.get('entityId') is not None and bool(record.get('fields'))
+
+
+class SnapshotDelta(object):
+    """
+    SnapshotDelta lists what changed between two pulls of the same request.
+
+    Public Attributes
+    -----------------
+    adds : list
+        records of the identifiers covered now and absent from the snapshot
+    removes : list
+        identifiers of the snapshot no longer requested or no longer covered
+    changes : list
+        identifier, entityId and the changed fields (old and new value) of the entities whose data changed
+    unchanged : int
+        number of entities identical to the snapshot
+
+    Public Methods
+    -----------------
+    as_dict()
+        :returns the counts of the delta
+    to_records()
+        :returns the delta as json records, one per add, remove or change
+    """
+
+    def __init__(self):
+        self.adds = []
+        self.removes = []
+        self.changes = []
+        self.unchanged = 0
+
+    def __len__(self):
+        return len(self.adds) + len(self.removes) + len(self.changes)
+
+    def as_dict(self):
+        return {'adds': len(self.adds), 'removes': len(self.removes), 'changes': len(self.changes),
+                'unchanged': self.unchanged}
+
+    def to_records(self):
+        """
+        Returns the delta as json records tagged by their operation (add, remove or change)
+        :return: list of dict
+        """
+        return ([{'op': 'add', 'record': record} for record in self.adds] +
+                [{'op': 'remove', 'identifier': identifier} for identifier in self.removes] +
+                [dict(change, op='change') for change in self.changes])
+
+
+class SnapshotStore(object):
+    """
+    SnapshotStore keeps the records of the last pull of a request with their content hash, and writes the delta
+    of every new pull next to it as newline delimited json (delta-<time>.ndjson).
+
+    A snapshot belongs to one request (productIds, packageIds, fieldClusterIds): comparing pulls of different
+    fields would report every entity as changed, so a pull of another request is refused.
+
+    When the records carry a last-updated marker (marker_key), an entity whose marker did not move is taken as
+    unchanged without hashing or comparing its fields. The marker only saves that work: the records are pulled
+    before they are compared, so it never saves a request.
+
+    Public Attributes
+    -----------------
+    path : str
+        directory of the snapshot and the deltas
+    marker_key : str
+        record key holding the last-updated marker of an entity, None compares the content hashes only
+    synced : str
+        time of the last sync, None before the first one
+
+    Public Methods
+    -----------------
+    compare(records, params)
+        :returns the SnapshotDelta of a pull against the snapshot
+    commit(delta)
+        :returns the path of the written delta after applying it to the snapshot
+    records()
+        :returns the records of the snapshot
+    """
+
+    def __init__(self, path, marker_key=None):
+        """
+        Open the snapshot of a directory, empty before the first sync
+        :param path: directory of the snapshot and the deltas
+        :param marker_key: record key holding the last-updated marker of an entity
+        """
+        self.path = path
+        self.marker_key = marker_key
+        os.makedirs(path, exist_ok=True)
+        self.synced = None
+        self.__params = None
+        self.__entities = {}
+        self.__pending = None
+        snapshot_path = os.path.join(path, SNAPSHOT_NAME)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r') as fh:
+                snapshot = json.load(fh)
+            self.synced = snapshot['synced']
+            self.__params = snapshot['params']
+            self.__entities = snapshot['entities']
+
+    def __len__(self):
+        return len(self.__entities)
+
+    def records(self):
+        """
+        Returns the records of the snapshot
+        :return: list of json records
+        """
+        return [entity['record'] for entity in self.__entities.values()]
+
+    def compare(self, records, params):
+        """
+        Compare a pull with the snapshot, commit() applies the result
+        :param records: iterable of the DataService json records of the pull
+        :param params: productIds, packageIds and fieldClusterIds of the pull
+        :return: SnapshotDelta
+        """
+        if self.__params is not None and self.__params != params:
+            raise ValueError('The snapshot at %s holds a pull of %s, use another store for %s.'
+                             % (self.path, self.__params, params))
+        delta = SnapshotDelta()
+        entities = {}
+        for record in records:
+            identifier = record['identifier']
+            if not is_covered(record):
+                continue
+            previous = self.__entities.get(identifier)
+            marker = record.get(self.marker_key) if self.marker_key is not None else None
+            if previous is not None and marker is not None and previous['marker'] == marker:
+                entities[identifier] = previous
+                delta.unchanged += 1
+                continue
+            digest = record_hash(record)
+            entities[identifier] = {'hash': digest, 'marker': marker, 'record': record}
+            if previous is None:
+                delta.adds.append(record)
+            elif previous['hash'] == digest:
+                delta.unchanged += 1
+            else:
+                delta.changes.append(self.__field_changes(previous['record'], record))
+        delta.removes = [identifier for identifier in self.__entities if identifier not in entities]
+        self.__pending = (params, entities)
+        return delta
+
+    def commit(self, delta):
+        """
+        Write the delta of the last compare() and replace the snapshot by the pull
+        :param delta: SnapshotDelta returned by compare()
+        :return: path of the delta file, None when nothing changed
+        """
+        assert self.__pending is not None, "compare() should be called before commit()."
+        params, entities = self.__pending
+        self.synced = datetime.utcnow().isoformat() + 'Z'
+        delta_path = None
+        if len(delta) > 0:
+            delta_path = os.path.join(self.path, 'delta-%s.ndjson' % self.synced.replace(':', '').replace('.', '-'))
+            with open(delta_path, 'w') as fh:
+                for line in delta.to_records():
+                    fh.write(json.dumps(line))
+                    fh.write('\n')
+        snapshot = {'synced': self.synced, 'params': params, 'entities': entities}
+        tmp_path = os.path.join(self.path, SNAPSHOT_NAME + '.tmp')
+        with open(tmp_path, 'w') as fh:
+            json.dump(snapshot, fh)
+        os.replace(tmp_path, os.path.join(self.path, SNAPSHOT_NAME))
+        self.__params, self.__entities, self.__pending = params, entities, None
+        return delta_path
+
+    @staticmethod
+    def __field_changes(old_record, new_record):
+        """
+        Returns the fields whose value differs between two records of an entity
+        :param old_record: record of the snapshot
+        :param new_record: record of the pull
+        :return: dict
+        """
+        old_fields = old_record.get('fields') or {}
+        new_fields = new_record.get('fields') or {}
+        fields = {}
+        for field_id in set(old_fields) | set(new_fields):
+            if old_fields.get(field_id) != new_fields.get(field_id):
+                fields[field_id] = {'old': old_fields.get(field_id), 'new': new_fields.get(field_id)}
+        change = {'identifier': new_record['identifier'], 'entityId': new_record.get('entityId'), 'fields': fields}
+        if old_record.get('entityName') != new_record.get('entityName'):
+            change['entityName'] = {'old': old_record.get('entityName'), 'new': new_record.get('entityName')}
+        return change
@@ -0,0 +1,387 @@
+"""
+Statistics of the pulls and of every request made through the API.
+"""
+
+import json
+import heapq
+import bisect
+import threading
+from time import time
+from urllib.parse import urlencode
+
+
+# upper bounds, in seconds, of the latency histogram buckets, the last bucket holds the slower requests
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def endpoint_name(path):
+    """
+    Returns the endpoint of a request path without its identifiers,
+    /v1/ReportService/url/<identifier>/<reportId> is ReportService/url
+    :param path: endpoint path
+    :return: str
+    """
+    segments = [segment for segment in path.split('?')[0].strip('/').split('/') if segment]
+    if segments and segments[0] == 'v1':
+        segments = segments[1:]
+    name = []
+    for segment in segments[:2]:
+        if any(character.isdigit() for character in segment):
+            break
+        name.append(segment)
+    return '/'.join(name) or '/'
+
+
+def request_bytes(response, url, params=None):
+    """
+    Returns the size of the request of a response: its request line, headers and body when the transport
+    tells the prepared request, else its url and query string
+    :param response: response of the request
+    :param url: absolute url of the request
+    :param params: query parameters of the request
+    :return: int
+    """
+    request = getattr(response, 'request', None)
+    if request is not None and getattr(request, 'url', None):
+        size = len(request.method or '') + len(request.url) + 11  # request line
+        size += sum(len(name) + len(str(value)) + 4 for name, value in request.headers.items())
+        body = request.body
+        return size + (len(body) if body else 0)
+    return len(url) + (len(urlencode(params, doseq=True)) + 1 if params else 0)
+
+
+class PullStats(object):
+    """
+    PullStats counts what a get_data/iter_data/export_data pull spent. It is updated by the worker threads.
+
+    Public Attributes
+    -----------------
+    chunks : int
+        chunks of the pull
+    requests : int
+        DataService requests sent, retries included
+    retries : int
+        requests sent again after a retryable failure
+    retry_reasons : dict
+        retries per reason, an HTTP status or an exception name
+    reauths : int
+        requests sent again after a 401
+    throttled_seconds : float
+        seconds the requests waited on the rate limiter
+    chunk_sizes : dict
+        fetched chunks per number of identifiers
+    bytes_received : int
+        bytes of the DataService responses
+    chunker : AdaptiveChunker
+        sizes the chunks of an adaptive pull, its decisions are reported with the statistics
+    plan : ResolutionPlan
+        identifiers requested and dropped by a pull resolved through an IdentifierIndex
+    budget : RetryBudget
+        retries the pull may still spend
+
+    Public Methods
+    -----------------
+    as_dict()
+        :returns the statistics as a dictionary
+    """
+
+    def __init__(self, chunks=0, budget=None, chunker=None, plan=None):
+        self.chunks = chunks
+        self.requests = 0
+        self.retries = 0
+        self.retry_reasons = {}
+        self.reauths = 0
+        self.throttled_seconds = 0.0
+        self.chunk_sizes = {}
+        self.bytes_received = 0
+        self.budget = budget
+        self.chunker = chunker
+        self.plan = plan
+        self._lock = threading.Lock()
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_retry(self, reason):
+        with self._lock:
+            self.retries += 1
+            self.retry_reasons[str(reason)] = self.retry_reasons.get(str(reason), 0) + 1
+
+    def add_reauth(self):
+        with self._lock:
+            self.reauths += 1
+
+    def add_wait(self, seconds):
+        with self._lock:
+            self.throttled_seconds += seconds
+
+    def add_chunk(self, size, nbytes):
+        with self._lock:
+            self.chunk_sizes[size] = self.chunk_sizes.get(size, 0) + 1
+            self.bytes_received += nbytes
+
+    def as_dict(self):
+        """
+        Returns the statistics as a dictionary
+        :return: dict
+        """
+        with self._lock:
+            stats = {
+                'chunks': self.chunks,
+                'requests': self.requests,
+                'retries': self.retries,
+                'retry_reasons': dict(self.retry_reasons),
+                'reauths': self.reauths,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'retry_budget_remaining': None if self.budget is None else self.budget.remaining,
+                'chunk_sizes': dict(sorted(self.chunk_sizes.items())),
+                'bytes_received': self.bytes_received,
+            }
+        if self.chunker is not None:
+            stats['chunk_decisions'] = list(self.chunker.decisions)
+        if self.plan is not None:
+            stats['identifiers'] = self.plan.as_dict()
+        return stats
+
+
+class EndpointStats(object):
+    """
+    EndpointStats counts the requests of one endpoint and their latency histogram. Updated under the lock
+    of its Instrumentation.
+    """
+
+    def __init__(self, slowest=10):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.retries = 0
+        self.retry_reasons = {}
+        self.reauths = 0
+        self.throttled_seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_min = None
+        self.latency_max = None
+        self.chunk_sizes = {}
+        self.slowest = slowest
+        self.__slowest_chunks = []
+
+    def add_request(self, seconds, status, bytes_sent, bytes_received):
+        self.requests += 1
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+        self.latency_min = seconds if self.latency_min is None else min(self.latency_min, seconds)
+        self.latency_max = seconds if self.latency_max is None else max(self.latency_max, seconds)
+
+    def add_chunk(self, size, seconds, nbytes):
+        self.chunk_sizes[size] = self.chunk_sizes.get(size, 0) + 1
+        chunk = (seconds, size, nbytes)
+        if len(self.__slowest_chunks) < self.slowest:
+            heapq.heappush(self.__slowest_chunks, chunk)
+        elif chunk > self.__slowest_chunks[0]:
+            heapq.heapreplace(self.__slowest_chunks, chunk)
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the histogram bucket holding a latency quantile
+        :param q: quantile between 0 and 1
+        :return: seconds, None without requests, the max latency for the last bucket
+        """
+        if self.requests == 0:
+            return None
+        rank = q * self.requests
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.latency_max)
+        return self.latency_max
+
+    def as_dict(self):
+        labels = ['<=%g' % bound for bound in LATENCY_BUCKETS] + ['>%g' % LATENCY_BUCKETS[-1]]
+        stats = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'statuses': dict(sorted(self.statuses.items())),
+            'retries': self.retries,
+            'retry_reasons': dict(self.retry_reasons),
+            'reauths': self.reauths,
+            'throttled_seconds': round(self.throttled_seconds, 3),
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'latency': {
+                'count': self.requests,
+                'sum': round(self.latency_sum, 6),
+                'mean': round(self.latency_sum / self.requests, 6) if self.requests else None,
+                'min': self.latency_min,
+                'max': self.latency_max,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99),
+                'buckets': dict(zip(labels, self.latency_buckets)),
+            },
+        }
+        if self.chunk_sizes:
+            stats['chunk_sizes'] = dict(sorted(self.chunk_sizes.items()))
+            stats['slowest_chunks'] = [{'seconds': round(seconds, 6), 'size': size, 'bytes': nbytes}
+                                       for seconds, size, nbytes in sorted(self.__slowest_chunks, reverse=True)]
+        return stats
+
+
+class Instrumentation(object):
+    """
+    Instrumentation records every request of an API per endpoint: the latency histogram, bytes sent and received,
+    statuses, retries, re-authentications, rate limiter waits and DataService chunk sizes, and the duration of
+    the pulls. Every measure is also passed to the hooks as an event dictionary, i.e. to forward it to a monitoring
+    system; a failing hook is counted and never interrupts the request. Can be shared by several API instances.
+
+    Public Attributes
+    -----------------
+    hooks : list
+        callables receiving every event, the event key is request, retry, reauth, throttle, chunk or pull
+
+    Public Methods
+    -----------------
+    add_hook(hook)
+        :returns the hook called with every event
+    remove_hook(hook)
+        stops calling a hook
+    record_request(path, seconds, status, bytes_sent=0, bytes_received=0)
+        records a request sent, status is the HTTP status or the exception name
+    record_retry(path, reason)
+    record_reauth(path)
+    record_throttle(path, seconds)
+    record_chunk(path, size, seconds, nbytes)
+    record_pull(method, seconds, stats)
+        records a get_data/export_data pull and its PullStats
+    stats()
+        :returns a snapshot of the statistics per endpoint and of the pulls
+    to_json(path=None)
+        :returns the snapshot as json, also written to path when given
+    reset()
+        forgets every measure
+    """
+
+    def __init__(self, hooks=None, slowest=10, pulls=100):
+        """
+        Create the instrumentation
+        :param hooks: callables receiving every event
+        :param slowest: slowest DataService chunks kept per endpoint
+        :param pulls: last pulls kept
+        """
+        self.hooks = list(hooks or [])
+        self.slowest = slowest
+        self.pulls = pulls
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget every measure, the hooks are kept
+        :return: None
+        """
+        with self.__lock:
+            self.__started = time()
+            self.__endpoints = {}
+            self.__pulls = []
+            self.__hook_errors = 0
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def __endpoint(self, path):
+        name = endpoint_name(path)
+        endpoint = self.__endpoints.get(name)
+        if endpoint is None:
+            endpoint = self.__endpoints[name] = EndpointStats(self.slowest)
+        return name, endpoint
+
+    def __emit(self, event):
+        for hook in list(self.hooks):
+            try:
+                hook(event)
+            except Exception:
+                with self.__lock:
+                    self.__hook_errors += 1
+
+    def record_request(self, path, seconds, status, bytes_sent=0, bytes_received=0):
+        with self.__lock:
+            name, endpoint = self.__endpoint(path)
+            endpoint.add_request(seconds, status, bytes_sent, bytes_received)
+        self.__emit({'event': 'request', 'endpoint': name, 'seconds': seconds, 'status': status,
+                     'bytes_sent': bytes_sent, 'bytes_received': bytes_received, 'time': time()})
+
+    def record_retry(self, path, reason):
+        with self.__lock:
+            name, endpoint = self.__endpoint(path)
+            endpoint.retries += 1
+            endpoint.retry_reasons[str(reason)] = endpoint.retry_reasons.get(str(reason), 0) + 1
+        self.__emit({'event': 'retry', 'endpoint': name, 'reason': str(reason), 'time': time()})
+
+    def record_reauth(self, path):
+        with self.__lock:
+            name, endpoint = self.__endpoint(path)
+            endpoint.reauths += 1
+        self.__emit({'event': 'reauth', 'endpoint': name, 'time': time()})
+
+    def record_throttle(self, path, seconds):
+        with self.__lock:
+            name, endpoint = self.__endpoint(path)
+            endpoint.throttled_seconds += seconds
+        self.__emit({'event': 'throttle', 'endpoint': name, 'seconds': seconds, 'time': time()})
+
+    def record_chunk(self, path, size, seconds, nbytes):
+        with self.__lock:
+            name, endpoint = self.__endpoint(path)
+            endpoint.add_chunk(size, seconds, nbytes)
+        self.__emit({'event': 'chunk', 'endpoint': name, 'size': size, 'seconds': seconds, 'bytes': nbytes,
+                     'time': time()})
+
+    def record_pull(self, method, seconds, stats):
+        pull = {'method': method, 'seconds': round(seconds, 6), 'finished': time(), 'stats': stats}
+        with self.__lock:
+            self.__pulls.append(pull)
+            del self.__pulls[:-self.pulls]
+        event = {'event': 'pull'}
+        event.update(pull)
+        self.__emit(event)
+
+    def stats(self):
+        """
+        Returns a snapshot of the statistics
+        :return: dict of the endpoints, last pulls and totals
+        """
+        with self.__lock:
+            endpoints = {name: endpoint.as_dict() for name, endpoint in sorted(self.__endpoints.items())}
+            pulls = [dict(pull) for pull in self.__pulls]
+            hook_errors = self.__hook_errors
+            started = self.__started
+        totals = {key: sum(endpoint[key] for endpoint in endpoints.values())
+                  for key in ('requests', 'errors', 'retries', 'reauths', 'bytes_sent', 'bytes_received')}
+        totals['throttled_seconds'] = round(sum(endpoint['throttled_seconds'] for endpoint in endpoints.values()), 3)
+        return {'since': started, 'seconds': round(time() - started, 3), 'totals': totals, 'endpoints': endpoints,
+                'pulls': pulls, 'hook_errors': hook_errors}
+
+    def to_json(self, path=None):
+        """
+        Returns the snapshot of the statistics as json
+        :param path: file the json is also written to
+        :return: str
+        """
+        text = json.dumps(self.stats(), indent=2, default=str)
+        if path is not None:
+            with open(path, 'w') as fh:
+                fh.write(text)
+        return text
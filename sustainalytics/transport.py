@@ -0,0 +1,102 @@
+"""
+Manages the HTTP connections used by the API client.
+"""
+
+import requests
+from http.client import responses as status_reasons
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+def make_response(status, headers, content, url=None):
+    """
+    Returns a requests.Response holding a body read by another client, i.e. replayed or aiohttp
+    :param status: HTTP status
+    :param headers: response headers
+    :param content: body bytes
+    :param url: url of the request
+    :return: requests.Response
+    """
+    response = requests.models.Response()
+    response.status_code = status
+    response.reason = status_reasons.get(status, '')
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = 'utf-8'
+    response.url = url
+    response._content = content
+    response._content_consumed = True  # iter_content() slices the body
+    return response
+
+
+class Transport(object):
+    """
+    Interface of the objects sending the HTTP requests of the API.
+
+    A transport receives the method, the absolute url and the keyword arguments of requests
+    (headers, params, data, timeout, stream) and returns a requests.Response like object
+    exposing status_code, headers, content, json() and raise_for_status().
+
+    Public Methods
+    -----------------
+    request(method, url, **kwargs)
+        :returns the response of the request
+    close()
+        releases the connections held by the transport
+    """
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request
+        :param method: GET or POST
+        :param url: absolute url of the endpoint
+        :return: response
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release the connections held by the transport
+        :return: None
+        """
+        pass
+
+
+class SessionTransport(Transport):
+    """
+    Transport keeping a pool of keep-alive connections in a single requests.Session.
+
+    Public Attributes
+    -----------------
+    session : requests.Session
+        the session shared by all the requests of the API
+    pool_size : int
+        the maximum number of connections kept open per host
+    """
+
+    def __init__(self, pool_size=10, pool_block=True):
+        """
+        Create the pooled session
+        :param pool_size: maximum number of connections kept open per host, should be >= the get_data workers
+        :param pool_block: wait for a free connection instead of opening extra ones when the pool is exhausted
+        """
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request over the pooled session
+        :param method: GET or POST
+        :param url: absolute url of the endpoint
+        :return: requests.Response
+        """
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        """
+        Close the pooled connections
+        :return: None
+        """
+        self.session.close()
@@ -0,0 +1,150 @@
+"""
+Indexes the universes of access as sorted integer arrays for vectorized membership and set queries.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def sorted_contains(sorted_ids, entity_ids):
+    """
+    Returns True for the EntityIds present in a sorted array
+    :param sorted_ids: sorted numpy array of EntityIds
+    :param entity_ids: array of EntityIds to look up
+    :return: boolean array
+    """
+    entity_ids = np.asarray(entity_ids, dtype=np.int64)
+    if len(sorted_ids) == 0:
+        return np.zeros(len(entity_ids), dtype=bool)
+    positions = np.searchsorted(sorted_ids, entity_ids).clip(max=len(sorted_ids) - 1)
+    return sorted_ids[positions] == entity_ids
+
+
+class UniverseIndex(object):
+    """
+    UniverseIndex holds the EntityIds of every universe of access as a sorted, deduplicated int64 array.
+
+    Membership of an array of EntityIds is a binary search per id, and unions, intersections and differences
+    of universes are computed on the sorted arrays without building python sets.
+
+    Public Attributes
+    -----------------
+    universes : dict
+        universeId to the sorted EntityIds of the universe
+    names : dict
+        universeId to the name of the universe
+
+    Public Methods
+    -----------------
+    entity_ids(*universes)
+        :returns the EntityIds of the universes, of every universe by default
+    contains(entity_ids, universe=None)
+        :returns a boolean array, True for the EntityIds of the universe (of any universe by default)
+    membership(entity_ids)
+        :returns a boolean dataframe of the EntityIds by universe
+    union(*universes), intersection(*universes), difference(universe, *others)
+        :returns the EntityIds of the set operation
+    """
+
+    def __init__(self, universes, names=None):
+        """
+        :param universes: dictionary of universeId to EntityIds
+        :param names: dictionary of universeId to universe name
+        """
+        self.universes = {key: np.unique(np.asarray(ids, dtype=np.int64)) for key, ids in universes.items()}
+        self.names = dict(names or {})
+        self.__all = None
+
+    @classmethod
+    def from_access(cls, universe_of_access):
+        """
+        Build the index of the UniverseOfAccess json, universes without universeId are keyed by position
+        :param universe_of_access: json of API.get_universe_access()
+        :return: UniverseIndex
+        """
+        universes = {}
+        names = {}
+        for position, universe in enumerate(universe_of_access):
+            key = universe.get('universeId', position)
+            universes[key] = np.concatenate([universes.get(key, np.empty(0, dtype=np.int64)),
+                                             np.asarray(universe.get('entityIds') or [], dtype=np.int64)])
+            names[key] = universe.get('universeName')
+        return cls(universes, names)
+
+    def __len__(self):
+        return len(self.entity_ids())
+
+    def __contains__(self, entity_id):
+        return bool(self.contains([entity_id])[0])
+
+    def __universe(self, universe):
+        if universe not in self.universes:
+            raise KeyError('Universe %s is not in the universes of access %s.' % (universe, list(self.universes)))
+        return self.universes[universe]
+
+    def entity_ids(self, *universes):
+        """
+        Returns the EntityIds of the universes
+        :param universes: universeIds, every universe when none is given
+        :return: sorted numpy array
+        """
+        if len(universes) > 0:
+            return self.union(*universes)
+        if self.__all is None:
+            self.__all = self.union(*self.universes) if len(self.universes) > 0 else np.empty(0, dtype=np.int64)
+        return self.__all
+
+    def contains(self, entity_ids, universe=None):
+        """
+        Returns True for the EntityIds of a universe
+        :param entity_ids: array of EntityIds
+        :param universe: universeId, None looks in every universe
+        :return: boolean array
+        """
+        sorted_ids = self.entity_ids() if universe is None else self.__universe(universe)
+        return sorted_contains(sorted_ids, entity_ids)
+
+    def membership(self, entity_ids):
+        """
+        Returns the membership of EntityIds in every universe
+        :param entity_ids: array of EntityIds
+        :return: boolean dataframe indexed by EntityId, one column per universeId
+        """
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        return pd.DataFrame({key: sorted_contains(ids, entity_ids) for key, ids in self.universes.items()},
+                            index=pd.Index(entity_ids, name='entityId'), columns=list(self.universes))
+
+    def union(self, *universes):
+        """
+        Returns the EntityIds in any of the universes
+        :param universes: universeIds
+        :return: sorted numpy array
+        """
+        arrays = [self.__universe(universe) for universe in universes]
+        return np.unique(np.concatenate(arrays)) if len(arrays) > 0 else np.empty(0, dtype=np.int64)
+
+    def intersection(self, *universes):
+        """
+        Returns the EntityIds in all the universes
+        :param universes: universeIds
+        :return: sorted numpy array
+        """
+        arrays = [self.__universe(universe) for universe in universes]
+        if len(arrays) == 0:
+            return np.empty(0, dtype=np.int64)
+        result = arrays[0]
+        for ids in arrays[1:]:
+            result = np.intersect1d(result, ids, assume_unique=True)
+        return result
+
+    def difference(self, universe, *others):
+        """
+        Returns the EntityIds of a universe absent from the other universes
+        :param universe: universeId
+        :param others: universeIds
+        :return: sorted numpy array
+        """
+        ids = self.__universe(universe)
+        if len(others) == 0:
+            return ids
+        return ids[~sorted_contains(self.union(*others), ids)]
@@ -0,0 +1,28 @@
+import warnings
+import pytest
+from sustainalytics.api import API
+from benchmarks.standin import StandInServer
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+@pytest.fixture
+def server():
+    with StandInServer() as server:
+        yield server
+
+
+@pytest.fixture
+def api(server):
+    api = API('test', 'test', base_url=server.base_url)
+    yield api
+    api.close()
+
+
+def identifiers(count, start=1):
+    return [str(i) for i in range(start, start + count)]
@@ -0,0 +1,54 @@
+import socket
+import asyncio
+import pytest
+import requests
+from sustainalytics.retry import RetryPolicy
+from benchmarks.standin import AsyncStandInServer
+from conftest import identifiers
+
+pytest.importorskip('aiohttp')
+from sustainalytics.aio import AsyncAPI  # noqa: E402
+
+
+def test_concurrent_async_pulls_keep_their_own_stats(server):
+    async def pulls():
+        async with AsyncAPI('test', 'test', base_url=server.base_url) as api:
+            return await asyncio.gather(api.get_data(identifiers(1000), dtype='dataframe', chunk=10),
+                                        api.get_data(identifiers(200), dtype='dataframe', chunk=100))
+
+    small, large = asyncio.run(pulls())
+    assert small.attrs['pull_stats']['chunk_sizes'] == {10: 100}
+    assert large.attrs['pull_stats']['chunk_sizes'] == {100: 2}
+
+
+def test_revoked_token_and_injected_errors():
+    async def pull():
+        async with AsyncStandInServer(error_rate=0.3, seed=2) as server:
+            async with AsyncAPI('test', 'test', base_url=server.base_url,
+                                retry_policy=RetryPolicy(max_retries=10, backoff_factor=0, jitter=False)) as api:
+                await api.warm()
+                server.revoke_tokens()
+                data = await api.get_data(identifiers(300), dtype='dataframe', chunk=20, concurrency=8)
+                return data, dict(server.request_counts)
+
+    data, request_counts = asyncio.run(pull())
+    stats = data.attrs['pull_stats']
+    assert len(data) == 300
+    assert stats['reauths'] >= 1 and request_counts['/auth/token'] == 2
+    assert set(stats['retry_reasons']) == {'503'}
+    assert stats['requests'] == stats['chunks'] + stats['retries'] + stats['reauths']
+
+
+def test_client_errors_raise_requests_exceptions():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    async def pull():
+        async with AsyncAPI('test', 'test', base_url='http://127.0.0.1:%d' % port,
+                            retry_policy=RetryPolicy(max_retries=1, backoff_factor=0)) as api:
+            api.api.token_manager.set_token('token')
+            await api.get_fieldDefinitions()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        asyncio.run(pull())
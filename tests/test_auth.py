@@ -0,0 +1,137 @@
+import os
+import stat
+import json
+import multiprocessing
+import pytest
+import requests
+from sustainalytics.auth import TokenManager
+from sustainalytics.retry import RetryPolicy
+from sustainalytics.transport import Transport, make_response
+from conftest import identifiers
+
+
+class ScriptedTransport(Transport):
+    """
+    Answers the token requests with the scripted responses in turn, an exception is raised instead
+    """
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.requests = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        answer = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(answer, Exception):
+            raise answer
+        status, body = answer
+        return make_response(status, {}, json.dumps(body).encode('utf-8'), url=url)
+
+
+def token(name, expires_in=3600):
+    return 200, {'access_token': name, 'expires_in': expires_in}
+
+
+def manager(transport, **kwargs):
+    kwargs.setdefault('retry_policy', RetryPolicy(max_retries=2, backoff_factor=0, jitter=False))
+    return TokenManager('id', 'secret', transport, 'http://standin', **kwargs)
+
+
+def test_token_expires_after_expires_in(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('sustainalytics.auth.time', lambda: now[0])
+    tokens = manager(ScriptedTransport(token('first', 600), token('second', 600)), refresh_margin=60)
+    assert tokens.get_token() == 'first'
+    now[0] += 539
+    assert tokens.get_token() == 'first'
+    # refreshed refresh_margin seconds before the expiry
+    now[0] += 1
+    assert tokens.get_token() == 'second'
+    assert tokens.refresh_count == 2
+
+
+def test_token_without_expires_in_is_kept(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('sustainalytics.auth.time', lambda: now[0])
+    tokens = manager(ScriptedTransport((200, {'access_token': 'first'}), token('second')))
+    assert tokens.get_token() == 'first'
+    now[0] += 10 ** 6
+    assert tokens.get_token() == 'first'
+
+
+@pytest.mark.parametrize('status', [400, 401])
+def test_rejected_credentials(status):
+    transport = ScriptedTransport((status, {'error': 'invalid_client'}))
+    with pytest.raises(ConnectionError, match='client_id and secret_key') as error:
+        manager(transport).get_token()
+    assert transport.requests == 1 and error.value.__cause__ is None
+
+
+def test_transient_failures_are_retried():
+    transport = ScriptedTransport(requests.exceptions.ConnectTimeout('timed out'), (503, {}), token('first'))
+    assert manager(transport).get_token() == 'first'
+    assert transport.requests == 3
+
+
+def test_transport_errors_are_chained():
+    transport = ScriptedTransport(requests.exceptions.ConnectionError('refused'))
+    with pytest.raises(ConnectionError, match='token request') as error:
+        manager(transport).get_token()
+    assert transport.requests == 3
+    assert isinstance(error.value.__cause__, requests.exceptions.ConnectionError)
+    with pytest.raises(ConnectionError, match='no access_token') as error:
+        manager(ScriptedTransport((200, {'token': 'first'}))).get_token()
+    assert isinstance(error.value.__cause__, KeyError)
+    with pytest.raises(ConnectionError, match='token request') as error:
+        manager(ScriptedTransport((404, {}))).get_token()
+    assert isinstance(error.value.__cause__, requests.exceptions.HTTPError)
+
+
+def test_invalidate_keeps_a_token_another_thread_replaced():
+    transport = ScriptedTransport(token('first'), token('second'), token('third'))
+    tokens = manager(transport)
+    stale = tokens.get_token()
+    tokens.invalidate(stale)
+    assert tokens.get_token() == 'second'
+    # a request that failed with the first token arrives after the refresh
+    tokens.invalidate(stale)
+    assert tokens.get_token() == 'second'
+    assert transport.requests == 2
+
+
+def cached_token(base_url, cache_file, queue):
+    from sustainalytics.transport import SessionTransport
+    tokens = TokenManager('test', 'test', SessionTransport(), base_url, cache_file=cache_file)
+    queue.put((tokens.get_token(), tokens.refresh_count))
+
+
+def test_cache_file_is_shared_across_processes(server, tmp_path):
+    cache_file = str(tmp_path / 'token.json')
+    from sustainalytics.transport import SessionTransport
+    tokens = TokenManager('test', 'test', SessionTransport(), server.base_url, cache_file=cache_file)
+    access_token = tokens.get_token()
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=cached_token, args=(server.base_url, cache_file, queue))
+    process.start()
+    shared = queue.get(timeout=60)
+    process.join()
+    assert shared == (access_token, 0)
+    assert server.request_counts['/auth/token'] == 1
+
+
+def test_rejected_token_is_refreshed(api, server):
+    api.access_headers = {'Accept': 'text/json', 'Authorization': 'Bearer revoked'}
+    assert len(api.get_fieldDefinitions()) > 0
+    assert api.access_headers['Authorization'] != 'Bearer revoked'
+    assert server.request_counts['/auth/token'] == 1
+
+
+def test_concurrent_workers_share_one_refresh(api, server):
+    api.warm()
+    server.revoke_tokens()
+    data = api.get_data(identifiers(80), chunk=10, workers=8)
+    assert len(data) == 80
+    assert server.request_counts['/auth/token'] == 2
+    assert api.token_manager.refresh_count == 2
@@ -0,0 +1,41 @@
+from sustainalytics.api import API
+from sustainalytics.cache import MetadataCache
+
+
+def test_instances_sharing_a_directory_see_each_other(tmp_path):
+    writer, reader = MetadataCache(cache_dir=str(tmp_path)), MetadataCache(cache_dir=str(tmp_path))
+    assert reader.get('key') is None
+    writer.set('key', {'version': 1}, etag='"1"')
+    assert reader.get('key')['data'] == {'version': 1}
+    writer.set('key', {'version': 2}, etag='"2"')
+    assert reader.get('key')['etag'] == '"2"'
+    fetched_at = reader.get('key')['fetched_at']
+    writer.touch('key')
+    assert reader.get('key')['fetched_at'] > fetched_at
+    writer.invalidate('key')
+    assert reader.get('key') is None
+
+
+def test_in_memory_entry_is_served_while_unchanged(tmp_path):
+    cache = MetadataCache(cache_dir=str(tmp_path))
+    entry = cache.set('key', [1, 2])
+    assert cache.get('key') is entry
+
+
+def test_clients_share_the_reference_endpoints(server, tmp_path):
+    first = API('test', 'test', base_url=server.base_url, metadata_cache=MetadataCache(cache_dir=str(tmp_path)))
+    second = API('test', 'test', base_url=server.base_url, metadata_cache=MetadataCache(cache_dir=str(tmp_path)))
+    assert first.get_fieldDefinitions() == second.get_fieldDefinitions()
+    assert server.request_counts['/v1/FieldDefinitions'] == 1
+    first.invalidate_metadata()
+    second.get_fieldDefinitions()
+    assert server.request_counts['/v1/FieldDefinitions'] == 2
+
+
+def test_touch_keeps_an_entry_invalidated_by_another_instance(tmp_path):
+    writer, reader = MetadataCache(cache_dir=str(tmp_path)), MetadataCache(cache_dir=str(tmp_path))
+    entry = writer.set('key', 'data', etag='"1"')
+    reader.invalidate('key')
+    assert writer.get('key') is None
+    assert writer.touch('key', entry)['data'] == 'data'
+    assert reader.get('key')['data'] == 'data'
@@ -0,0 +1,44 @@
+import pytest
+from sustainalytics.api import API
+from benchmarks.cassette import Cassette, CassetteMiss, RecordingTransport, ReplayTransport, REPLAY_TOKEN
+from benchmarks.standin import StandInServer
+from conftest import identifiers
+
+
+@pytest.fixture
+def cassette(server, tmp_path):
+    path = str(tmp_path / 'cassette.json.gz')
+    transport = RecordingTransport()
+    api = API('test', 'test', base_url=server.base_url, transport=transport)
+    api.warm()
+    live = api.get_data(identifiers(120), dtype='dataframe', chunk=40)
+    transport.save(path)
+    return path, live
+
+
+def test_replay_equals_live_at_another_chunk_size(cassette):
+    path, live = cassette
+    api = API('test', 'test', base_url='http://replay', transport=ReplayTransport(path))
+    replayed = api.get_data(identifiers(120), dtype='dataframe', chunk=25)
+    assert replayed.drop(columns='fields').equals(live.drop(columns='fields'))
+
+
+def test_tokens_are_redacted(cassette):
+    recorded = Cassette(cassette[0])
+    tokens = [interaction for interaction in recorded.interactions
+              if interaction['request']['path'].endswith('/auth/token')]
+    assert tokens and all(REPLAY_TOKEN in interaction['response']['body'] for interaction in tokens)
+
+
+def test_unrecorded_request_raises(cassette):
+    api = API('test', 'test', base_url='http://replay', transport=ReplayTransport(cassette[0]))
+    with pytest.raises(CassetteMiss):
+        api.get_pdfReportInfo()
+
+
+def test_standin_serves_a_cassette(cassette):
+    path, live = cassette
+    with StandInServer(cassette=path) as server:
+        api = API('test', 'test', base_url=server.base_url)
+        served = api.get_data(identifiers(120), dtype='dataframe', chunk=60)
+    assert served.drop(columns='fields').equals(live.drop(columns='fields'))
@@ -0,0 +1,27 @@
+import os
+from conftest import identifiers
+
+
+def data_requests(server):
+    return server.request_counts.get('/v1/DataService', 0)
+
+
+def test_interrupted_pull_resumes_missing_chunks(api, server, tmp_path):
+    checkpoint = str(tmp_path)
+    pull = api.iter_data(identifiers(300), chunk=100, checkpoint=checkpoint)
+    next(pull)
+    pull.close()
+    before = data_requests(server)
+    data = api.get_data(identifiers(300), chunk=100, checkpoint=checkpoint)
+    assert len(data) == 300
+    assert data_requests(server) - before == 2
+
+
+def test_completed_pull_is_requested_again(api, server, tmp_path):
+    checkpoint = str(tmp_path)
+    first = api.get_data(identifiers(300), dtype='dataframe', chunk=100, checkpoint=checkpoint)
+    before = data_requests(server)
+    second = api.get_data(identifiers(300), dtype='dataframe', chunk=100, checkpoint=checkpoint)
+    assert data_requests(server) - before == 3
+    assert first.drop(columns='fields').equals(second.drop(columns='fields'))
+    assert os.listdir(checkpoint) == []
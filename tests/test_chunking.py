@@ -0,0 +1,52 @@
+import pytest
+from sustainalytics.chunking import AdaptiveChunker
+from conftest import identifiers
+
+
+def test_size_changes_by_at_most_a_factor_2():
+    chunker = AdaptiveChunker(target_seconds=2.0, initial=20)
+    assert chunker.next_size() == 20
+    # 0.01s per identifier wants 200 identifiers, the size only doubles
+    assert chunker.observe(20, 0.2, 1000) == 40
+    assert chunker.observe(40, 0.4, 2000) == 80
+    assert chunker.observe(80, 0.8, 4000) == 100
+    # 1s per identifier wants 2 identifiers, the size only halves
+    assert chunker.observe(100, 100.0, 5000) == 50
+    assert [decision['next_size'] for decision in chunker.decisions] == [40, 80, 100, 50]
+
+
+def test_size_converges_to_the_target():
+    chunker = AdaptiveChunker(target_seconds=1.0, initial=10, smoothing=1.0)
+    for _ in range(5):
+        size = chunker.next_size()
+        chunker.observe(size, size * 0.04, size * 100)
+    assert chunker.next_size() == 25
+
+
+def test_max_bytes_limits_the_size():
+    chunker = AdaptiveChunker(target_seconds=10.0, max_bytes=30000, initial=50, smoothing=1.0)
+    for _ in range(3):
+        size = chunker.next_size()
+        chunker.observe(size, size * 0.001, size * 1000)
+    assert chunker.next_size() == 30
+
+
+def test_size_stays_within_bounds():
+    chunker = AdaptiveChunker(initial=4, minimum=2, maximum=8, smoothing=1.0)
+    for _ in range(5):
+        chunker.observe(chunker.next_size(), 60.0, 100)
+    assert chunker.next_size() == 2
+    for _ in range(5):
+        chunker.observe(chunker.next_size(), 0.001, 100)
+    assert chunker.next_size() == 8
+    with pytest.raises(AssertionError):
+        AdaptiveChunker(initial=50, maximum=200)
+
+
+def test_adaptive_pull_returns_every_identifier(api):
+    chunker = AdaptiveChunker(target_seconds=0.5, initial=10)
+    ids = identifiers(300)
+    data = api.get_data(ids, dtype='dataframe', chunk=chunker, workers=2)
+    assert data.index.tolist() == ids
+    assert sum(decision['size'] for decision in chunker.decisions) == 300
+    assert all(1 <= decision['next_size'] <= 100 for decision in chunker.decisions)
@@ -0,0 +1,11 @@
+import pandas as pd
+from sustainalytics.compact import compact_frame
+
+
+def test_declared_numeric_field_with_text_is_kept():
+    data = pd.DataFrame({'1': [1.5, 'No data', 'unexpected'], '2': [1, 2, 'No data']})
+    compact = compact_frame(data, {'1', '2'}, field_types={'1': 'numeric', '2': 'numeric'})
+    assert compact['1'].tolist() == [1.5, 'No data', 'unexpected']
+    assert str(compact['2'].dtype) == 'float32'
+    assert compact['2_sentinel'].tolist()[2] == 'No data'
+    assert compact.attrs['compact']['text_fallbacks'] == ['1']
@@ -0,0 +1,41 @@
+import pandas as pd
+from sustainalytics.api import API
+from benchmarks.standin import StandInServer, build_catalog
+
+
+def row_wise_definition(value, src_df, match_length, src_id_name):
+    # the lookup get_fullFieldDefinitions made before the prefix join
+    temp_df = src_df[src_df[src_id_name] == int(str(value)[:match_length])]
+    if len(temp_df) >= 1:
+        return temp_df.iat[0, 0], temp_df.iat[0, 1]
+    return None, None
+
+
+def test_prefix_join_matches_the_row_wise_lookup():
+    field_mappings, field_definitions = build_catalog()
+    # a duplicated product keeps its first definition, unknown prefixes stay unmatched at every level
+    field_mappings.append(dict(field_mappings[0], productName='Duplicated product'))
+    field_definitions += [{'fieldId': 99000000, 'fieldName': 'Unknown product'},
+                          {'fieldId': 10990000, 'fieldName': 'Unknown package'},
+                          {'fieldId': 10009900, 'fieldName': 'Unknown cluster'}]
+    with StandInServer(field_mappings=field_mappings, field_definitions=field_definitions) as server:
+        api = API('test', 'test', base_url=server.base_url)
+        try:
+            joined = api.get_fullFieldDefinitions(dtype='dataframe')
+            expected = api.get_fieldsInfo(dtype='dataframe')
+            levels = [(api.get_productsInfo(dtype='dataframe'), 2, 'productId', 'productName'),
+                      (api.get_packageInfo(dtype='dataframe'), 4, 'packageId', 'packageName'),
+                      (api.get_fieldClusterInfo(dtype='dataframe'), 6, 'fieldClusterId', 'fieldClusterName')]
+        finally:
+            api.close()
+    for src_df, match_length, id_name, name in levels:
+        expected[id_name], expected[name] = zip(*expected.apply(
+            lambda x: row_wise_definition(x['fieldId'], src_df, match_length, id_name), axis=1))
+    pd.testing.assert_frame_equal(joined[expected.columns], expected)
+    unmatched = joined.set_index('fieldId')
+    assert unmatched.loc[99000000, ['productId', 'productName']].isna().all()
+    assert unmatched.loc[10990000, 'productName'] == 'Product 10'
+    assert unmatched.loc[10990000, ['packageId', 'packageName', 'fieldClusterId']].isna().all()
+    assert unmatched.loc[10009900, 'packageName'] == 'Package 1000'
+    assert unmatched.loc[10009900, ['fieldClusterId', 'fieldClusterName']].isna().all()
+    assert (joined['productName'] != 'Duplicated product').all()
@@ -0,0 +1,92 @@
+import os
+import zlib
+import pytest
+import pandas as pd
+from sustainalytics.export import get_sink, load_dataset
+from conftest import identifiers
+
+pytest.importorskip('pyarrow')
+
+
+def uncovered(count, coverage=0.9):
+    names = ('X%d' % i for i in range(100000))
+    return [name for name in names if zlib.crc32(name.encode('utf-8')) % 1000 >= coverage * 1000][:count]
+
+
+def write_partitions(path, format, **options):
+    sink = get_sink(path, format=format, field_columns=['1', '2'], **options)
+    index = pd.Index(['a', 'b'], name='identifier')
+    sink.write(pd.DataFrame({'entityId': [None, None], 'entityName': [None, None], '1': [None, None],
+                             '2': [None, None]}, index=index, dtype=object))
+    sink.write(pd.DataFrame({'entityId': [3, 4], 'entityName': ['c', 'd'], '1': [1.5, 'No data'], '2': ['x', 2]},
+                            index=pd.Index(['c', 'd'], name='identifier')))
+    return sink.close()
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_schema_does_not_depend_on_first_partition(tmp_path, format):
+    manifest = write_partitions(str(tmp_path), format)
+    data = load_dataset(str(tmp_path))
+    assert manifest['field_layout'] == 'typed'
+    assert data['entityId'].tolist()[2:] == [3, 4]
+    assert str(data['1'].dtype) == 'float64' and data['1'].tolist()[2] == 1.5
+    assert data['1_sentinel'].astype(object).where(data['1_sentinel'].notna(), None).tolist() == \
+        [None, None, None, 'No data']
+    # text a numeric field should not hold is kept in its sentinel column
+    assert data['2_sentinel'].tolist()[2] == 'x' and data['2'].tolist()[3] == 2
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_text_layout(tmp_path, format):
+    manifest = write_partitions(str(tmp_path), format, field_layout='text')
+    data = load_dataset(str(tmp_path))
+    assert manifest['field_layout'] == 'text'
+    assert data['1'].tolist() == [None, None, '1.5', 'No data']
+    assert '1_sentinel' not in data.columns
+
+
+def test_fields_declared_text_stay_text(tmp_path):
+    write_partitions(str(tmp_path), 'parquet', field_types={'1': 'numeric', '2': 'text'})
+    data = load_dataset(str(tmp_path))
+    assert data['2'].tolist() == [None, None, 'x', '2']
+    assert '2_sentinel' not in data.columns and '1_sentinel' in data.columns
+
+
+def test_export_of_uncovered_first_chunk(api, tmp_path):
+    ids = uncovered(10) + identifiers(30)
+    manifest = api.export_data(ids, str(tmp_path), chunk=10, progress=False)
+    data = load_dataset(str(tmp_path))
+    assert manifest['records'] == 40
+    assert data.index.tolist() == ids
+    assert data['entityId'].isna().sum() >= 10
+
+
+def test_export_deletes_partitions_of_previous_runs(api, tmp_path):
+    api.export_data(identifiers(300), str(tmp_path), chunk=50, progress=False)
+    manifest = api.export_data(identifiers(150), str(tmp_path), chunk=50, progress=False)
+    partitions = sorted(name for name in os.listdir(str(tmp_path)) if name.startswith('part-'))
+    assert partitions == [partition['path'] for partition in manifest['partitions']]
+    assert len(load_dataset(str(tmp_path))) == 150
+
+
+def test_resume_fetches_missing_partitions(api, server, tmp_path):
+    api.export_data(identifiers(300), str(tmp_path), chunk=50, progress=False)
+    os.remove(os.path.join(str(tmp_path), 'part-00002.parquet'))
+    before = server.request_counts['/v1/DataService']
+    manifest = api.export_data(identifiers(300), str(tmp_path), chunk=50, resume=True, progress=False)
+    assert server.request_counts['/v1/DataService'] - before == 1
+    assert manifest['records'] == 300
+
+
+def test_export_layouts_hold_the_same_values(api, tmp_path):
+    typed, text = str(tmp_path / 'typed'), str(tmp_path / 'text')
+    api.export_data(identifiers(60), typed, chunk=20, progress=False)
+    api.export_data(identifiers(60), text, chunk=20, progress=False, field_layout='text')
+    typed, text = load_dataset(typed), load_dataset(text)
+    for column in api.get_fieldIDs():
+        column = str(column)
+        sentinels = typed[column + '_sentinel'].astype(object)
+        values = typed[column].map(repr).where(typed[column].notna(), sentinels)
+        expected = pd.to_numeric(text[column], errors='coerce').map(repr).where(
+            pd.to_numeric(text[column], errors='coerce').notna(), text[column])
+        assert values.where(values.notna(), None).tolist() == expected.where(expected.notna(), None).tolist()
@@ -0,0 +1,57 @@
+import pytest
+from sustainalytics.identifiers import IdentifierIndex, identifier_type, normalize_identifier
+
+
+@pytest.mark.parametrize('identifier, kind', [
+    ('US0378331005', 'ISIN'), ('03783310A', 'CUSIP'), ('B0YBKJ7', 'SEDOL'), ('12345', 'EntityId'),
+    # digits only SEDOLs and CUSIPs cannot be told from EntityIds
+    ('2046251', None), ('037833100', None), ('US-037833', None)])
+def test_identifier_type(identifier, kind):
+    assert identifier_type(normalize_identifier(identifier)) == kind
+
+
+def test_ambiguous_digits_resolve_through_the_universe():
+    index = IdentifierIndex(universe=[2046251, 5])
+    assert index.resolve('2046251') == 2046251
+    assert index.resolve('037833100') is None
+    assert index.resolve('12345') == 12345
+    assert IdentifierIndex().resolve('2046251') is None
+    # a learned SEDOL wins over the universe
+    index.learn([{'identifier': '2046251', 'entityId': 5}])
+    assert index.resolve(' 2046251 ') == 5
+
+
+def test_plan_requests_every_entity_once():
+    index = IdentifierIndex(universe=[5, 6], entities={'US0378331005': 5, 'B0YBKJ7': 7})
+    plan = index.plan(['5', ' us0378331005 ', 'XS0000000001', 'B0YBKJ7', '6', '5', 'xs0000000001'])
+    assert plan.identifiers == ['5', 'XS0000000001', '6']
+    assert plan.originals == {'5': ['5', 'us0378331005', '5'], 'XS0000000001': ['XS0000000001', 'xs0000000001'],
+                              '6': ['6']}
+    assert plan.dropped == ['B0YBKJ7']
+    assert plan.as_dict() == {'asked': 7, 'requested': 3, 'dropped': 1}
+
+
+def test_fan_out_copies_records_and_teaches_the_index():
+    index = IdentifierIndex(universe=[5, 8])
+    plan = index.plan(['5', 'XS0000000001', 'xs0000000001'])
+    records = plan.fan_out([{'identifier': '5', 'entityId': 5, 'fields': {'1': 1}},
+                            {'identifier': 'XS0000000001', 'entityId': 8, 'fields': {'1': 2}}])
+    assert [record['identifier'] for record in records] == ['5', 'XS0000000001', 'xs0000000001']
+    assert index.resolve('xs0000000001') == 8
+    assert index.plan(['8', 'XS0000000001']).identifiers == ['8']
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'index.json')
+    IdentifierIndex(universe=[3, 1, 2], entities={'b0ybkj7': 3}).save(path)
+    index = IdentifierIndex.load(path)
+    assert index.universe.tolist() == [1, 2, 3]
+    assert index.resolve('B0YBKJ7') == 3
+
+
+def test_pull_through_the_index(api):
+    index = api.get_identifierIndex()
+    data = api.get_data(['1', ' 1', '2', '999999', '1'], identifier_index=index)
+    assert [record['identifier'] for record in data] == ['1', '1', '1', '2']
+    stats = api.last_pull_stats.as_dict()
+    assert stats['identifiers'] == {'asked': 5, 'requested': 2, 'dropped': 1}
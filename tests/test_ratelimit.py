@@ -0,0 +1,57 @@
+import threading
+import pytest
+import multiprocessing
+from time import perf_counter
+from sustainalytics.ratelimit import RateLimiter
+
+
+def test_bucket_refills_at_rate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('sustainalytics.ratelimit.time', lambda: now[0])
+    limiter = RateLimiter(10, capacity=2)
+    assert [limiter.reserve() for _ in range(4)] == pytest.approx([0.0, 0.0, 0.1, 0.2])
+    now[0] += 0.3
+    assert limiter.reserve() == pytest.approx(0.0)
+    # an idle bucket refills up to its capacity only
+    now[0] += 60
+    assert [limiter.reserve() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.1])
+
+
+def test_state_file_shares_the_bucket(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr('sustainalytics.ratelimit.time', lambda: now[0])
+    state_file = str(tmp_path / 'bucket.json')
+    first, second = RateLimiter(10, capacity=2, state_file=state_file), RateLimiter(10, capacity=2, state_file=state_file)
+    assert first.reserve() == 0.0 and second.reserve() == 0.0
+    assert first.reserve() == pytest.approx(0.1) and second.reserve() == pytest.approx(0.2)
+
+
+def test_threads_do_not_exceed_the_rate():
+    limiter = RateLimiter(50, capacity=1)
+    start = perf_counter()
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert perf_counter() - start >= 19 / 50.0 - 0.01
+
+
+def acquire(state_file, count):
+    limiter = RateLimiter(50, capacity=1, state_file=state_file)
+    for _ in range(count):
+        limiter.acquire()
+
+
+def test_processes_share_the_rate(tmp_path):
+    state_file = str(tmp_path / 'bucket.json')
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=acquire, args=(state_file, 10)) for _ in range(2)]
+    acquire(state_file, 1)  # the processes find a bucket already spent
+    start = perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    assert perf_counter() - start >= 19 / 50.0 - 0.01
@@ -0,0 +1,111 @@
+import os
+import calendar
+from time import time
+from datetime import datetime
+import pytest
+import pandas as pd
+from sustainalytics.reports import report_url, report_url_expiry, report_version, parse_timestamp, ReportStore
+
+
+def epoch(text):
+    return float(calendar.timegm(datetime.strptime(text, '%Y-%m-%dT%H:%M:%SZ').timetuple()))
+
+
+@pytest.mark.parametrize('response, url', [
+    ('https://host/report.pdf', 'https://host/report.pdf'),
+    ({'reportUrl': 'https://host/report.pdf', 'entityId': 1}, 'https://host/report.pdf'),
+    ([{'message': 'none'}, {'url': 'https://host/report.pdf'}], 'https://host/report.pdf'),
+    ({'url': 'ftp://host/report.pdf'}, None), ('No report', None), (None, None)])
+def test_report_url(response, url):
+    assert report_url(response) == url
+
+
+def test_parse_timestamp():
+    assert parse_timestamp(1700000000) == parse_timestamp('1700000000') == 1700000000.0
+    assert parse_timestamp('2030-01-01T00:00:00Z') == epoch('2030-01-01T00:00:00Z')
+    assert parse_timestamp('2030-01-01T01:00:00+01:00') == epoch('2030-01-01T00:00:00Z')
+    assert parse_timestamp('Tue, 01 Jan 2030 00:00:00 GMT') == epoch('2030-01-01T00:00:00Z')
+    assert parse_timestamp('soon') is None
+
+
+def test_report_url_expiry():
+    expected = epoch('2030-01-01T00:00:00Z')
+    assert report_url_expiry({'url': 'https://host/r.pdf', 'expiresOn': '2030-01-01T00:00:00Z'},
+                             'https://host/r.pdf', 3600) == expected
+    assert report_url_expiry([{'validUntil': expected}], 'https://host/r.pdf', 3600) == expected
+    # presigned Azure, AWS and generic links
+    assert report_url_expiry({}, 'https://host/r.pdf?sv=1&se=2030-01-01T00%3A00%3A00Z&sig=x', 3600) == expected
+    assert report_url_expiry({}, 'https://host/r.pdf?X-Amz-Date=20291231T230000Z&X-Amz-Expires=3600',
+                             3600) == expected
+    assert report_url_expiry({}, 'https://host/r.pdf?Expires=%d' % expected, 3600) == expected
+    default = report_url_expiry({'expires': 'unknown'}, 'https://host/r.pdf', 3600)
+    assert default == pytest.approx(time() + 3600, abs=5)
+
+
+def test_report_version():
+    assert report_version([{'url': 'u'}, {'lastUpdated': '2030-01-01', 'version': None}]) == '2030-01-01'
+    assert report_version({'url': 'u'}) is None
+
+
+def test_bulk_urls_report_errors_per_pair(api, server):
+    pairs = [('1', 1), ('2', '2'), ('1', 1), ('1', 99)]
+    urls = api.get_pdfReportUrls(pairs, workers=4)
+    assert urls['identifier'].tolist() == ['1', '2', '1', '1']
+    assert urls['url'].notna().tolist() == [True, True, True, False]
+    assert urls['error'].isna().tolist() == [True, True, True, False]
+    assert '404' in urls['error'].iloc[3]
+    assert (urls['expires_at'].iloc[:3] > pd.Timestamp.now(tz='UTC')).all()
+    # the duplicated pair is requested once, the valid links are then served from the cache
+    assert sum(count for path, count in server.request_counts.items() if path.startswith('/v1/ReportService/url/')) == 3
+    again = api.get_pdfReportUrls(pairs)
+    assert again['cached'].tolist() == [True, True, True, False]
+
+
+def test_links_about_to_expire_are_requested_again(server, api):
+    server.link_ttl = 30
+    api.get_pdfReportUrls([('1', 1)])
+    assert api.get_pdfReportUrls([('1', 1)])['cached'].tolist() == [False]
+
+
+def report_downloads(server):
+    return sum(count for path, count in server.request_counts.items() if path.startswith('/reports/'))
+
+
+def test_unchanged_reports_are_not_downloaded_again(api, server, tmp_path):
+    pairs = [('1', 1), ('2', 1), ('1', 2)]
+    first = api.download_pdfReports(pairs, str(tmp_path), workers=3)
+    assert first['downloaded'] == 3 and first['errors'] == 0
+    assert first['bytes_downloaded'] == sum(report['bytes'] for report in first['reports']) > 3 * server.report_size
+    # the links are cached and the stored reports revalidated with their ETag
+    second = api.download_pdfReports(pairs, str(tmp_path))
+    assert second['downloaded'] == 0 and second['unchanged'] == 3
+    assert [report['status'] for report in second['reports']] == ['not_modified'] * 3
+    assert [report['sha256'] for report in second['reports']] == [report['sha256'] for report in first['reports']]
+
+
+def test_updated_report_is_downloaded_again(api, server, tmp_path):
+    api.download_pdfReports([('1', 1), ('2', 1)], str(tmp_path))
+    entity = api.get_pdfReportUrls([('1', 1)])['url'].iloc[0].split('/')[4]
+    server.update_report(entity, '1')
+    before = report_downloads(server)
+    manifest = api.download_pdfReports([('1', 1), ('2', 1)], str(tmp_path))
+    assert [report['status'] for report in manifest['reports']] == ['downloaded', 'not_modified']
+    assert report_downloads(server) - before == 2
+    store = ReportStore(str(tmp_path))
+    entry = store.get(entity, '1')
+    assert entry['sha256'] == manifest['reports'][0]['sha256']
+    assert os.path.getsize(store.object_path(entry)) == entry['bytes']
+
+
+def test_store_keeps_a_body_once(tmp_path):
+    store = ReportStore(str(tmp_path))
+    first = store.write('1', '1', [b'%PDF', b' body'], version='v1')
+    second = store.write('2', '1', iter([b'%PDF body']), etag='"e"')
+    assert first['path'] == second['path'] and first['bytes'] == 9
+    assert second['version'] == '"e"'
+    assert store.has('1', '1', 'v1') is not None and store.has('1', '1', 'v2') is None
+    store.save()
+    reopened = ReportStore(str(tmp_path))
+    assert reopened.get('2', '1')['sha256'] == first['sha256']
+    os.remove(reopened.object_path(first))
+    assert reopened.get('1', '1') is None
@@ -0,0 +1,59 @@
+import pytest
+import requests
+from sustainalytics.api import API
+from sustainalytics.retry import RetryPolicy, RetryBudget, RETRY, REAUTHENTICATE, GIVE_UP
+from benchmarks.standin import StandInServer
+from conftest import identifiers
+
+
+def test_injected_errors_are_retried():
+    with StandInServer(error_rate=0.3, seed=1) as server:
+        api = API('test', 'test', base_url=server.base_url,
+                  retry_policy=RetryPolicy(max_retries=10, backoff_factor=0, jitter=False))
+        data = api.get_data(identifiers(500), dtype='dataframe', chunk=20, workers=4)
+        stats = data.attrs['pull_stats']
+    assert len(data) == 500
+    assert stats['retries'] > 0
+    assert stats['requests'] == stats['chunks'] + stats['retries']
+    assert set(stats['retry_reasons']) == {'503'}
+
+
+def test_retry_after_is_capped():
+    policy = RetryPolicy(max_backoff=5, max_retry_after=10)
+    assert policy.backoff(0, retry_after=8) == 8
+    assert policy.backoff(0, retry_after=60) == 10
+    assert policy.accepts_retry_after(None) and policy.accepts_retry_after(10)
+    assert not policy.accepts_retry_after(60)
+    assert RetryPolicy(max_backoff=5).max_retry_after == 5
+
+
+def test_long_retry_after_gives_up():
+    with StandInServer(error_rate=1.0, error_status=429, retry_after=3600) as server:
+        api = API('test', 'test', base_url=server.base_url,
+                  retry_policy=RetryPolicy(max_retries=3, max_retry_after=1))
+        with pytest.raises(requests.exceptions.HTTPError) as error:
+            api.get_fieldDefinitions()
+    assert error.value.response.status_code == 429
+    assert server.request_counts['/v1/FieldDefinitions'] == 1
+
+
+def test_short_retry_after_is_waited():
+    with StandInServer(error_rate=0.5, error_status=429, retry_after=0, seed=3) as server:
+        api = API('test', 'test', base_url=server.base_url, retry_policy=RetryPolicy(max_retries=10))
+        data = api.get_data(identifiers(100), dtype='dataframe', chunk=20)
+    assert len(data) == 100
+    assert set(data.attrs['pull_stats']['retry_reasons']) == {'429'}
+
+
+def test_decide():
+    policy = RetryPolicy(max_retries=2, backoff_factor=1, jitter=False, max_retry_after=10)
+    assert policy.decide(0, 401) == (REAUTHENTICATE, 0.0)
+    assert policy.decide(0, 401, reauthenticated=True) == (GIVE_UP, 0.0)
+    assert policy.decide(0, 404) == (GIVE_UP, 0.0)
+    assert policy.decide(1, 503) == (RETRY, 2)
+    assert policy.decide(0, 429, retry_after=5) == (RETRY, 5)
+    assert policy.decide(0, 429, retry_after=60) == (GIVE_UP, 0.0)
+    assert policy.decide(0) == (RETRY, 1) and policy.decide(2) == (GIVE_UP, 0.0)
+    budget = RetryBudget(1)
+    assert policy.decide(0, 503, budget=budget)[0] == RETRY
+    assert policy.decide(0, 503, budget=budget)[0] == GIVE_UP
@@ -0,0 +1,47 @@
+import os
+import pytest
+import pandas as pd
+from sustainalytics.api import API
+from sustainalytics.export import load_dataset
+from sustainalytics.sharding import shard_identifiers, merge_pull_stats
+from sustainalytics.transport import Transport, SessionTransport
+from conftest import identifiers
+
+pytest.importorskip('pyarrow')
+
+
+def test_shards_are_whole_chunks():
+    shards = shard_identifiers(identifiers(420), 4, 50)
+    assert [len(shard) for shard in shards] == [150, 150, 120]
+    assert sum(shards, []) == identifiers(420)
+    assert shard_identifiers([], 4, 50) == []
+
+
+def test_merge_pull_stats():
+    merged = merge_pull_stats([{'requests': 2, 'retry_reasons': {'503': 1}, 'throttled_seconds': 0.1},
+                               {'requests': 3, 'retry_reasons': {'503': 2, '429': 1}, 'throttled_seconds': 0.2}])
+    assert merged == {'requests': 5, 'retry_reasons': {'503': 3, '429': 1}, 'throttled_seconds': 0.3}
+
+
+def test_sharded_export_equals_export(api, server, tmp_path):
+    single, sharded = str(tmp_path / 'single'), str(tmp_path / 'sharded')
+    api.export_data(identifiers(400), single, chunk=50, progress=False)
+    manifest = api.export_data(identifiers(400), sharded, chunk=50, processes=2, shards=3, progress=False)
+    assert [shard['identifiers'] for shard in manifest['shards']] == [150, 150, 100]
+    assert all(shard['token_requests'] == 0 for shard in manifest['shards'])
+    assert server.request_counts['/auth/token'] == 1
+    pd.testing.assert_frame_equal(load_dataset(single), load_dataset(sharded))
+
+
+def test_sharded_export_requires_a_transport_factory(server, tmp_path):
+    class CustomTransport(Transport):
+        def __init__(self):
+            self.session = SessionTransport()
+
+        def request(self, method, url, **kwargs):
+            return self.session.request(method, url, **kwargs)
+
+    api = API('test', 'test', base_url=server.base_url, transport=CustomTransport())
+    with pytest.raises(ValueError):
+        api.export_data(identifiers(10), str(tmp_path), processes=2, progress=False)
+    assert not any(name.startswith('shard-') for name in os.listdir(str(tmp_path)))
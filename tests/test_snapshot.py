@@ -0,0 +1,65 @@
+import json
+import pytest
+from sustainalytics.snapshot import SnapshotStore
+from conftest import identifiers
+
+PARAMS = {'productIds': None, 'packageIds': None, 'fieldClusterIds': None}
+
+
+def record(identifier, score, name='Entity', marker=None):
+    record = {'identifier': identifier, 'entityId': int(identifier), 'entityName': name, 'fields': {'1': score}}
+    if marker is not None:
+        record['lastUpdate'] = marker
+    return record
+
+
+def sync(store, records, params=PARAMS):
+    delta = store.compare(records, params)
+    return delta, store.commit(delta)
+
+
+def test_delta_lists_adds_removes_and_changes(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    delta, _ = sync(store, [record('1', 10), record('2', 20), record('3', 30)])
+    assert delta.as_dict() == {'adds': 3, 'removes': 0, 'changes': 0, 'unchanged': 0}
+    delta, delta_path = sync(SnapshotStore(str(tmp_path)), [record('1', 10), record('2', 25, name='Renamed'),
+                                                            record('4', 40)])
+    assert delta.as_dict() == {'adds': 1, 'removes': 1, 'changes': 1, 'unchanged': 1}
+    assert delta.removes == ['3']
+    assert delta.changes == [{'identifier': '2', 'entityId': 2, 'fields': {'1': {'old': 20, 'new': 25}},
+                              'entityName': {'old': 'Entity', 'new': 'Renamed'}}]
+    with open(delta_path) as fh:
+        assert [json.loads(line)['op'] for line in fh] == ['add', 'remove', 'change']
+    delta, delta_path = sync(store, store.records())
+    assert len(delta) == 0 and delta_path is None
+
+
+def test_uncovered_entities_are_removed(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    sync(store, [record('1', 10), record('2', 20)])
+    delta, _ = sync(store, [record('1', 10), {'identifier': '2', 'entityId': None, 'fields': {}}])
+    assert delta.removes == ['2']
+
+
+def test_pull_of_another_request_is_refused(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    sync(store, [record('1', 10)])
+    with pytest.raises(ValueError, match='holds a pull'):
+        SnapshotStore(str(tmp_path)).compare([record('1', 10)], dict(PARAMS, productIds=[10]))
+
+
+def test_unmoved_marker_skips_the_comparison(tmp_path):
+    store = SnapshotStore(str(tmp_path), marker_key='lastUpdate')
+    sync(store, [record('1', 10, marker='2024-01-01'), record('2', 20, marker='2024-01-01')])
+    delta, _ = sync(store, [record('1', 11, marker='2024-01-01'), record('2', 21, marker='2024-02-01')])
+    assert delta.as_dict() == {'adds': 0, 'removes': 0, 'changes': 1, 'unchanged': 1}
+
+
+def test_sync_data_requests_every_identifier(api, server, tmp_path):
+    first = api.sync_data(identifiers(100), str(tmp_path), chunk=20, marker_key='entityId')
+    requests = server.request_counts['/v1/DataService']
+    second = api.sync_data(identifiers(100), str(tmp_path), chunk=20, marker_key='entityId')
+    assert first.as_dict()['adds'] == second.as_dict()['unchanged'] > 0
+    assert len(second) == 0
+    # the marker saves the comparison, not the requests
+    assert server.request_counts['/v1/DataService'] == 2 * requests
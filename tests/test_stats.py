@@ -0,0 +1,21 @@
+import threading
+from conftest import identifiers
+
+
+def test_concurrent_pulls_keep_their_own_stats(api):
+    api.warm()
+    stats = {}
+
+    def pull(name, count, chunk):
+        data = api.get_data(identifiers(count), dtype='dataframe', chunk=chunk, workers=2)
+        stats[name] = data.attrs['pull_stats']
+
+    threads = [threading.Thread(target=pull, args=('small', 1000, 10)),
+               threading.Thread(target=pull, args=('large', 200, 100))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stats['small']['chunk_sizes'] == {10: 100}
+    assert stats['large']['chunk_sizes'] == {100: 2}
+    assert sorted(pull['stats']['chunks'] for pull in api.stats()['pulls']) == [2, 100]
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from sustainalytics.api import API
+from sustainalytics.universe import UniverseIndex, sorted_contains
+from benchmarks.standin import StandInServer
+
+ACCESS = [{'universeId': 1, 'universeName': 'First', 'entityIds': [5, 3, 3, 9]},
+          {'universeId': 2, 'universeName': 'Second', 'entityIds': [9, 1, 7]},
+          {'universeId': 3, 'universeName': 'Empty', 'entityIds': []}]
+
+
+def test_contains():
+    index = UniverseIndex.from_access(ACCESS)
+    assert index.universes[1].tolist() == [3, 5, 9]
+    assert index.contains([1, 2, 3, 9, 10]).tolist() == [True, False, True, True, False]
+    assert index.contains([1, 3], universe=1).tolist() == [False, True]
+    assert not index.contains([1], universe=3)[0]
+    assert 7 in index and 8 not in index
+    assert sorted_contains(np.array([], dtype=np.int64), [1]).tolist() == [False]
+    with pytest.raises(KeyError):
+        index.contains([1], universe=4)
+
+
+def test_set_operations():
+    index = UniverseIndex.from_access(ACCESS)
+    assert index.union(1, 2).tolist() == [1, 3, 5, 7, 9]
+    assert index.intersection(1, 2).tolist() == [9]
+    assert index.intersection(1, 2, 3).tolist() == []
+    assert index.difference(1, 2).tolist() == [3, 5]
+    assert index.difference(2).tolist() == [1, 7, 9]
+    assert index.entity_ids().tolist() == [1, 3, 5, 7, 9] and len(index) == 5
+    membership = index.membership([3, 9])
+    assert membership.loc[9].tolist() == [True, True, False]
+
+
+def test_universe_entity_ids_keep_duplicates():
+    with StandInServer(universe_of_access=ACCESS) as server:
+        api = API('test', 'test', base_url=server.base_url)
+        assert api.get_universe_entityIDs() == [1, 3, 5, 7, 9]
+        # as listed by UniverseOfAccess, repeated within and across universes
+        assert api.get_universe_entityIDs(keep_duplicates=True) == [5, 3, 3, 9, 9, 1, 7]
+        assert server.request_counts['/v1/UniverseOfAccess'] == 1